@@ -0,0 +1,125 @@
+import threading
+
+import numpy as np
+
+# Feature order expected by the model: RSI, MACD, volatility, sentiment, price vs SMA5
+FEATURE_COUNT = 5
+
+
+def train_default_model():
+    """Train the placeholder model on dummy data"""
+    # scikit-learn takes most of a cold import, so it loads with the first prediction
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    model = LogisticRegression(random_state=42)
+
+    # Initialize with some dummy data to train the model
+    dummy_features = np.random.rand(100, FEATURE_COUNT)  # 5 features: price, volume, volatility, sentiment, technical_indicator
+    dummy_targets = np.random.randint(0, 2, 100)  # 0 = DOWN, 1 = UP
+    scaler.fit(dummy_features)
+    model.fit(scaler.transform(dummy_features), dummy_targets)
+    return scaler, model
+
+
+# AI Model for predictions, trained on first use
+ai_scaler = ai_model = None
+_model_lock = threading.Lock()
+
+
+def get_model() -> tuple:
+    """Return (scaler, model), training the default model the first time it is needed"""
+    global ai_scaler, ai_model
+    if ai_model is None:
+        with _model_lock:
+            if ai_model is None:
+                ai_scaler, ai_model = train_default_model()
+    return ai_scaler, ai_model
+
+
+def set_model(scaler, model):
+    """Install a model in this process; used as the process-pool initializer"""
+    global ai_scaler, ai_model
+    ai_scaler, ai_model = scaler, model
+
+
+def compute_technical_indicators(prices: list) -> dict:
+    """Calculate technical indicators from the most recent prices"""
+    prices = prices[-20:]  # Last 20 prices
+
+    # Calculate simple technical indicators
+    current_price = prices[-1]
+    sma_5 = np.mean(prices[-5:])
+    sma_10 = np.mean(prices[-10:]) if len(prices) >= 10 else sma_5
+
+    # RSI-like indicator
+    price_changes = np.diff(prices)
+    gains = np.where(price_changes > 0, price_changes, 0)
+    losses = np.where(price_changes < 0, -price_changes, 0)
+
+    avg_gain = np.mean(gains[-14:]) if len(gains) >= 14 else np.mean(gains)
+    avg_loss = np.mean(losses[-14:]) if len(losses) >= 14 else np.mean(losses)
+
+    if avg_loss == 0:
+        rsi = 100
+    else:
+        rs = avg_gain / avg_loss
+        rsi = 100 - (100 / (1 + rs))
+
+    # MACD-like indicator
+    ema_12 = current_price * 0.8 + sma_5 * 0.2
+    ema_26 = current_price * 0.6 + sma_10 * 0.4
+    macd = ema_12 - ema_26
+
+    # Bollinger Bands
+    bb_middle = sma_10
+    bb_std = np.std(prices[-10:]) if len(prices) >= 10 else np.std(prices)
+    bb_upper = bb_middle + (bb_std * 2)
+    bb_lower = bb_middle - (bb_std * 2)
+
+    return {
+        "sma_5": float(sma_5),
+        "sma_10": float(sma_10),
+        "rsi": float(rsi),
+        "macd": float(macd),
+        "bb_upper": float(bb_upper),
+        "bb_middle": float(bb_middle),
+        "bb_lower": float(bb_lower),
+        "volatility": float(bb_std / current_price * 100),
+        "price_vs_sma5": float((current_price - sma_5) / sma_5 * 100),
+        "price_vs_sma10": float((current_price - sma_10) / sma_10 * 100)
+    }
+
+
+def build_features(tech_indicators: dict, sentiment: dict) -> list:
+    """Prepare the normalized feature row for the AI model"""
+    return [
+        tech_indicators.get("rsi", 50) / 100,  # Normalize RSI
+        tech_indicators.get("macd", 0) / 100,   # Normalize MACD
+        tech_indicators.get("volatility", 5) / 10,  # Normalize volatility
+        sentiment.get("overall_sentiment", 0),   # Sentiment score
+        tech_indicators.get("price_vs_sma5", 0) / 10  # Price vs SMA
+    ]
+
+
+def adjust_confidence(confidence, volatility, sentiment):
+    """Adjust model confidence (0-100) for market conditions; works on scalars and arrays"""
+    confidence = np.where(np.asarray(volatility) > 8, confidence * 0.9, confidence)  # Lower confidence in high volatility
+    confidence = np.where(np.abs(sentiment) > 0.5, confidence * 1.1, confidence)  # Higher confidence with strong sentiment
+    return np.clip(confidence, 55, 95)  # Keep within bounds
+
+
+def predict_direction_batch(features) -> tuple:
+    """Scale and classify a batch of feature rows; returns (predictions, probabilities)"""
+    scaler, model = get_model()
+    features_scaled = scaler.transform(np.asarray(features, dtype=float))
+    probabilities = model.predict_proba(features_scaled)
+    predictions = model.classes_[np.argmax(probabilities, axis=1)]
+    return predictions, probabilities
+
+
+def predict_direction(features: list) -> tuple:
+    """Classify one feature row; returns (prediction, [p_down, p_up]) as plain Python values"""
+    predictions, probabilities = predict_direction_batch([features])
+    return int(predictions[0]), [float(p) for p in probabilities[0]]
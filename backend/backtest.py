@@ -0,0 +1,238 @@
+"""Vectorized backtesting of the direction model.
+
+Every sliding window of a price series is turned into the same indicator
+features the live path computes (compute_technical_indicators + build_features),
+all windows are classified in batches, and each prediction is scored against
+the price one timeframe later using the live WON/LOST rule. Results report
+accuracy against a coin flip and an always-UP baseline, plus calibration of the
+reported confidence.
+
+    python backtest.py --source synthetic --symbols 10 --days 365 --step 60
+    python backtest.py --source replay --replay-file ticks.ndjson
+    python backtest.py --source coingecko --symbols BTC ETH SOL
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import analysis
+
+WINDOW = 20
+CHUNK_WINDOWS = 262144
+
+# Horizon of each AI timeframe and the chart resolution its indicators are computed on live
+TIMEFRAME_MINUTES = {"15m": 15, "1h": 60, "4h": 240}
+TIMEFRAME_CHART_STEP = {"15m": 300, "1h": 3600, "4h": 3600}
+
+CALIBRATION_BINS = np.array([55, 60, 65, 70, 75, 80, 85, 90, 95.0001])
+
+
+def window_indicators(prices: np.ndarray) -> Dict[str, np.ndarray]:
+    """compute_technical_indicators for every 20-point window of prices at once.
+
+    Entry i describes the window ending at prices[i + WINDOW - 1].
+    """
+    windows = sliding_window_view(np.asarray(prices, dtype=float), WINDOW)
+    current = windows[:, -1]
+    sma_5 = windows[:, -5:].mean(axis=1)
+    sma_10 = windows[:, -10:].mean(axis=1)
+
+    # RSI-like indicator over the last 14 changes
+    changes = np.diff(windows[:, -15:], axis=1)
+    avg_gain = np.where(changes > 0, changes, 0).mean(axis=1)
+    avg_loss = np.where(changes < 0, -changes, 0).mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+
+    macd = (current * 0.8 + sma_5 * 0.2) - (current * 0.6 + sma_10 * 0.4)
+    bb_std = windows[:, -10:].std(axis=1)
+
+    return {
+        "rsi": rsi,
+        "macd": macd,
+        "volatility": bb_std / current * 100,
+        "price_vs_sma5": (current - sma_5) / sma_5 * 100,
+    }
+
+
+def window_features(indicators: Dict[str, np.ndarray], sentiment: Optional[np.ndarray] = None) -> np.ndarray:
+    """build_features for every window; historical sentiment defaults to neutral"""
+    if sentiment is None:
+        sentiment = np.zeros_like(indicators["rsi"])
+    return np.column_stack([
+        indicators["rsi"] / 100,
+        indicators["macd"] / 100,
+        indicators["volatility"] / 10,
+        sentiment,
+        indicators["price_vs_sma5"] / 10,
+    ])
+
+
+def resample(prices: np.ndarray, step_seconds: int, target_seconds: int) -> np.ndarray:
+    """Take every k-th point so the series matches the chart resolution used live"""
+    if target_seconds <= step_seconds:
+        return prices
+    if target_seconds % step_seconds:
+        raise ValueError(f"Series step {step_seconds}s does not divide chart step {target_seconds}s")
+    return prices[::target_seconds // step_seconds]
+
+
+def backtest_series(prices: np.ndarray, step_seconds: int, timeframe: str,
+                    sentiment: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Predict every window of one series at one timeframe and score it at the horizon"""
+    chart_step = max(step_seconds, TIMEFRAME_CHART_STEP[timeframe])
+    series = resample(np.asarray(prices, dtype=float), step_seconds, chart_step)
+    if sentiment is not None:
+        sentiment = resample(np.asarray(sentiment, dtype=float), step_seconds, chart_step)
+    horizon = max(1, round(TIMEFRAME_MINUTES[timeframe] * 60 / chart_step))
+
+    # Windows whose outcome is inside the series
+    count = len(series) - WINDOW + 1 - horizon
+    if count <= 0:
+        return {"predicted_up": np.empty(0, bool), "actual_up": np.empty(0, bool), "actual_down": np.empty(0, bool),
+                "confidence": np.empty(0)}
+
+    predicted_up, confidence = [], []
+    for start in range(0, count, CHUNK_WINDOWS):
+        stop = min(count, start + CHUNK_WINDOWS)
+        indicators = window_indicators(series[start:stop + WINDOW - 1])
+        chunk_sentiment = None if sentiment is None else sentiment[start + WINDOW - 1:stop + WINDOW - 1]
+        features = window_features(indicators, chunk_sentiment)
+        predictions, probabilities = analysis.predict_direction_batch(features)
+        predicted_up.append(predictions == 1)
+        confidence.append(analysis.adjust_confidence(
+            probabilities.max(axis=1) * 100,
+            indicators["volatility"],
+            features[:, 3]
+        ))
+
+    entry = series[WINDOW - 1:WINDOW - 1 + count]
+    result = series[WINDOW - 1 + horizon:WINDOW - 1 + horizon + count]
+    return {
+        "predicted_up": np.concatenate(predicted_up),
+        # Ties count as DOWN, matching prediction_outcome where a flat UP call loses
+        "actual_up": result > entry,
+        "actual_down": result < entry,
+        "confidence": np.concatenate(confidence),
+    }
+
+
+def score(outcome: Dict[str, np.ndarray]) -> dict:
+    predicted_up = outcome["predicted_up"]
+    windows = len(predicted_up)
+    if windows == 0:
+        return {"windows": 0}
+
+    won = np.where(predicted_up, outcome["actual_up"], outcome["actual_down"])
+    accuracy = float(won.mean())
+    confidence = outcome["confidence"] / 100
+
+    calibration, ece = [], 0.0
+    bins = np.digitize(outcome["confidence"], CALIBRATION_BINS) - 1
+    for index in range(len(CALIBRATION_BINS) - 1):
+        mask = bins == index
+        hits = int(mask.sum())
+        if not hits:
+            continue
+        mean_confidence = float(confidence[mask].mean())
+        hit_rate = float(won[mask].mean())
+        ece += hits / windows * abs(mean_confidence - hit_rate)
+        calibration.append({
+            "confidence_range": [round(float(CALIBRATION_BINS[index])), round(float(CALIBRATION_BINS[index + 1]))],
+            "windows": hits,
+            "mean_confidence": round(mean_confidence, 4),
+            "accuracy": round(hit_rate, 4),
+        })
+
+    return {
+        "windows": windows,
+        "accuracy": round(accuracy, 4),
+        # Standard score of the accuracy against a fair coin; |z| > 2 is unlikely to be luck
+        "coin_flip_z": round((accuracy - 0.5) / math.sqrt(0.25 / windows), 2),
+        "always_up_accuracy": round(float(outcome["actual_up"].mean()), 4),
+        "predicted_up_rate": round(float(predicted_up.mean()), 4),
+        "mean_confidence": round(float(confidence.mean()), 4),
+        "brier_score": round(float(np.mean((confidence - won) ** 2)), 4),
+        "expected_calibration_error": round(ece, 4),
+        "calibration": calibration,
+    }
+
+
+def merge_outcomes(outcomes: Iterable[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    outcomes = list(outcomes)
+    return {key: np.concatenate([outcome[key] for outcome in outcomes]) for key in outcomes[0]}
+
+
+def run_backtest(series: Dict[str, np.ndarray], step_seconds: int, timeframes: List[str]) -> dict:
+    """Backtest every symbol and timeframe; series maps symbol to evenly spaced USD prices"""
+    started = time.perf_counter()
+    results, by_timeframe = [], {timeframe: [] for timeframe in timeframes}
+    for symbol, prices in series.items():
+        for timeframe in timeframes:
+            outcome = backtest_series(prices, step_seconds, timeframe)
+            if len(outcome["predicted_up"]):
+                by_timeframe[timeframe].append(outcome)
+            results.append({"symbol": symbol, "timeframe": timeframe, **score(outcome)})
+
+    overall = {timeframe: score(merge_outcomes(outcomes)) for timeframe, outcomes in by_timeframe.items() if outcomes}
+    elapsed = time.perf_counter() - started
+    windows = sum(result["windows"] for result in results)
+    return {
+        "windows": windows,
+        "elapsed_s": round(elapsed, 3),
+        "windows_per_second": round(windows / elapsed) if elapsed else None,
+        "overall": overall,
+        "results": results,
+    }
+
+
+async def load_series(args) -> Dict[str, np.ndarray]:
+    from market_data import CoinGeckoProvider, MarketClock, ReplayProvider, SyntheticProvider
+
+    if args.source == "synthetic":
+        end = time.time()
+        provider = SyntheticProvider(MarketClock(1.0, end), {}, args.seed, tick_seconds=args.step, history_days=args.days)
+        timestamps = np.arange(end - args.days * 86400, end, args.step)
+        return {f"COIN{index}": provider.price_at(f"coin-{index}", timestamps) for index in range(int(args.symbols[0]))}
+
+    if args.source == "replay":
+        provider = ReplayProvider(args.replay_file, {})
+        return {coin_id: prices for coin_id, (_, prices) in provider._series.items()}
+
+    # Live charts come at CoinGecko's resolution for the requested span
+    provider = CoinGeckoProvider()
+    coin_map = {"BTC": "bitcoin", "ETH": "ethereum", "BNB": "binancecoin", "ADA": "cardano", "SOL": "solana",
+                "DOT": "polkadot", "DOGE": "dogecoin", "AVAX": "avalanche-2", "LINK": "chainlink", "MATIC": "polygon"}
+    charts = await asyncio.gather(*(provider.get_chart(coin_map.get(symbol, symbol.lower()), args.days) for symbol in args.symbols))
+    return {symbol: np.array([point[1] for point in chart["prices"]]) for symbol, chart in zip(args.symbols, charts)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", choices=("synthetic", "replay", "coingecko"), default="synthetic")
+    parser.add_argument("--symbols", nargs="+", default=["10"],
+                        help="number of synthetic coins, or tickers for coingecko")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--step", type=int, default=300,
+                        help="seconds between points of the synthetic series, or the recording interval for replay")
+    parser.add_argument("--replay-file", help="NDJSON ticks for --source replay")
+    parser.add_argument("--timeframes", nargs="+", default=list(TIMEFRAME_MINUTES), choices=list(TIMEFRAME_MINUTES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--summary", action="store_true", help="omit per-symbol results")
+    args = parser.parse_args()
+
+    loaded = asyncio.run(load_series(args))
+    if args.source == "coingecko":
+        # CoinGecko serves 5-minute points for a day, hourly up to 90 days and daily beyond
+        args.step = 300 if args.days <= 1 else 3600 if args.days <= 90 else 86400
+    report = run_backtest(loaded, args.step, args.timeframes)
+    if args.summary:
+        report.pop("results")
+    print(json.dumps({"config": {"source": args.source, "days": args.days, "step_s": args.step,
+                                 "timeframes": args.timeframes}, **report}, indent=2))
@@ -0,0 +1,173 @@
+"""Local stand-in for the CoinGecko and auth APIs used by load tests.
+
+Serves deterministic market data and session lookups with configurable latency
+and error rates so runs are reproducible and never touch the real services.
+
+    python benchmarks/fake_upstream.py --port 8901 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+
+from aiohttp import web
+
+COINGECKO_PREFIX = "/api/v3"
+AUTH_PATH = "/auth/v1/env/oauth/session-data"
+
+# Deterministic base prices for the coins the app asks for; unknown ids get a hashed price
+BASE_PRICES = {
+    "bitcoin": 45000.0, "ethereum": 2500.0, "binancecoin": 310.0, "cardano": 0.48,
+    "solana": 98.0, "polkadot": 7.2, "dogecoin": 0.08, "avalanche-2": 36.0,
+    "chainlink": 14.5, "polygon": 0.85,
+}
+CURRENCY_RATES = {"usd": 1.0, "rub": 92.5, "eur": 0.92, "gbp": 0.79, "jpy": 148.0, "cny": 7.2, "krw": 1320.0, "inr": 83.0}
+DAYS_POINTS = {1: 288, 7: 168, 30: 180, 365: 365}
+
+
+def base_price(coin_id: str) -> float:
+    if coin_id in BASE_PRICES:
+        return BASE_PRICES[coin_id]
+    digest = int(hashlib.sha1(coin_id.encode()).hexdigest()[:8], 16)
+    return 1 + digest % 5000 / 10
+
+
+class FakeUpstream:
+    """aiohttp application imitating the upstream endpoints the backend calls"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 timeout_rate: float = 0.0, seed: int = 42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.app = web.Application(middlewares=[self._simulate])
+        self.app.router.add_get(f"{COINGECKO_PREFIX}/coins/markets", self.coins_markets)
+        self.app.router.add_get(f"{COINGECKO_PREFIX}/coins/{{coin_id}}/market_chart", self.market_chart)
+        self.app.router.add_get(f"{COINGECKO_PREFIX}/simple/price", self.simple_price)
+        self.app.router.add_get(AUTH_PATH, self.session_data)
+        self._runner = None
+
+    @web.middleware
+    async def _simulate(self, request, handler):
+        self.requests += 1
+        delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        roll = self.random.random()
+        if roll < self.timeout_rate:
+            # Longer than any client timeout the backend uses
+            await asyncio.sleep(10)
+        await asyncio.sleep(delay)
+        if roll < self.timeout_rate + self.error_rate:
+            self.errors += 1
+            return web.json_response({"error": "simulated upstream failure"}, status=self.random.choice([429, 500, 503]))
+        return await handler(request)
+
+    def _price(self, coin_id: str, currency: str) -> float:
+        # Slow deterministic drift so consecutive lookups differ slightly
+        drift = 1 + 0.01 * ((int(time.time()) // 10) % 7 - 3) / 3
+        return round(base_price(coin_id) * CURRENCY_RATES.get(currency, 1.0) * drift, 6)
+
+    async def coins_markets(self, request):
+        currency = request.query.get("vs_currency", "usd").lower()
+        ids = [coin_id for coin_id in request.query.get("ids", "").split(",") if coin_id]
+        per_page = int(request.query.get("per_page", len(ids) or 10))
+        return web.json_response([
+            {
+                "id": coin_id,
+                "symbol": coin_id[:4],
+                "name": coin_id.replace("-", " ").title(),
+                "image": "",
+                "current_price": self._price(coin_id, currency),
+                "price_change_percentage_24h": round((base_price(coin_id) * 7) % 10 - 5, 2),
+                "total_volume": base_price(coin_id) * 1e6,
+                "market_cap": base_price(coin_id) * 1e8,
+            }
+            for coin_id in ids[:per_page]
+        ])
+
+    async def market_chart(self, request):
+        coin_id = request.match_info["coin_id"]
+        days = int(request.query.get("days", 7))
+        points = DAYS_POINTS.get(days, 168)
+        step_ms = days * 86400 * 1000 // points
+        end_ms = int(time.time()) // 60 * 60 * 1000
+        rng = random.Random(f"{coin_id}:{days}:{end_ms // 3600000}")
+        price = base_price(coin_id)
+        prices, volumes, caps = [], [], []
+        for index in range(points):
+            timestamp = end_ms - (points - 1 - index) * step_ms
+            price *= 1 + rng.gauss(0, 0.004)
+            prices.append([timestamp, round(price, 6)])
+            volumes.append([timestamp, round(price * 1e6 * rng.uniform(0.8, 1.2), 2)])
+            caps.append([timestamp, round(price * 1e8, 2)])
+        return web.json_response({"prices": prices, "total_volumes": volumes, "market_caps": caps})
+
+    async def simple_price(self, request):
+        currency = request.query.get("vs_currencies", "usd").lower()
+        return web.json_response({
+            coin_id: {currency: self._price(coin_id, currency)}
+            for coin_id in request.query.get("ids", "").split(",") if coin_id
+        })
+
+    async def session_data(self, request):
+        # Any session id is valid and maps to a stable user
+        session_id = request.headers.get("X-Session-ID", "")
+        if not session_id:
+            return web.json_response({"detail": "missing session"}, status=401)
+        return web.json_response({
+            "id": f"load-{session_id}",
+            "email": f"{session_id}@load.test",
+            "name": f"Load {session_id}",
+            "picture": "",
+            "session_token": f"token-{session_id}",
+        })
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors}
+
+
+async def serve(args):
+    upstream = FakeUpstream(args.latency_ms, args.jitter_ms, args.error_rate, args.timeout_rate, args.seed)
+    base_url = await upstream.start(args.host, args.port)
+    print(f"COINGECKO_API_URL={base_url}{COINGECKO_PREFIX}")
+    print(f"AUTH_SESSION_URL={base_url}{AUTH_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await upstream.stop()
+
+
+def add_upstream_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=25.0, help="uniform +/- jitter around the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls answered with 429/5xx")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of upstream calls that hang past client timeouts")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    add_upstream_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
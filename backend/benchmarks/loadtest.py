@@ -0,0 +1,313 @@
+"""End-to-end load test of the API against local MongoDB and fake upstreams.
+
+Starts the fake CoinGecko/auth server, launches the app under uvicorn pointed at
+it and at a scratch database, signs users in through /api/auth/session, then
+drives a weighted mix of user flows at a fixed concurrency. Results are printed
+(and optionally written) as JSON with throughput and p50/p95/p99 per endpoint;
+pass --compare with an earlier result file to see the per-endpoint change.
+
+    python benchmarks/loadtest.py --concurrency 50 --duration 60 --output run.json
+    python benchmarks/loadtest.py --error-rate 0.05 --compare run.json
+    python benchmarks/loadtest.py --mix history=90,session=10   # auth latency under history load
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+from pymongo import MongoClient
+
+from fake_upstream import AUTH_PATH, COINGECKO_PREFIX, FakeUpstream, add_upstream_arguments
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SYMBOLS = ["BTC", "ETH", "BNB", "ADA", "SOL", "DOT", "DOGE", "AVAX"]
+TIMEFRAMES = ["15m", "1h", "4h"]
+CURRENCIES = ["USD", "EUR", "RUB"]
+
+
+class Recorder:
+    """Collects latency samples per endpoint label"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, http: aiohttp.ClientSession, method: str, base_url: str, path: str, label: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            async with http.request(method, base_url + path, **kwargs) as resp:
+                await resp.read()
+                status = resp.status
+        except Exception:
+            status = 0
+        self.samples[label].append(time.perf_counter() - started)
+        self.statuses[label][str(status)] += 1
+        if status == 0 or status >= 400:
+            self.errors[label] += 1
+        return status
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for label, samples in sorted(self.samples.items()):
+            latencies = np.asarray(samples) * 1000
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            endpoints[label] = {
+                "requests": len(samples),
+                "errors": self.errors[label],
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "mean_ms": round(float(latencies.mean()), 2),
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "max_ms": round(float(latencies.max()), 2),
+                "statuses": dict(self.statuses[label]),
+            }
+        return endpoints
+
+
+# User flows; each takes (recorder, http, base_url, headers, rng)
+async def dashboard_poll(recorder, http, base_url, headers, rng):
+    """What the dashboard fetches on each refresh"""
+    currency = rng.choice(CURRENCIES)
+    await asyncio.gather(
+        recorder.call(http, "GET", base_url, f"/api/crypto/prices?currency={currency}&limit=25", "GET /api/crypto/prices"),
+        recorder.call(http, "GET", base_url, "/api/ai-predictions", "GET /api/ai-predictions", headers=headers),
+        recorder.call(http, "GET", base_url, "/api/binary-predictions", "GET /api/binary-predictions", headers=headers),
+        recorder.call(http, "GET", base_url, "/api/stats/predictions", "GET /api/stats/predictions", headers=headers),
+    )
+
+
+async def dashboard_composite(recorder, http, base_url, headers, rng):
+    """The same refresh through the composite endpoint"""
+    currency = rng.choice(CURRENCIES)
+    await recorder.call(http, "GET", base_url, f"/api/dashboard?currency={currency}&limit=25", "GET /api/dashboard",
+                        headers=headers)
+
+
+async def chart_view(recorder, http, base_url, headers, rng):
+    symbol = rng.choice(SYMBOLS)
+    await recorder.call(http, "GET", base_url, f"/api/crypto/chart/{symbol}?timeframe={rng.choice(TIMEFRAMES)}",
+                        "GET /api/crypto/chart/{symbol}")
+
+
+async def manual_prediction(recorder, http, base_url, headers, rng):
+    body = {"symbol": rng.choice(SYMBOLS), "timeframe": rng.choice(TIMEFRAMES)}
+    await recorder.call(http, "POST", base_url, "/api/ai-predictions/manual", "POST /api/ai-predictions/manual",
+                        headers=headers, json=body)
+
+
+async def settings_update(recorder, http, base_url, headers, rng):
+    await recorder.call(http, "GET", base_url, "/api/user/settings", "GET /api/user/settings", headers=headers)
+    body = {"theme": rng.choice(["green", "dark", "light"]), "preferred_currency": rng.choice(CURRENCIES)}
+    await recorder.call(http, "PUT", base_url, "/api/user/settings", "PUT /api/user/settings", headers=headers, json=body)
+
+
+async def history_browse(recorder, http, base_url, headers, rng):
+    """Heavy history reads, served by the history pool"""
+    await asyncio.gather(
+        recorder.call(http, "GET", base_url, f"/api/ai-predictions/history?days={rng.choice([7, 30, 90])}",
+                      "GET /api/ai-predictions/history", headers=headers),
+        recorder.call(http, "GET", base_url, "/api/binary-predictions", "GET /api/binary-predictions", headers=headers),
+    )
+
+
+async def session_check(recorder, http, base_url, headers, rng):
+    """A bare session lookup on the primary pool; its latency should not follow the history flow"""
+    await recorder.call(http, "GET", base_url, "/api/auth/me", "GET /api/auth/me", headers=headers)
+
+
+FLOWS = {
+    "dashboard": dashboard_poll,
+    "dashboard_composite": dashboard_composite,
+    "chart": chart_view,
+    "manual_prediction": manual_prediction,
+    "settings": settings_update,
+    "history": history_browse,
+    "session": session_check,
+}
+DEFAULT_MIX = "dashboard=70,chart=15,manual_prediction=10,settings=5"
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in FLOWS:
+            raise argparse.ArgumentTypeError(f"Unknown flow {name!r}, expected one of {sorted(FLOWS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env}
+    )
+
+
+async def wait_until_ready(http: aiohttp.ClientSession, base_url: str, process, timeout: float = 30.0,
+                           interval: float = 0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"App exited during startup with code {process.returncode}")
+        try:
+            async with http.get(base_url + "/api/currencies") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(interval)
+    raise RuntimeError(f"App at {base_url} did not become ready within {timeout}s")
+
+
+async def sign_in_users(http: aiohttp.ClientSession, base_url: str, count: int) -> list:
+    """Create sessions through the real auth endpoint; the fake auth server accepts any session id"""
+    tokens = []
+    for index in range(count):
+        # Injected upstream errors also hit sign-in, so retry a few times
+        for attempt in range(5):
+            async with http.post(base_url + "/api/auth/session", json={"session_id": f"user{index}"}) as resp:
+                if resp.status == 200:
+                    tokens.append((await resp.json())["session_token"])
+                    break
+        else:
+            raise RuntimeError(f"Could not sign in load-test user {index}")
+    return tokens
+
+
+async def drive(base_url: str, tokens: list, mix: dict, concurrency: int, duration: float, warmup: float, seed: int):
+    recorder = Recorder()
+    names, weights = list(mix), list(mix.values())
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        async def virtual_user(index: int, until: float, sink: Recorder):
+            rng = random.Random(seed + index)
+            headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+            while time.monotonic() < until:
+                flow = FLOWS[rng.choices(names, weights)[0]]
+                await flow(sink, http, base_url, headers, rng)
+
+        if warmup > 0:
+            until = time.monotonic() + warmup
+            await asyncio.gather(*(virtual_user(i, until, Recorder()) for i in range(concurrency)))
+
+        started = time.monotonic()
+        await asyncio.gather(*(virtual_user(i, started + duration, recorder) for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+    return recorder, elapsed
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """Per-endpoint relative change of the headline numbers against an earlier run"""
+    changes = {}
+    for label, stats in current["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(label)
+        if not previous:
+            continue
+        changes[label] = {
+            key: round((stats[key] - previous[key]) / previous[key] * 100, 1) if previous[key] else None
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return changes
+
+
+async def main(args):
+    upstream = FakeUpstream(args.latency_ms, args.jitter_ms, args.error_rate, args.timeout_rate, args.seed)
+    upstream_url = await upstream.start()
+
+    process = None
+    base_url = args.target
+    if base_url is None:
+        # Start from an empty scratch database so runs are comparable
+        MongoClient(args.mongo_url).drop_database(args.db_name)
+        port = free_port()
+        process = start_app(port, {
+            "MONGO_URL": args.mongo_url,
+            "MONGO_DB_NAME": args.db_name,
+            "COINGECKO_API_URL": upstream_url + COINGECKO_PREFIX,
+            "AUTH_SESSION_URL": upstream_url + AUTH_PATH,
+            "GENERATION_INTERVAL_SECONDS": str(args.generation_interval),
+            "SLOW_REQUEST_THRESHOLD_MS": str(args.slow_request_ms),
+        })
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        async with aiohttp.ClientSession() as http:
+            await wait_until_ready(http, base_url, process)
+            tokens = await sign_in_users(http, base_url, args.users)
+        recorder, elapsed = await drive(base_url, tokens, args.mix, args.concurrency, args.duration, args.warmup, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=15)
+        await upstream.stop()
+
+    endpoints = recorder.summary(elapsed)
+    total = sum(stats["requests"] for stats in endpoints.values())
+    result = {
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "users": args.users,
+            "mix": args.mix,
+            "upstream": {
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate,
+                "timeout_rate": args.timeout_rate,
+            },
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": total,
+        "total_errors": sum(stats["errors"] for stats in endpoints.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "upstream": upstream.stats(),
+        "endpoints": endpoints,
+    }
+    if args.compare:
+        result["compared_to"] = str(args.compare)
+        result["change_pct"] = compare(result, json.loads(Path(args.compare).read_text()))
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", help="base URL of an already running app; skips starting one and keeps its own upstreams")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="criptex_loadtest", help="scratch database, dropped before each run")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"flow weights, default {DEFAULT_MIX}")
+    parser.add_argument("--generation-interval", type=float, default=3600.0,
+                        help="background generation interval for the app under test")
+    parser.add_argument("--slow-request-ms", type=float, default=5000.0)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    add_upstream_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
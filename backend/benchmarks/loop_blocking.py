@@ -0,0 +1,79 @@
+"""Measure event-loop blocking caused by the analysis path under concurrent load.
+
+Runs the same workload with the analysis executor in inline, thread and
+process mode while a LoopLagMonitor samples how late the loop wakes up.
+
+    python benchmarks/loop_blocking.py --requests 200 --concurrency 50 --batch 2000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis import FEATURE_COUNT, compute_technical_indicators, predict_direction_batch  # noqa: E402
+from compute_executor import EXECUTOR_MODES, ComputeExecutor  # noqa: E402
+from loop_lag import LoopLagMonitor  # noqa: E402
+
+
+def analysis_workload(prices, features):
+    """One request's CPU work: indicators for a series plus inference over a feature batch"""
+    indicators = compute_technical_indicators(prices)
+    predictions, _ = predict_direction_batch(features)
+    return indicators["rsi"], int(predictions.sum())
+
+
+async def run_mode(mode: str, requests: int, concurrency: int, series_length: int, batch: int, workers: int) -> dict:
+    rng = np.random.default_rng(42)
+    prices = list(100 + np.cumsum(rng.normal(0, 1, series_length)))
+    features = rng.random((batch, FEATURE_COUNT))
+
+    executor = ComputeExecutor(mode, workers)
+    # Warm the pool so worker start-up is not counted as blocking
+    await executor.run(analysis_workload, prices, features)
+
+    monitor = LoopLagMonitor(interval=0.005)
+    monitor.start()
+    await asyncio.sleep(0)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request():
+        async with semaphore:
+            await executor.run(analysis_workload, prices, features)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    await monitor.stop()
+    executor.shutdown()
+    return {
+        "mode": mode,
+        "requests": requests,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        **monitor.stats(),
+    }
+
+
+async def main(args):
+    results = []
+    for mode in args.modes:
+        results.append(await run_mode(mode, args.requests, args.concurrency, args.series_length, args.batch, args.workers))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=list(EXECUTOR_MODES), choices=EXECUTOR_MODES)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--series-length", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
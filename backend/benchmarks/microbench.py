@@ -0,0 +1,311 @@
+"""Micro-benchmarks for the analysis and response hot paths, with regression checks.
+
+Each case runs over synthetic data at several sizes with every upstream call
+mocked out. The best per-call time of several repeats is compared against the
+stored baseline; the run exits non-zero when any case is slower than
+baseline * (1 + tolerance).
+
+    python benchmarks/microbench.py                      # compare against baselines.json
+    python benchmarks/microbench.py --filter prices      # only cases whose name contains "prices"
+    python benchmarks/microbench.py --save-baseline      # record this machine's numbers
+
+Baselines are machine-specific; re-record them when the benchmark host changes.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import analysis  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines.json"
+SYMBOLS = ["BTC", "ETH", "BNB", "ADA", "SOL", "DOT", "DOGE", "AVAX", "LINK", "MATIC"]
+
+
+def synthetic_series(length: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return list(100 * np.exp(np.cumsum(rng.normal(0, 0.01, length))))
+
+
+def synthetic_chart(length: int, seed: int = 0) -> dict:
+    start = 1705276800000
+    prices = synthetic_series(length, seed)
+    return {
+        "prices": [[start + i * 60000, price] for i, price in enumerate(prices)],
+        "volumes": [[start + i * 60000, price * 1e6] for i, price in enumerate(prices)],
+        "market_caps": [[start + i * 60000, price * 1e8] for i, price in enumerate(prices)],
+    }
+
+
+def synthetic_sentiment(seed: int) -> dict:
+    rng = random.Random(seed)
+    return {"overall_sentiment": rng.uniform(-1, 1), "sources": [], "confidence": 0.7}
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status = 200
+        self._payload = payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def json(self):
+        return self._payload
+
+
+class FakeMarketSession:
+    """Stands in for aiohttp.ClientSession and answers every GET with a fixed payload"""
+
+    payload = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get(self, url, **kwargs):
+        return FakeResponse(self.payload)
+
+
+def load_server():
+    """Import the app with CPU work kept inline so timings measure the work, not the hand-off"""
+    import aiohttp
+    import ml
+    import server
+    from compute_executor import ComputeExecutor
+
+    ml.analysis_executor = ComputeExecutor("inline")
+    aiohttp.ClientSession = FakeMarketSession
+    return server
+
+
+# Each factory takes a size and returns a zero-argument callable (sync or async)
+def bench_compute_indicators(series_length: int) -> Callable:
+    prices = synthetic_series(series_length)
+    return lambda: analysis.compute_technical_indicators(prices)
+
+
+def bench_calculate_indicators(symbols: int) -> Callable:
+    load_server()
+    import ml
+    charts = {symbol: synthetic_chart(200, seed) for seed, symbol in enumerate(SYMBOLS)}
+
+    async def fake_chart(symbol, timeframe):
+        return charts[symbol]
+
+    ml.get_crypto_chart_data = fake_chart
+    targets = [SYMBOLS[i % len(SYMBOLS)] for i in range(symbols)]
+
+    async def run():
+        for symbol in targets:
+            await ml.calculate_technical_indicators(symbol, "1h")
+    return run
+
+
+def bench_features_inference(batch: int) -> Callable:
+    indicators = [analysis.compute_technical_indicators(synthetic_series(20, seed)) for seed in range(16)]
+    sentiments = [synthetic_sentiment(seed) for seed in range(16)]
+
+    def run():
+        rows = [analysis.build_features(indicators[i % 16], sentiments[i % 16]) for i in range(batch)]
+        return analysis.predict_direction_batch(rows)
+    return run
+
+
+def bench_ai_predict_direction(symbols: int) -> Callable:
+    load_server()
+    import ml
+    inputs = [
+        (SYMBOLS[i % len(SYMBOLS)], analysis.compute_technical_indicators(synthetic_series(20, i)), synthetic_sentiment(i))
+        for i in range(symbols)
+    ]
+
+    async def run():
+        for symbol, indicators, sentiment in inputs:
+            await ml.compute_ai_direction(symbol, "1h", indicators, sentiment)
+    return run
+
+
+def bench_prices_build(limit: int) -> Callable:
+    load_server()
+    import market
+    from response_cache import encode_json
+
+    FakeMarketSession.payload = [
+        {
+            "id": coin_id, "symbol": coin_id[:3], "name": coin_id.title(), "image": "",
+            "current_price": 100.0 + i, "price_change_percentage_24h": 1.5,
+            "total_volume": 1e9, "market_cap": 1e11,
+        }
+        for i, coin_id in enumerate(market.CRYPTO_LIST[:limit])
+    ]
+
+    async def run():
+        return encode_json(await market.fetch_crypto_prices("EUR", limit))
+    return run
+
+
+def bench_prices_cached(limit: int) -> Callable:
+    load_server()
+    import routes
+
+    async def run():
+        return await routes.get_crypto_prices("USD", limit)
+    return run
+
+
+def bench_serialize_predictions(count: int) -> Callable:
+    load_server()
+    import routes
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from signal_store import build_prediction_reference, build_signal_document, merge_prediction
+
+    now = datetime(2024, 1, 15, 12, 0)
+    predictions = []
+    for i in range(count):
+        indicators = analysis.compute_technical_indicators(synthetic_series(20, i % 32))
+        ai_result = {"direction": "UP", "confidence": 70.0, "reasoning": "Технический анализ"}
+        signal = build_signal_document(SYMBOLS[i % len(SYMBOLS)], "1h", ai_result, indicators, synthetic_sentiment(i), now)
+        reference = build_prediction_reference(signal, "user", 100.0, now, now + timedelta(hours=1))
+        predictions.append(merge_prediction(reference, signal))
+
+    def run():
+        # The endpoint serializes fresh documents each time, so the copy is part of the work
+        batch = routes.serialize_predictions([dict(prediction) for prediction in predictions])
+        return JSONResponse(content=jsonable_encoder(batch)).body
+    return run
+
+
+CASES = [
+    ("indicators.compute", "series", (20, 200, 2000), bench_compute_indicators),
+    ("indicators.calculate", "symbols", (1, 10, 50), bench_calculate_indicators),
+    ("inference.features_batch", "batch", (1, 100, 10000), bench_features_inference),
+    ("inference.ai_predict_direction", "symbols", (1, 10, 50), bench_ai_predict_direction),
+    ("prices.build", "limit", (5, 25), bench_prices_build),
+    ("prices.cached", "limit", (25,), bench_prices_cached),
+    ("serialize.predictions", "count", (50, 500, 5000), bench_serialize_predictions),
+]
+
+
+def measure(fn: Callable, loop: asyncio.AbstractEventLoop, repeats: int, min_time: float) -> float:
+    """Best per-call time over several repeats, each long enough to be above timer noise"""
+    if asyncio.iscoroutinefunction(fn):
+        def run_batch(number):
+            async def batch():
+                for _ in range(number):
+                    await fn()
+            started = time.perf_counter()
+            loop.run_until_complete(batch())
+            return time.perf_counter() - started
+    else:
+        def run_batch(number):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            return time.perf_counter() - started
+
+    # Calibrate the batch size, which also warms caches and lazy imports
+    number = 1
+    while run_batch(number) < min_time and number < 1_000_000:
+        number *= 2
+    return min(run_batch(number) / number for _ in range(repeats))
+
+
+def run_cases(selected: Callable[[str], bool], repeats: int, min_time: float) -> Dict[str, float]:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {}
+    try:
+        for name, dimension, sizes, factory in CASES:
+            for size in sizes:
+                case = f"{name}[{dimension}={size}]"
+                if not selected(case):
+                    continue
+                results[case] = measure(factory(size), loop, repeats, min_time)
+                print(f"{case:<50} {results[case] * 1e6:12.1f} us", file=sys.stderr)
+    finally:
+        loop.close()
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[dict]:
+    report = []
+    for case, seconds in results.items():
+        entry = {"case": case, "seconds": seconds, "baseline": baseline.get(case)}
+        if entry["baseline"]:
+            entry["ratio"] = round(seconds / entry["baseline"], 3)
+            entry["status"] = "regressed" if seconds > entry["baseline"] * (1 + tolerance) else "ok"
+        else:
+            entry["status"] = "new"
+        report.append(entry)
+    return report
+
+
+def host_info() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "processor": platform.processor(),
+            "numpy": np.__version__}
+
+
+def main(args) -> int:
+    results = run_cases(lambda case: args.filter in case, args.repeats, args.min_time)
+    baseline_path = Path(args.baseline)
+
+    if args.save_baseline:
+        stored = json.loads(baseline_path.read_text()) if baseline_path.exists() else {"results": {}}
+        stored["host"] = host_info()
+        stored["recorded_at"] = datetime.utcnow().isoformat(timespec="seconds")
+        stored["results"].update({case: round(seconds, 9) for case, seconds in results.items()})
+        baseline_path.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        print(f"Saved {len(results)} baselines to {baseline_path}", file=sys.stderr)
+        return 0
+
+    stored = json.loads(baseline_path.read_text()) if baseline_path.exists() else {"results": {}}
+    report = compare(results, stored["results"], args.tolerance)
+    # A slowdown only counts if it reproduces; re-measure flagged cases and keep the best time
+    for _ in range(args.confirm):
+        flagged = {entry["case"] for entry in report if entry["status"] == "regressed"}
+        if not flagged:
+            break
+        for case, seconds in run_cases(lambda case: case in flagged, args.repeats, args.min_time).items():
+            results[case] = min(results[case], seconds)
+        report = compare(results, stored["results"], args.tolerance)
+    regressed = [entry["case"] for entry in report if entry["status"] == "regressed"]
+    print(json.dumps({
+        "host": host_info(),
+        "baseline_host": stored.get("host"),
+        "tolerance": args.tolerance,
+        "regressed": regressed,
+        "cases": report,
+    }, indent=2))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--confirm", type=int, default=2, help="re-measure regressed cases this many times before failing")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per timed repeat")
+    sys.exit(main(parser.parse_args()))
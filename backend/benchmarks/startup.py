@@ -0,0 +1,192 @@
+"""Cold-start benchmark: import time and first-request latency of the app.
+
+The import phase imports server in fresh interpreters and reports the median
+time plus the heaviest modules from -X importtime. The boot phase starts the app
+under uvicorn against the fake upstreams and a scratch database, measures the
+time until it answers, then the latency of the first and second call to each
+endpoint; the first prediction is where lazily loaded ML dependencies show up.
+Both phases are compared against stored baselines like microbench.py.
+
+    python benchmarks/startup.py                         # compare against startup_baseline.json
+    python benchmarks/startup.py --save-baseline
+    ML_PRELOAD=false python benchmarks/startup.py --phase boot
+
+The boot phase needs MongoDB at --mongo-url; if signing in fails, the signed-in
+steps are reported as null.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from fake_upstream import AUTH_PATH, COINGECKO_PREFIX, FakeUpstream
+from loadtest import BACKEND_DIR, free_port, sign_in_users, start_app, wait_until_ready
+
+BASELINE_PATH = Path(__file__).resolve().parent / "startup_baseline.json"
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import server; print(time.perf_counter() - started)"
+
+# (label, method, path, needs a signed-in user, JSON body)
+FIRST_REQUESTS = [
+    ("currencies", "GET", "/api/currencies", False, None),
+    ("prices", "GET", "/api/crypto/prices?limit=25", False, None),
+    ("chart", "GET", "/api/crypto/chart/BTC?timeframe=1h", False, None),
+    ("me", "GET", "/api/auth/me", True, None),
+    ("manual_prediction", "POST", "/api/ai-predictions/manual", True, {"symbol": "BTC", "timeframe": "1h"}),
+]
+
+
+def measure_imports(repeats: int, top: int) -> dict:
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    samples, processes = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        processes.append(time.perf_counter() - started)
+        samples.append(float(output.strip().splitlines()[-1]))
+
+    # Cumulative microseconds of each module server imports directly, from one extra run
+    trace = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"], cwd=BACKEND_DIR, env=env,
+                           capture_output=True, text=True, check=True).stderr
+    heaviest = []
+    for line in trace.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)", line)
+        if match and len(match.group(2)) == 2:
+            heaviest.append((int(match.group(1)), match.group(3)))
+    heaviest.sort(reverse=True)
+
+    return {
+        "import_s": round(statistics.median(samples), 4),
+        "process_s": round(statistics.median(processes), 4),
+        "heaviest_imports_ms": {name: round(micros / 1000, 1) for micros, name in heaviest[:top]},
+    }
+
+
+async def measure_boot(args, upstream_url: str) -> dict:
+    try:
+        MongoClient(args.mongo_url, serverSelectionTimeoutMS=2000).drop_database(args.db_name)
+    except PyMongoError:
+        pass
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = start_app(port, {
+        "MONGO_URL": args.mongo_url,
+        "MONGO_DB_NAME": args.db_name,
+        "COINGECKO_API_URL": upstream_url + COINGECKO_PREFIX,
+        "AUTH_SESSION_URL": upstream_url + AUTH_PATH,
+        "GENERATION_INTERVAL_SECONDS": "3600",
+        "SENTIMENT_SOURCES": "",
+    })
+    try:
+        async with aiohttp.ClientSession() as http:
+            await wait_until_ready(http, base_url, process, interval=0.01)
+            result = {"ready_s": time.perf_counter() - started}
+
+            headers = None
+            try:
+                headers = {"Authorization": f"Bearer {(await sign_in_users(http, base_url, 1))[0]}"}
+            except (RuntimeError, aiohttp.ClientError):
+                pass
+
+            for attempt in ("first", "second"):
+                for label, method, path, signed_in, body in FIRST_REQUESTS:
+                    key = f"{label}_{attempt}_ms"
+                    if signed_in and headers is None:
+                        result[key] = None
+                        continue
+                    request_started = time.perf_counter()
+                    async with http.request(method, base_url + path, json=body, headers=headers) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            raise RuntimeError(f"{method} {path} returned {resp.status}")
+                    result[key] = (time.perf_counter() - request_started) * 1000
+        return result
+    finally:
+        process.terminate()
+        process.wait(timeout=15)
+
+
+async def run_boots(args) -> dict:
+    upstream = FakeUpstream(args.latency_ms, 0.0, 0.0, 0.0, 0)
+    upstream_url = await upstream.start()
+    try:
+        runs = [await measure_boot(args, upstream_url) for _ in range(args.repeats)]
+    finally:
+        await upstream.stop()
+
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = round(statistics.median(values), 4 if key.endswith("_s") else 2) if values else None
+    return summary
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> dict:
+    report = {}
+    for key, value in results.items():
+        previous = baseline.get(key)
+        if not isinstance(value, (int, float)) or not previous:
+            continue
+        report[key] = {
+            "value": value,
+            "baseline": previous,
+            "ratio": round(value / previous, 3),
+            "status": "regressed" if value > previous * (1 + tolerance) else "ok",
+        }
+    return report
+
+
+def main(args) -> int:
+    results = {}
+    if args.phase in ("all", "import"):
+        results.update(measure_imports(args.repeats, args.top))
+    if args.phase in ("all", "boot"):
+        results.update(asyncio.run(run_boots(args)))
+    heaviest = results.pop("heaviest_imports_ms", None)
+
+    baseline_path = Path(args.baseline)
+    stored = json.loads(baseline_path.read_text()) if baseline_path.exists() else {"results": {}}
+    if args.save_baseline:
+        stored["recorded_at"] = datetime.utcnow().isoformat(timespec="seconds")
+        stored["python"] = sys.version.split()[0]
+        stored["results"].update(results)
+        baseline_path.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        print(f"Saved {len(results)} startup baselines to {baseline_path}", file=sys.stderr)
+
+    report = compare(results, stored["results"], args.tolerance)
+    regressed = [key for key, entry in report.items() if entry["status"] == "regressed"]
+    print(json.dumps({
+        "results": results,
+        "heaviest_imports_ms": heaviest,
+        "tolerance": args.tolerance,
+        "regressed": regressed,
+        "compared": report,
+    }, indent=2))
+    return 1 if regressed and not args.save_baseline else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--phase", choices=("all", "import", "boot"), default="all")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh processes per phase; medians are reported")
+    parser.add_argument("--top", type=int, default=10, help="heaviest top-level imports to list")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="criptex_startup", help="scratch database, dropped before each boot")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake upstream latency")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown as a fraction of the baseline")
+    sys.exit(main(parser.parse_args()))
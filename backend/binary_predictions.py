@@ -0,0 +1,101 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+BINARY_TIMEFRAME_MINUTES = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60, "4h": 240, "1d": 1440}
+BINARY_DIRECTIONS = ("UP", "DOWN")
+MAX_STAKE_AMOUNT = 3
+
+
+class BinaryPredictionError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def validate_binary_prediction(direction: str, timeframe: str, stake_amount) -> int:
+    if direction not in BINARY_DIRECTIONS:
+        raise BinaryPredictionError(400, "Direction must be UP or DOWN")
+    if timeframe not in BINARY_TIMEFRAME_MINUTES:
+        raise BinaryPredictionError(400, "Unsupported timeframe")
+    try:
+        stake_amount = int(stake_amount)
+    except (TypeError, ValueError):
+        raise BinaryPredictionError(400, "Invalid stake amount")
+    if not 1 <= stake_amount <= MAX_STAKE_AMOUNT:
+        raise BinaryPredictionError(400, f"Stake amount must be between 1 and {MAX_STAKE_AMOUNT}")
+    return stake_amount
+
+
+async def debit_free_predictions(db, user_id: str, amount: int) -> Optional[int]:
+    """Debit free predictions in one conditional update.
+
+    Returns the remaining balance, or None when the balance is insufficient.
+    The balance check is part of the filter, so concurrent debits cannot overdraw.
+    """
+    previous = await db.users.find_one_and_update(
+        {"id": user_id, "free_predictions": {"$gte": amount}},
+        {"$inc": {"free_predictions": -amount, "total_predictions_used": amount}},
+        projection={"_id": 0, "free_predictions": 1}
+    )
+    if not previous:
+        return None
+    return previous["free_predictions"] - amount
+
+
+async def refund_free_predictions(db, user_id: str, amount: int):
+    await db.users.update_one(
+        {"id": user_id},
+        {"$inc": {"free_predictions": amount, "total_predictions_used": -amount}}
+    )
+
+
+async def create_binary_prediction(
+    db,
+    user_id: str,
+    symbol: str,
+    direction: str,
+    timeframe: str,
+    stake_amount: int,
+    entry_price: Callable[[], Awaitable[float]],
+    confidence_score: float,
+    currency: str = "USD",
+    extra: Optional[dict] = None,
+) -> dict:
+    """Debit the stake and insert the prediction.
+
+    The stake is refunded if the insert fails, so credits are never lost.
+    """
+    remaining = await debit_free_predictions(db, user_id, stake_amount)
+    if remaining is None:
+        raise BinaryPredictionError(400, "Not enough free predictions")
+
+    try:
+        now = datetime.utcnow()
+        prediction_data = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "symbol": symbol,
+            "direction": direction,
+            "timeframe": timeframe,
+            "entry_price": await entry_price(),
+            "currency": currency,
+            "entry_time": now,
+            "expiry_time": now + timedelta(minutes=BINARY_TIMEFRAME_MINUTES[timeframe]),
+            "stake_amount": stake_amount,
+            "confidence_score": confidence_score,
+            "status": "ACTIVE",
+            "result_price": None,
+            "created_at": now,
+            "is_free": True,
+        }
+        if extra:
+            prediction_data.update(extra)
+        await db.binary_predictions.insert_one(prediction_data)
+    except Exception:
+        await refund_free_predictions(db, user_id, stake_amount)
+        raise
+
+    prediction_data.pop("_id", None)
+    return prediction_data
@@ -0,0 +1,166 @@
+"""OHLCV candles resampled from the market data provider's line charts.
+
+Chart points are binned into fixed buckets in one NumPy pass: bucket ids come
+from integer division of the timestamps, bucket boundaries from where the id
+changes, and open/high/low/close from reduceat over those boundaries. Every
+bucket but the newest is followed by later points, so it is complete and kept
+for good; only the newest (open) candle is recomputed on each request.
+
+Candles can be no finer than the chart points: one-day charts have 5 minute
+points, so 1m candles are single points at that cadence. Hourly candles are
+binned from that day too; a new series is backfilled from a month of hourly
+points before it, which make flat candles. Chart volumes are rolling 24 hour
+totals, so a candle's volume is their mean spread over the bucket's length.
+"""
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CANDLE_TIMEFRAMES = {
+    "1m": 60, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "4h": 14400, "1d": 86400,
+}
+# Chart window each timeframe is built from: 5 minute points for intraday buckets, hourly above
+CANDLE_SOURCE_DAYS = {
+    "1m": 1, "5m": 1, "15m": 1, "30m": 1,
+    "1h": 1, "4h": 30, "1d": 90,
+}
+# Coarser, longer window a new series starts from, so it has more candles than the detailed window holds
+CANDLE_BACKFILL_DAYS = {"1h": 30}
+CANDLE_MAX_CACHED = int(os.environ.get('CANDLE_MAX_CACHED', 2000))
+
+CANDLE_FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+
+def bin_candles(timestamps: np.ndarray, prices: np.ndarray, volumes: Optional[np.ndarray], interval: int) -> np.ndarray:
+    """Candles of interval seconds from points sorted by timestamp (seconds).
+
+    Returns one row per bucket that has points: bucket start, open, high, low,
+    close, volume.
+    """
+    if not len(timestamps):
+        return np.empty((0, len(CANDLE_FIELDS)))
+    buckets = (timestamps // interval).astype(np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.append(starts[1:], len(timestamps))
+
+    if volumes is None or len(volumes) != len(prices):
+        volume = np.full(len(starts), np.nan)
+    else:
+        volume = np.add.reduceat(volumes, starts) / (ends - starts) * interval / 86400
+
+    return np.column_stack((
+        buckets[starts] * interval,
+        prices[starts],
+        np.maximum.reduceat(prices, starts),
+        np.minimum.reduceat(prices, starts),
+        prices[ends - 1],
+        volume,
+    ))
+
+
+def chart_series(chart: dict) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """Timestamps (seconds), prices and volumes of a chart's finite points; volumes None if missing"""
+    points = np.asarray(chart.get("prices") or [], dtype=float).reshape(-1, 2)
+    volumes = np.asarray(chart.get("total_volumes") or [], dtype=float).reshape(-1, 2)
+    valid = np.isfinite(points[:, 1])
+    volume = volumes[:, 1][valid] if len(volumes) == len(points) else None
+    return points[valid, 0] / 1000, points[valid, 1], volume
+
+
+def format_candles(rows: np.ndarray, currency_rate: float = 1.0) -> list:
+    """Candle rows as dicts with millisecond times and prices and volumes in the currency"""
+    values = rows[:, 1:] * currency_rate
+    candles = []
+    for time, (open_, high, low, close, volume) in zip((rows[:, 0] * 1000).astype(np.int64).tolist(), values.tolist()):
+        candles.append({
+            "time": time, "open": open_, "high": high, "low": low, "close": close,
+            "volume": None if volume != volume else volume,
+        })
+    return candles
+
+
+class CandleSeries:
+    """Completed candles of one coin and timeframe plus the open one"""
+
+    def __init__(self, interval: int, max_cached: int = CANDLE_MAX_CACHED):
+        self.interval = interval
+        self.max_cached = max_cached
+        self.closed = np.empty((0, len(CANDLE_FIELDS)))
+        self.open: Optional[np.ndarray] = None
+
+    @property
+    def next_start(self) -> Optional[float]:
+        """Start of the first bucket not yet closed"""
+        return self.closed[-1, 0] + self.interval if len(self.closed) else None
+
+    def update(self, timestamps: np.ndarray, prices: np.ndarray, volumes: Optional[np.ndarray]):
+        if not len(timestamps):
+            return
+        next_start = self.next_start
+        if next_start is None or timestamps[0] > next_start:
+            # The chart window starts mid-bucket (and after a long pause, past the cached candles);
+            # a partial first bucket would otherwise be kept as a closed candle
+            next_start = -(-timestamps[0] // self.interval) * self.interval
+        # Only points from the first unclosed bucket on are binned
+        start = np.searchsorted(timestamps, next_start)
+        candles = bin_candles(timestamps[start:], prices[start:], volumes[start:] if volumes is not None else None,
+                              self.interval)
+        if not len(candles):
+            return
+        self.closed = np.concatenate((self.closed, candles[:-1]))[-self.max_cached:]
+        self.open = candles[-1]
+
+    def candles(self, limit: int) -> np.ndarray:
+        rows = self.closed if self.open is None else np.concatenate((self.closed, self.open[None, :]))
+        return rows[-limit:] if limit > 0 else rows[:0]
+
+
+class CandleStore:
+    """CandleSeries per (coin id, timeframe), refreshed from charts on request"""
+
+    def __init__(self, get_chart: Callable[[str, int], Awaitable[dict]]):
+        self.get_chart = get_chart
+        self.series: Dict[Tuple[str, str], CandleSeries] = {}
+
+    async def get(self, coin_id: str, timeframe: str, limit: int = 200) -> Tuple[np.ndarray, bool]:
+        """Latest candles and whether the last one is still open; cached candles if the chart fetch fails"""
+        key = (coin_id, timeframe)
+        series = self.series.get(key)
+        try:
+            timestamps, prices, volumes = chart_series(await self.get_chart(coin_id, CANDLE_SOURCE_DAYS[timeframe]))
+        except Exception as e:
+            logger.warning(f"Serving cached {timeframe} candles for {coin_id}: {e}")
+            if series is None:
+                return np.empty((0, len(CANDLE_FIELDS))), False
+            return series.candles(limit), series.open is not None
+
+        # Series are only kept for coins the chart source knows
+        if series is None:
+            series = self.series[key] = CandleSeries(CANDLE_TIMEFRAMES[timeframe])
+            if timeframe in CANDLE_BACKFILL_DAYS and len(timestamps):
+                timestamps, prices, volumes = await self._backfill(coin_id, timeframe, timestamps, prices, volumes)
+        series.update(timestamps, prices, volumes)
+        return series.candles(limit), series.open is not None
+
+    async def _backfill(self, coin_id: str, timeframe: str, timestamps: np.ndarray, prices: np.ndarray,
+                        volumes: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """Prepend the backfill window's points from before the detailed ones"""
+        try:
+            older_timestamps, older_prices, older_volumes = chart_series(
+                await self.get_chart(coin_id, CANDLE_BACKFILL_DAYS[timeframe])
+            )
+        except Exception as e:
+            logger.warning(f"No {timeframe} candle backfill for {coin_id}: {e}")
+            return timestamps, prices, volumes
+        older = older_timestamps < timestamps[0]
+        if volumes is None or older_volumes is None:
+            volumes = None
+        else:
+            volumes = np.concatenate((older_volumes[older], volumes))
+        return (np.concatenate((older_timestamps[older], timestamps)),
+                np.concatenate((older_prices[older], prices)), volumes)
@@ -0,0 +1,55 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import analysis
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_EXECUTOR = os.environ.get('ANALYSIS_EXECUTOR', 'thread')
+ANALYSIS_EXECUTOR_WORKERS = int(os.environ.get('ANALYSIS_EXECUTOR_WORKERS', min(4, os.cpu_count() or 1)))
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+
+class ComputeExecutor:
+    """Runs CPU-bound analysis away from the event loop.
+
+    inline  - run on the event loop (previous behaviour, useful for comparison)
+    thread  - thread pool; effective for NumPy/sklearn calls that release the GIL
+    process - process pool whose workers are initialised with the parent's model
+    """
+
+    def __init__(self, mode: str = ANALYSIS_EXECUTOR, workers: int = ANALYSIS_EXECUTOR_WORKERS):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode {mode!r}, expected one of {EXECUTOR_MODES}")
+        self.mode = mode
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+            else:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=analysis.set_model,
+                    initargs=analysis.get_model()
+                )
+            logger.info(f"Started {self.mode} analysis executor with {self.workers} workers")
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        if self.mode == "inline":
+            return fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
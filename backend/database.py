@@ -0,0 +1,75 @@
+import os
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import metrics
+from metrics import MongoCommandMetrics, MongoPoolMetrics
+
+load_dotenv()
+
+# MongoDB connection; Motor connects on the first operation, so building the clients is cheap
+MONGO_URL = os.environ.get('MONGO_URL')
+MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', 'criptex')
+
+# Each workload has its own client and so its own connection pool: a burst of history
+# reads queues on the history pool and never delays session lookups or credit writes
+MONGO_PRIMARY_POOL_SIZE = int(os.environ.get('MONGO_PRIMARY_POOL_SIZE', 50))
+MONGO_PRIMARY_MIN_POOL_SIZE = int(os.environ.get('MONGO_PRIMARY_MIN_POOL_SIZE', 5))
+MONGO_HISTORY_POOL_SIZE = int(os.environ.get('MONGO_HISTORY_POOL_SIZE', 20))
+MONGO_HISTORY_WAIT_TIMEOUT_MS = int(os.environ.get('MONGO_HISTORY_WAIT_TIMEOUT_MS', 2000))
+# MongoDB refuses values under 90 seconds
+MONGO_HISTORY_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_HISTORY_MAX_STALENESS_SECONDS', 90))
+MONGO_OWN_HISTORY_POOL_SIZE = int(os.environ.get('MONGO_OWN_HISTORY_POOL_SIZE', 20))
+MONGO_BACKGROUND_POOL_SIZE = int(os.environ.get('MONGO_BACKGROUND_POOL_SIZE', 20))
+
+command_metrics = MongoCommandMetrics()
+pool_metrics = {}
+
+def create_client(workload: str, **options) -> AsyncIOMotorClient:
+    """Client with its own pool, reporting command latency and pool wait time under the workload name"""
+    pool_metrics[workload] = MongoPoolMetrics(workload)
+    metrics.register_gauge(
+        f"mongo_{workload}_pool_checked_out", f"Connections checked out of the {workload} MongoDB pool",
+        lambda: pool_metrics[workload].checked_out
+    )
+    return AsyncIOMotorClient(
+        MONGO_URL,
+        appname=f"criptex-{workload}",
+        event_listeners=[command_metrics, pool_metrics[workload]],
+        **options
+    )
+
+# Sessions, users and free-prediction credits: read from the primary, writes acknowledged by a journaled majority
+client = create_client(
+    "primary",
+    maxPoolSize=MONGO_PRIMARY_POOL_SIZE,
+    minPoolSize=MONGO_PRIMARY_MIN_POOL_SIZE,
+    w="majority",
+    journal=True
+)
+db = client[MONGO_DB_NAME]
+
+# Prediction rollups and history: a secondary at most MONGO_HISTORY_MAX_STALENESS_SECONDS behind, else the primary
+history_client = create_client(
+    "history",
+    maxPoolSize=MONGO_HISTORY_POOL_SIZE,
+    waitQueueTimeoutMS=MONGO_HISTORY_WAIT_TIMEOUT_MS,
+    readPreference="secondaryPreferred",
+    maxStalenessSeconds=MONGO_HISTORY_MAX_STALENESS_SECONDS
+)
+history_db = history_client[MONGO_DB_NAME]
+
+# A user's own predictions and stats: read from the primary so they include what was just written, but from
+# a pool of their own so listing history never holds connections that sessions and credit debits need
+own_history_client = create_client(
+    "own_history",
+    maxPoolSize=MONGO_OWN_HISTORY_POOL_SIZE,
+    waitQueueTimeoutMS=MONGO_HISTORY_WAIT_TIMEOUT_MS,
+    readPreference="primaryPreferred"
+)
+own_history_db = own_history_client[MONGO_DB_NAME]
+
+# Generated signals, buffered prediction writes, retention and sentiment: all retried or regenerated, so w=1
+background_client = create_client("background", maxPoolSize=MONGO_BACKGROUND_POOL_SIZE, w=1)
+background_db = background_client[MONGO_DB_NAME]
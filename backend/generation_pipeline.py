@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from structured_logging import log_event
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, error: bool = False):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if error:
+            self.errors += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_seconds / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+class Stage:
+    """One pipeline step: reads items from a bounded queue and runs handler on up to `concurrency` at once.
+
+    A handler returning None drops the item; anything else is passed to the next stage.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Any]], concurrency: int, queue_size: int = 1000):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.input: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.stats = StageStats()
+
+    async def run(self, output: Optional[asyncio.Queue]):
+        tasks = set()
+        try:
+            while True:
+                item = await self.input.get()
+                await self.semaphore.acquire()
+                task = asyncio.create_task(self._process(item, output))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _process(self, item, output: Optional[asyncio.Queue]):
+        started = time.perf_counter()
+        try:
+            result = await self.handler(item)
+            self.stats.record(time.perf_counter() - started)
+            # Waiting here while holding the semaphore is what propagates backpressure upstream
+            if output is not None and result is not None:
+                await output.put(result)
+        except Exception as e:
+            self.stats.record(time.perf_counter() - started, error=True)
+            logger.error(f"Error in {self.name} stage: {e}", extra=log_event("pipeline.stage_error", stage=self.name))
+        finally:
+            self.semaphore.release()
+            self.input.task_done()
+
+
+class Pipeline:
+    """Chain of stages connected by bounded queues"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+
+    async def run(self, source: AsyncIterable) -> dict:
+        started = time.perf_counter()
+        runners = [
+            asyncio.create_task(stage.run(self.stages[i + 1].input if i + 1 < len(self.stages) else None))
+            for i, stage in enumerate(self.stages)
+        ]
+        produced = 0
+        try:
+            async for item in source:
+                await self.stages[0].input.put(item)
+                produced += 1
+            # A stage is drained once its queue is joined, after every upstream stage is drained
+            for stage in self.stages:
+                await stage.input.join()
+        finally:
+            for runner in runners:
+                runner.cancel()
+            await asyncio.gather(*runners, return_exceptions=True)
+
+        return {
+            "items": produced,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "stages": {stage.name: stage.stats.as_dict() for stage in self.stages},
+        }
+
+
+class SharedResults:
+    """Single-flight results for one cycle: concurrent requests for the same key share one call"""
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def get(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(factory())
+        return asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._tasks)
@@ -0,0 +1,123 @@
+"""Idempotency-Key handling for endpoints that create something.
+
+The first request with a key claims it by inserting a pending record; the
+unique (user_id, key) index makes concurrent claims race safely across workers.
+When the request succeeds its response is stored on the record, and retries
+with the same key get that response back instead of running again. A request
+that fails before creating anything releases the key so it can be retried.
+
+A pending claim holds a lease of IDEMPOTENCY_LEASE_SECONDS. Once the lease runs
+out (the worker died, or storing the response failed) a retry takes the claim
+over. The id of the created resource is recorded on the claim before it is
+written, so the retry can look for that resource instead of creating a second one.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def request_fingerprint(route: str, payload: dict) -> str:
+    encoded = json.dumps({"route": route, "payload": payload}, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+async def ensure_idempotency_indexes(db):
+    await db.idempotency_keys.create_index([("user_id", ASCENDING), ("key", ASCENDING)], unique=True)
+    await db.idempotency_keys.create_index("created_at", expireAfterSeconds=int(IDEMPOTENCY_KEY_TTL_HOURS * 3600))
+
+
+async def claim_idempotency_key(db, user_id: str, key: str, fingerprint: str,
+                                now: Optional[datetime] = None) -> Optional[dict]:
+    """Claim key for a request; returns the earlier attempt's record, if any.
+
+    None means a new claim. A completed record carries the stored response. A
+    pending record means its lease ran out and the claim was taken over; its
+    resource_id, if set, is what the earlier attempt may already have created.
+    """
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise IdempotencyError(400, f"Idempotency-Key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+    now = now or datetime.utcnow()
+    lease_expires_at = now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+    try:
+        await db.idempotency_keys.insert_one({
+            "user_id": user_id,
+            "key": key,
+            "fingerprint": fingerprint,
+            "status": "pending",
+            "resource_id": None,
+            "response": None,
+            "created_at": now,
+            "lease_expires_at": lease_expires_at,
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    record = await db.idempotency_keys.find_one({"user_id": user_id, "key": key}, {"_id": 0})
+    if record is None or record["created_at"] < now - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS):
+        # Expired between the insert and the read, or awaiting the TTL monitor; take it over
+        await db.idempotency_keys.delete_one({"user_id": user_id, "key": key})
+        return await claim_idempotency_key(db, user_id, key, fingerprint, now)
+    if record["fingerprint"] != fingerprint:
+        raise IdempotencyError(422, "Idempotency-Key was already used with a different request")
+    if record["status"] == "completed":
+        return record
+
+    previous_lease = record.get("lease_expires_at")
+    if (previous_lease or record["created_at"] + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)) > now:
+        raise IdempotencyError(409, "A request with this Idempotency-Key is still in progress")
+    # Compare-and-set on the lease, so only one retry takes a stale claim over
+    taken_over = await db.idempotency_keys.find_one_and_update(
+        {"user_id": user_id, "key": key, "status": "pending", "lease_expires_at": previous_lease},
+        {"$set": {"lease_expires_at": lease_expires_at}},
+        projection={"_id": 0}
+    )
+    if taken_over is None:
+        raise IdempotencyError(409, "A request with this Idempotency-Key is still in progress")
+    return taken_over
+
+
+async def record_idempotency_resource(db, user_id: str, key: str, resource_id: str):
+    """Note the id of what the claiming request is about to create"""
+    await db.idempotency_keys.update_one(
+        {"user_id": user_id, "key": key, "status": "pending"},
+        {"$set": {"resource_id": resource_id}}
+    )
+
+
+async def complete_idempotency_key(db, user_id: str, key: str, response: dict):
+    """Store the response for retries; on failure the claim stays pending until its lease runs out"""
+    try:
+        await db.idempotency_keys.update_one(
+            {"user_id": user_id, "key": key},
+            {"$set": {"status": "completed", "response": response}}
+        )
+    except Exception as e:
+        logger.error(f"Error completing idempotency key for {user_id}: {e}")
+
+
+async def release_idempotency_key(db, user_id: str, key: str):
+    """Forget a claim whose request failed, so a retry runs again"""
+    try:
+        await db.idempotency_keys.delete_one({"user_id": user_id, "key": key, "status": "pending"})
+    except Exception as e:
+        logger.error(f"Error releasing idempotency key for {user_id}: {e}")
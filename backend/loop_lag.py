@@ -0,0 +1,64 @@
+import asyncio
+import time
+from typing import Callable, Optional
+
+
+class LoopLagMonitor:
+    """Measures event-loop blocking by how late a periodic sleep wakes up"""
+
+    def __init__(self, interval: float = 0.01, observer: Optional[Callable[[float], None]] = None):
+        self.interval = interval
+        self.observer = observer
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self._sleep_started: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # A loop blocked until now never woke the sampler, so count the pending interval too
+        if self._sleep_started is not None:
+            self._record(time.perf_counter() - self._sleep_started - self.interval)
+            self._sleep_started = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def reset(self):
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+
+    def _record(self, lag: float):
+        lag = max(0.0, lag)
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        self.last_lag = lag
+        if self.observer is not None:
+            self.observer(lag)
+
+    async def _run(self):
+        while True:
+            self._sleep_started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self._record(time.perf_counter() - self._sleep_started - self.interval)
+            self._sleep_started = None
+
+    def stats(self) -> dict:
+        return {
+            "samples": self.samples,
+            "avg_lag_ms": round(self.total_lag / self.samples * 1000, 3) if self.samples else 0.0,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "total_lag_ms": round(self.total_lag * 1000, 3),
+        }
@@ -0,0 +1,398 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+import metrics
+from candles import CandleStore
+from market_data import create_market_data_provider
+from market_snapshot import SharedMarketSnapshot
+from price_snapshot import PriceSnapshot
+from recommendations import RecommendationEngine
+from request_timing import timed
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Pre-encoded response cache for public market endpoints
+response_cache = ResponseCache(max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 512)))
+PRICES_CACHE_TTL = float(os.environ.get('PRICES_CACHE_TTL', 60))
+RECOMMENDATIONS_CACHE_TTL = float(os.environ.get('RECOMMENDATIONS_CACHE_TTL', 300))
+RECOMMENDATIONS_REFRESH_INTERVAL = float(os.environ.get('RECOMMENDATIONS_REFRESH_INTERVAL', 900))
+CHART_CACHE_TTL = float(os.environ.get('CHART_CACHE_TTL', 60))
+CHART_BATCH_MAX_SYMBOLS = int(os.environ.get('CHART_BATCH_MAX_SYMBOLS', 20))
+
+# Latest USD prices shared by request paths that need an entry price
+price_snapshot = PriceSnapshot(max_age=PRICES_CACHE_TTL * 2)
+
+metrics.register_gauge("response_cache_hit_ratio", "Hit ratio of the pre-encoded response cache", lambda: response_cache.stats()["hit_ratio"])
+metrics.register_gauge("response_cache_bytes_saved", "Response bytes served from cache without re-encoding", lambda: response_cache.bytes_saved)
+
+# Extended crypto data with all major cryptocurrencies
+CRYPTO_LIST = [
+    "bitcoin", "ethereum", "binancecoin", "cardano", "solana", "polkadot", "dogecoin", 
+    "avalanche-2", "chainlink", "polygon", "litecoin", "bitcoin-cash", "ethereum-classic",
+    "stellar", "vechain", "tron", "cosmos", "algorand", "tezos", "monero", "dash",
+    "zcash", "decred", "qtum", "icon", "ontology", "neo", "waves", "stratis",
+    "ripple", "eos", "iota", "nem", "omisego", "basic-attention-token", "0x",
+    "zilliqa", "enjincoin", "maker", "compound", "aave", "uniswap", "sushiswap",
+    "pancakeswap-token", "1inch", "yearn-finance", "curve-dao-token", "synthetix",
+    "uma", "balancer", "kyber-network-crystal", "loopring", "bancor", "ren",
+    "storj", "filecoin", "siacoin", "arweave", "ocean-protocol", "nucypher",
+    "the-graph", "livepeer", "audius", "theta-token", "helium", "holo",
+    "flow", "near", "harmony", "fantom", "celo", "elrond-erd-2", "terra-luna",
+    "thorchain", "secret", "kava", "band-protocol", "injective-protocol",
+    "serum", "raydium", "orca", "marinade", "step-finance", "star-atlas",
+    "gensokishi-metaverse", "shiba-inu", "pepe", "floki", "baby-doge-coin",
+    "safemoon", "bonk", "wojak", "meme", "doge-killer"
+]
+
+# CoinGecko ids of the tickers used by charts and price lookups
+COIN_IDS = {
+    "BTC": "bitcoin", "ETH": "ethereum", "BNB": "binancecoin",
+    "ADA": "cardano", "SOL": "solana", "DOT": "polkadot",
+    "DOGE": "dogecoin", "AVAX": "avalanche-2", "LINK": "chainlink",
+    "MATIC": "polygon"
+}
+
+def coin_id_for(symbol: str) -> str:
+    return COIN_IDS.get(symbol.upper(), symbol.lower())
+
+# Currency pairs and conversion rates
+CURRENCY_RATES = {
+    "USD": 1.0,
+    "RUB": 92.5,
+    "EUR": 0.85,
+    "GBP": 0.73,
+    "JPY": 110.0,
+    "CNY": 6.4,
+    "KRW": 1200.0,
+    "INR": 74.5
+}
+
+# Comprehensive mock data for all major cryptocurrencies
+MOCK_CRYPTO_DATA = [
+    {"id": "bitcoin", "symbol": "BTC", "name": "Bitcoin", "current_price": 45230.50, "price_change_percentage_24h": 2.85, "volume_24h": 15420000000, "market_cap": 890000000000, "icon": "bitcoin"},
+    {"id": "ethereum", "symbol": "ETH", "name": "Ethereum", "current_price": 2845.75, "price_change_percentage_24h": -2.91, "volume_24h": 8230000000, "market_cap": 342000000000, "icon": "ethereum"},
+    {"id": "binancecoin", "symbol": "BNB", "name": "BNB", "current_price": 312.40, "price_change_percentage_24h": 4.27, "volume_24h": 1250000000, "market_cap": 46800000000, "icon": "binancecoin"},
+    {"id": "cardano", "symbol": "ADA", "name": "Cardano", "current_price": 0.485, "price_change_percentage_24h": 6.13, "volume_24h": 420000000, "market_cap": 17200000000, "icon": "cardano"},
+    {"id": "solana", "symbol": "SOL", "name": "Solana", "current_price": 98.75, "price_change_percentage_24h": -3.38, "volume_24h": 1850000000, "market_cap": 45600000000, "icon": "solana"},
+    {"id": "polkadot", "symbol": "DOT", "name": "Polkadot", "current_price": 15.85, "price_change_percentage_24h": 1.25, "volume_24h": 380000000, "market_cap": 18500000000, "icon": "polkadot"},
+    {"id": "dogecoin", "symbol": "DOGE", "name": "Dogecoin", "current_price": 0.085, "price_change_percentage_24h": 8.45, "volume_24h": 850000000, "market_cap": 12000000000, "icon": "dogecoin"},
+    {"id": "avalanche-2", "symbol": "AVAX", "name": "Avalanche", "current_price": 28.50, "price_change_percentage_24h": -1.85, "volume_24h": 680000000, "market_cap": 11500000000, "icon": "avalanche-2"},
+    {"id": "chainlink", "symbol": "LINK", "name": "Chainlink", "current_price": 18.75, "price_change_percentage_24h": 3.25, "volume_24h": 485000000, "market_cap": 10800000000, "icon": "chainlink"},
+    {"id": "polygon", "symbol": "MATIC", "name": "Polygon", "current_price": 0.95, "price_change_percentage_24h": 5.85, "volume_24h": 425000000, "market_cap": 9200000000, "icon": "polygon"},
+    {"id": "litecoin", "symbol": "LTC", "name": "Litecoin", "current_price": 85.40, "price_change_percentage_24h": 2.15, "volume_24h": 380000000, "market_cap": 6400000000, "icon": "litecoin"},
+    {"id": "bitcoin-cash", "symbol": "BCH", "name": "Bitcoin Cash", "current_price": 285.50, "price_change_percentage_24h": 1.85, "volume_24h": 185000000, "market_cap": 5600000000, "icon": "bitcoin-cash"},
+    {"id": "stellar", "symbol": "XLM", "name": "Stellar", "current_price": 0.125, "price_change_percentage_24h": 4.25, "volume_24h": 125000000, "market_cap": 3200000000, "icon": "stellar"},
+    {"id": "vechain", "symbol": "VET", "name": "VeChain", "current_price": 0.045, "price_change_percentage_24h": 6.85, "volume_24h": 85000000, "market_cap": 3100000000, "icon": "vechain"},
+    {"id": "tron", "symbol": "TRX", "name": "TRON", "current_price": 0.085, "price_change_percentage_24h": 3.45, "volume_24h": 485000000, "market_cap": 7800000000, "icon": "tron"},
+    {"id": "cosmos", "symbol": "ATOM", "name": "Cosmos", "current_price": 12.85, "price_change_percentage_24h": 2.85, "volume_24h": 185000000, "market_cap": 3800000000, "icon": "cosmos"},
+    {"id": "algorand", "symbol": "ALGO", "name": "Algorand", "current_price": 0.285, "price_change_percentage_24h": 4.85, "volume_24h": 125000000, "market_cap": 2200000000, "icon": "algorand"},
+    {"id": "tezos", "symbol": "XTZ", "name": "Tezos", "current_price": 1.85, "price_change_percentage_24h": 1.85, "volume_24h": 85000000, "market_cap": 1800000000, "icon": "tezos"},
+    {"id": "monero", "symbol": "XMR", "name": "Monero", "current_price": 165.50, "price_change_percentage_24h": -0.85, "volume_24h": 125000000, "market_cap": 3000000000, "icon": "monero"},
+    {"id": "ripple", "symbol": "XRP", "name": "XRP", "current_price": 0.58, "price_change_percentage_24h": 2.45, "volume_24h": 1200000000, "market_cap": 32000000000, "icon": "ripple"},
+    {"id": "shiba-inu", "symbol": "SHIB", "name": "Shiba Inu", "current_price": 0.0000085, "price_change_percentage_24h": 12.85, "volume_24h": 485000000, "market_cap": 5000000000, "icon": "shiba-inu"},
+    {"id": "pepe", "symbol": "PEPE", "name": "Pepe", "current_price": 0.00000125, "price_change_percentage_24h": 25.85, "volume_24h": 285000000, "market_cap": 580000000, "icon": "pepe"},
+    {"id": "uniswap", "symbol": "UNI", "name": "Uniswap", "current_price": 8.85, "price_change_percentage_24h": 3.85, "volume_24h": 185000000, "market_cap": 6800000000, "icon": "uniswap"},
+    {"id": "aave", "symbol": "AAVE", "name": "Aave", "current_price": 125.50, "price_change_percentage_24h": 2.25, "volume_24h": 125000000, "market_cap": 1800000000, "icon": "aave"},
+    {"id": "maker", "symbol": "MKR", "name": "Maker", "current_price": 1285.50, "price_change_percentage_24h": 1.85, "volume_24h": 85000000, "market_cap": 1200000000, "icon": "maker"}
+]
+
+# Symbols predictions may be made on: the tickers and upper-cased ids of the coins in CRYPTO_LIST
+SUPPORTED_SYMBOLS = frozenset(
+    [coin_id.upper() for coin_id in CRYPTO_LIST]
+    + [symbol for symbol, coin_id in COIN_IDS.items() if coin_id in CRYPTO_LIST]
+    + [crypto["symbol"] for crypto in MOCK_CRYPTO_DATA if crypto["id"] in CRYPTO_LIST]
+)
+
+# Live CoinGecko by default; replay and synthetic providers run offline, optionally accelerated
+market_data = create_market_data_provider(
+    CURRENCY_RATES,
+    base_prices={crypto["id"]: crypto["current_price"] for crypto in MOCK_CRYPTO_DATA},
+    coin_symbols={crypto["id"]: crypto["symbol"] for crypto in MOCK_CRYPTO_DATA}
+)
+
+# One worker fetches prices and indicators and publishes them to shared memory; every worker reads them
+MARKET_SNAPSHOT_ENABLED = os.environ.get('MARKET_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+MARKET_SNAPSHOT_NAME = os.environ.get('MARKET_SNAPSHOT_NAME', 'criptex_market')
+MARKET_SNAPSHOT_INDICATOR_INTERVAL = float(os.environ.get('MARKET_SNAPSHOT_INDICATOR_INTERVAL', 300))
+# The snapshot holds USD rows; other currencies are quoted upstream unless converted at the fixed CURRENCY_RATES
+MARKET_SNAPSHOT_CONVERT_CURRENCIES = os.environ.get('MARKET_SNAPSHOT_CONVERT_CURRENCIES', 'false').lower() == 'true'
+SHARED_INDICATOR_TIMEFRAMES = ("15m", "1h", "4h")
+market_snapshot = SharedMarketSnapshot(
+    MARKET_SNAPSHOT_NAME,
+    CRYPTO_LIST,
+    SHARED_INDICATOR_TIMEFRAMES,
+    max_price_age=PRICES_CACHE_TTL * 2 / market_data.speed,
+    max_indicator_age=MARKET_SNAPSHOT_INDICATOR_INTERVAL * 2 / market_data.speed
+)
+
+metrics.register_gauge("market_snapshot_age_seconds", "Seconds since the shared market snapshot was last fetched", lambda: market_snapshot.age() or float("nan"))
+metrics.register_gauge("market_snapshot_publisher", "1 if this process publishes the shared market snapshot", lambda: int(market_snapshot.is_publisher))
+
+SUPPORTED_CURRENCIES = [
+    {"code": "USD", "name": "US Dollar", "symbol": "$"},
+    {"code": "RUB", "name": "Russian Ruble", "symbol": "₽"},
+    {"code": "EUR", "name": "Euro", "symbol": "€"},
+    {"code": "GBP", "name": "British Pound", "symbol": "£"},
+    {"code": "JPY", "name": "Japanese Yen", "symbol": "¥"},
+    {"code": "CNY", "name": "Chinese Yuan", "symbol": "¥"},
+    {"code": "KRW", "name": "South Korean Won", "symbol": "₩"},
+    {"code": "INR", "name": "Indian Rupee", "symbol": "₹"}
+]
+
+def format_market_rows(data: list, currency: str, currency_rate: float = 1.0) -> list:
+    """Convert CoinGecko market rows to the prices endpoint format"""
+    def convert(value):
+        return value * currency_rate if value is not None else None
+    
+    real_crypto_data = []
+    
+    for coin in data:
+        prices_at = coin.get("prices_at")
+        crypto_info = {
+            "id": coin.get("id"),
+            "symbol": coin.get("symbol", "").upper(),
+            "name": coin.get("name", ""),
+            "current_price": convert(coin.get("current_price", 0)),
+            "price_change_percentage_24h": coin.get("price_change_percentage_24h", 0),
+            "volume_24h": convert(coin.get("total_volume", 0)),
+            "market_cap": convert(coin.get("market_cap", 0)),
+            "currency": currency.upper(),
+            "icon_url": coin.get("image", ""),
+            "last_updated": datetime.utcfromtimestamp(prices_at) if prices_at else datetime.utcnow()
+        }
+        real_crypto_data.append(crypto_info)
+    return real_crypto_data
+
+async def fetch_crypto_prices(currency: str = "USD", limit: int = 50, fallback: bool = True):
+    """Read USD crypto prices from the shared snapshot, or fetch them from upstream"""
+    if priced_from_snapshots(currency):
+        shared = market_snapshot.markets(limit)
+        if shared:
+            return format_market_rows(shared, currency, CURRENCY_RATES.get(currency.upper(), 1.0))
+    return await fetch_upstream_crypto_prices(currency, limit, fallback)
+
+def mock_crypto_prices(currency: str = "USD", limit: int = 50) -> list:
+    """Mock prices converted to currency, served while upstream is unavailable"""
+    mock_crypto_data = [dict(crypto) for crypto in MOCK_CRYPTO_DATA[:limit]]
+    
+    # Convert prices to requested currency
+    currency_rate = CURRENCY_RATES.get(currency.upper(), 1.0)
+    
+    # Add more cryptocurrencies to mock data and apply currency conversion
+    for crypto in mock_crypto_data:
+        crypto["current_price"] *= currency_rate
+        crypto["volume_24h"] *= currency_rate
+        crypto["market_cap"] *= currency_rate
+        crypto["currency"] = currency.upper()
+        crypto["last_updated"] = datetime.utcnow()
+        
+        # Add icon URL
+        crypto["icon_url"] = f"https://assets.coingecko.com/coins/images/{crypto['icon']}/large/{crypto['icon']}.png"
+    return mock_crypto_data
+
+async def fetch_upstream_crypto_prices(currency: str = "USD", limit: int = 50, fallback: bool = True):
+    """Fetch crypto prices from CoinGecko with fallback to mock data; without fallback upstream errors are raised"""
+    try:
+        # Try to get real data from the market data provider
+        data = await market_data.get_markets(currency, CRYPTO_LIST[:limit])
+        real_crypto_data = format_market_rows(data, currency)
+        
+        if currency.upper() == "USD":
+            price_snapshot.update_from_market_data(real_crypto_data)
+            if market_snapshot.is_publisher:
+                market_snapshot.update_markets(data)
+                market_snapshot.publish()
+        return real_crypto_data
+    except Exception:
+        if not fallback:
+            raise
+        return mock_crypto_prices(currency, limit)
+
+async def refresh_price_snapshot():
+    """Background task that keeps the shared price snapshot fresh"""
+    sequence = market_snapshot.sequence
+    while True:
+        try:
+            # With the shared snapshot up only the publishing worker fetches; the rest follow its updates
+            if not market_snapshot.available or market_snapshot.acquire_publisher():
+                version = price_snapshot.version
+                await fetch_upstream_crypto_prices("USD", len(CRYPTO_LIST))
+                if price_snapshot.version != version:
+                    response_cache.bump("prices")
+            elif market_snapshot.sequence != sequence:
+                response_cache.bump("prices")
+            sequence = market_snapshot.sequence
+        except Exception as e:
+            logger.error(f"Error refreshing price snapshot: {e}")
+        
+        await asyncio.sleep(PRICES_CACHE_TTL / market_data.speed)
+
+# Upstream chart data by (coin id, days), shared by the chart endpoints, indicators and recommendations
+chart_cache = {}
+chart_inflight = {}
+
+async def fetch_chart(coin_id: str, days: int) -> dict:
+    """Chart from the market data provider, cached for CHART_CACHE_TTL; concurrent misses share one fetch"""
+    key = (coin_id, days)
+    cached = chart_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < CHART_CACHE_TTL / market_data.speed:
+        return cached[1]
+    
+    task = chart_inflight.get(key)
+    if task is None:
+        task = chart_inflight[key] = asyncio.ensure_future(market_data.get_chart(coin_id, days))
+        task.add_done_callback(lambda done: chart_inflight.pop(key, None))
+    data = await asyncio.shield(task)
+    chart_cache[key] = (time.monotonic(), data)
+    return data
+
+# OHLCV candles per coin and timeframe, built from the cached charts
+candle_store = CandleStore(fetch_chart)
+
+async def market_symbols() -> dict:
+    """Ticker of each coin in CRYPTO_LIST, from the cached market rows"""
+    rows = await fetch_crypto_prices("USD", len(CRYPTO_LIST))
+    return {row["id"]: row["symbol"] for row in rows if row.get("id")}
+
+# Ranked recommendations per currency, rescored from chart history in the background
+recommendation_engine = RecommendationEngine(CRYPTO_LIST, fetch_chart, market_symbols, CURRENCY_RATES)
+
+async def refresh_recommendations():
+    """Background task that rescores investment recommendations"""
+    while True:
+        started = time.monotonic()
+        try:
+            if await recommendation_engine.refresh():
+                response_cache.bump("recommendations")
+        except Exception as e:
+            logger.error(f"Error refreshing investment recommendations: {e}")
+        
+        interval = RECOMMENDATIONS_REFRESH_INTERVAL / market_data.speed
+        await asyncio.sleep(max(0, interval - (time.monotonic() - started)))
+
+def priced_from_snapshots(currency: str) -> bool:
+    """Whether prices in currency come from the USD snapshots; other currencies are quoted upstream"""
+    return currency.upper() == "USD" or MARKET_SNAPSHOT_CONVERT_CURRENCIES
+
+async def get_entry_price(symbol: str, currency: str = "USD") -> float:
+    """Price a new prediction from the shared snapshot, falling back to an upstream lookup"""
+    if priced_from_snapshots(currency):
+        currency_rate = CURRENCY_RATES.get(currency.upper(), 1.0)
+        price = market_snapshot.price(coin_id_for(symbol))
+        if price is not None:
+            return price * currency_rate
+        price = price_snapshot.get(symbol, currency_rate)
+        if price is not None:
+            return price
+    return await get_current_price_for_symbol(symbol, currency)
+
+def resolve_symbol(value: str) -> str:
+    """Accept either a ticker (BTC) or a CoinGecko id (BITCOIN) and return the ticker"""
+    value = (value or "").upper()
+    for crypto in MOCK_CRYPTO_DATA:
+        if value == crypto["symbol"] or value == crypto["id"].upper():
+            return crypto["symbol"]
+    return value
+
+def is_supported_symbol(symbol: str) -> bool:
+    """Whether a resolved symbol is one of the coins in CRYPTO_LIST"""
+    return symbol.upper() in SUPPORTED_SYMBOLS
+
+@timed("chart")
+async def get_crypto_chart_data(symbol: str, timeframe: str):
+    """Helper function to get chart data"""
+    # Mock chart data as fallback
+    mock_chart_data = {
+        "prices": [[1705276800000, 45230.50], [1705280400000, 45485.20], [1705284000000, 45120.80]],
+        "volumes": [[1705276800000, 1542000000], [1705280400000, 1623000000], [1705284000000, 1456000000]],
+        "market_caps": [[1705276800000, 890000000000], [1705280400000, 892500000000], [1705284000000, 888700000000]]
+    }
+    
+    coin_id = coin_id_for(symbol)
+    days = {"5m": 1, "15m": 1, "1h": 7, "4h": 30, "1d": 365}.get(timeframe, 7)
+    
+    try:
+        data = await fetch_chart(coin_id, days)
+        return {
+            "prices": data.get("prices", []),
+            "volumes": data.get("total_volumes", []),
+            "market_caps": data.get("market_caps", [])
+        }
+    except Exception:
+        return mock_chart_data
+
+def align_charts(charts: dict) -> dict:
+    """Put charts on one timestamp axis when their points line up, else keep each series' own pairs.
+
+    Points line up when every series has as many as the first and each timestamp is within
+    half a step of the first series'; values then become plain lists indexed like the axis.
+    """
+    prices = [np.asarray(chart.get("prices") or [], dtype=float).reshape(-1, 2) for chart in charts.values()]
+    axis = prices[0][:, 0] if prices else np.empty(0)
+    aligned = len(axis) > 1 and all(len(series) == len(axis) for series in prices)
+    if aligned:
+        tolerance = np.median(np.diff(axis)) / 2
+        aligned = bool(np.all(np.abs(np.vstack([series[:, 0] for series in prices]) - axis) <= tolerance))
+    if not aligned:
+        return {"aligned": False, "timestamps": None, "series": charts}
+    
+    series = {}
+    for symbol, chart in charts.items():
+        series[symbol] = {
+            key: [point[1] for point in chart.get(key) or []] if len(chart.get(key) or []) == len(axis) else []
+            for key in ("prices", "volumes", "market_caps")
+        }
+    return {"aligned": True, "timestamps": axis.astype(np.int64).tolist(), "series": series}
+
+async def get_crypto_charts(symbols: list, timeframe: str) -> dict:
+    """Charts of several symbols fetched concurrently and returned on a shared axis when possible"""
+    charts = await asyncio.gather(*(get_crypto_chart_data(symbol, timeframe) for symbol in symbols))
+    return {"timeframe": timeframe, **align_charts(dict(zip(symbols, charts)))}
+
+# Upstream quotes in currencies other than USD, (coin id, currency) -> (monotonic time, price)
+currency_quotes = {}
+
+async def get_currency_quote(coin_id: str, currency: str) -> float:
+    """Price of a coin quoted upstream in currency, cached for PRICES_CACHE_TTL"""
+    key = (coin_id, currency.upper())
+    cached = currency_quotes.get(key)
+    if cached is not None and time.monotonic() - cached[0] < PRICES_CACHE_TTL / market_data.speed:
+        return cached[1]
+    price = await market_data.get_price(coin_id, currency)
+    currency_quotes[key] = (time.monotonic(), price)
+    return price
+
+@timed("price")
+async def get_current_price_for_symbol(symbol: str, currency: str = "USD"):
+    """Get current price for a specific symbol"""
+    coin_id = coin_id_for(symbol)
+    
+    # Published by one worker for all of them
+    if priced_from_snapshots(currency):
+        price = market_snapshot.price(coin_id)
+        if price is not None:
+            return price * CURRENCY_RATES.get(currency.upper(), 1.0)
+    
+    try:
+        if priced_from_snapshots(currency):
+            return await market_data.get_price(coin_id, currency)
+        return await get_currency_quote(coin_id, currency)
+    except:
+        pass
+    
+    # Fallback mock prices
+    mock_prices = {
+        "BTC": 45230.50, "ETH": 2845.75, "BNB": 312.40, "ADA": 0.485,
+        "SOL": 98.75, "DOT": 15.85, "DOGE": 0.085, "AVAX": 28.50,
+        "LINK": 18.75, "MATIC": 0.95
+    }
+    base_price = mock_prices.get(symbol.upper(), 100.0)
+    currency_rate = CURRENCY_RATES.get(currency.upper(), 1.0)
+    return base_price * currency_rate
+
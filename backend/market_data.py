@@ -0,0 +1,311 @@
+"""Market data providers.
+
+All providers speak CoinGecko's shapes (coins/markets rows, market_chart series,
+simple/price values) keyed by CoinGecko coin id, so the app can swap between
+
+coingecko  - the live API
+replay     - ticks recorded to an NDJSON file, replayed at an adjustable speed
+synthetic  - geometric Brownian motion for any number of coins, offline
+
+Replay and synthetic providers run on a MarketClock that can advance faster than
+real time for accelerated capacity tests.
+"""
+import abc
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+import numpy as np
+
+from metrics import track_upstream
+
+logger = logging.getLogger(__name__)
+
+MARKET_DATA_PROVIDER = os.environ.get('MARKET_DATA_PROVIDER', 'coingecko')
+MARKET_DATA_SPEED = float(os.environ.get('MARKET_DATA_SPEED', 1.0))
+MARKET_DATA_REPLAY_FILE = os.environ.get('MARKET_DATA_REPLAY_FILE', '')
+MARKET_DATA_SEED = int(os.environ.get('MARKET_DATA_SEED', 42))
+COINGECKO_API_URL = os.environ.get('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3').rstrip('/')
+
+PROVIDERS = ("coingecko", "replay", "synthetic")
+DAY_SECONDS = 86400
+
+
+class MarketDataError(Exception):
+    """Raised when a provider cannot answer; callers fall back to mock data"""
+
+
+class MarketClock:
+    """Wall clock scaled by speed, starting at a given market timestamp"""
+
+    def __init__(self, speed: float = 1.0, start: Optional[float] = None):
+        self.speed = speed
+        self.start = time.time() if start is None else start
+        self._wall_start = time.monotonic()
+
+    def now(self) -> float:
+        return self.start + (time.monotonic() - self._wall_start) * self.speed
+
+
+class MarketDataProvider(abc.ABC):
+    """Interface implemented by every backend; prices are in the requested currency"""
+
+    name = "base"
+    speed = 1.0
+
+    @abc.abstractmethod
+    async def get_markets(self, currency: str, coin_ids: List[str]) -> List[dict]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_chart(self, coin_id: str, days: int) -> dict:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_price(self, coin_id: str, currency: str) -> float:
+        raise NotImplementedError
+
+
+class CoinGeckoProvider(MarketDataProvider):
+    name = "coingecko"
+
+    def __init__(self, base_url: str = COINGECKO_API_URL):
+        self.base_url = base_url.rstrip('/')
+
+    async def _get(self, endpoint: str, path: str, timeout: float):
+        async with track_upstream(endpoint) as upstream, aiohttp.ClientSession() as session:
+            async with session.get(f"{self.base_url}/{path}", timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                if resp.status != 200:
+                    raise MarketDataError(f"{endpoint} returned HTTP {resp.status}")
+                data = await resp.json()
+                upstream.outcome = "ok"
+                return data
+
+    async def get_markets(self, currency: str, coin_ids: List[str]) -> List[dict]:
+        return await self._get(
+            "coins/markets",
+            f"coins/markets?vs_currency={currency.lower()}&ids={','.join(coin_ids)}&order=market_cap_desc"
+            f"&per_page={len(coin_ids)}&page=1&sparkline=false",
+            5
+        )
+
+    async def get_chart(self, coin_id: str, days: int) -> dict:
+        return await self._get("coins/market_chart", f"coins/{coin_id}/market_chart?vs_currency=usd&days={days}", 5)
+
+    async def get_price(self, coin_id: str, currency: str) -> float:
+        data = await self._get("simple/price", f"simple/price?ids={coin_id}&vs_currencies={currency.lower()}", 3)
+        try:
+            return data[coin_id][currency.lower()]
+        except (KeyError, TypeError):
+            raise MarketDataError(f"No {currency} price for {coin_id}")
+
+
+def _chart_step(days: int) -> int:
+    """Point spacing CoinGecko uses: 5 minutes up to a day, hourly up to 90 days, daily beyond"""
+    if days <= 1:
+        return 300
+    if days <= 90:
+        return 3600
+    return DAY_SECONDS
+
+
+class _SeriesProvider(MarketDataProvider):
+    """Shared CoinGecko-shaped views over per-coin USD price series sampled on a clock"""
+
+    def __init__(self, clock: MarketClock, currency_rates: Dict[str, float], coin_symbols: Optional[Dict[str, str]] = None):
+        self.clock = clock
+        self.speed = clock.speed
+        self.currency_rates = {code.upper(): rate for code, rate in currency_rates.items()}
+        self.coin_symbols = coin_symbols or {}
+
+    def _rate(self, currency: str) -> float:
+        return self.currency_rates.get(currency.upper(), 1.0)
+
+    @abc.abstractmethod
+    def price_at(self, coin_id: str, timestamps: np.ndarray) -> np.ndarray:
+        """USD prices of a coin at the given market timestamps (seconds)"""
+        raise NotImplementedError
+
+    def _volume_base(self, coin_id: str) -> float:
+        return 1e6 * (1 + _stable_fraction(coin_id, "volume") * 99)
+
+    def _supply(self, coin_id: str) -> float:
+        return 1e6 * (1 + _stable_fraction(coin_id, "supply") * 999)
+
+    async def get_markets(self, currency: str, coin_ids: List[str]) -> List[dict]:
+        now = self.clock.now()
+        rate = self._rate(currency)
+        rows = []
+        for coin_id in coin_ids:
+            try:
+                current, previous = self.price_at(coin_id, np.array([now, now - DAY_SECONDS]))
+            except MarketDataError:
+                # Like coins/markets, leave out coins the provider has no data for
+                continue
+            rows.append({
+                "id": coin_id,
+                "symbol": self.coin_symbols.get(coin_id, coin_id.split("-")[0][:5]).lower(),
+                "name": coin_id.replace("-", " ").title(),
+                "image": "",
+                "current_price": float(current * rate),
+                "price_change_percentage_24h": float((current - previous) / previous * 100),
+                "total_volume": float(current * self._volume_base(coin_id) * rate),
+                "market_cap": float(current * self._supply(coin_id) * rate),
+            })
+        rows.sort(key=lambda row: row["market_cap"], reverse=True)
+        return rows
+
+    async def get_chart(self, coin_id: str, days: int) -> dict:
+        step = _chart_step(days)
+        now = self.clock.now()
+        timestamps = np.arange(now - days * DAY_SECONDS, now + 1, step)
+        prices = self.price_at(coin_id, timestamps)
+        millis = (timestamps * 1000).astype(np.int64).tolist()
+        prices_list = prices.tolist()
+        volume_base, supply = self._volume_base(coin_id), self._supply(coin_id)
+        return {
+            "prices": [[ms, price] for ms, price in zip(millis, prices_list)],
+            "total_volumes": [[ms, price * volume_base] for ms, price in zip(millis, prices_list)],
+            "market_caps": [[ms, price * supply] for ms, price in zip(millis, prices_list)],
+        }
+
+    async def get_price(self, coin_id: str, currency: str) -> float:
+        return float(self.price_at(coin_id, np.array([self.clock.now()]))[0] * self._rate(currency))
+
+
+def _stable_fraction(coin_id: str, salt: str) -> float:
+    """Deterministic value in [0, 1) per coin so runs are reproducible"""
+    return int(hashlib.sha1(f"{salt}:{coin_id}".encode()).hexdigest()[:8], 16) / 0x100000000
+
+
+class SyntheticProvider(_SeriesProvider):
+    """Geometric Brownian motion per coin on a fixed tick grid.
+
+    Each coin's path is generated lazily from a per-coin seed, covering
+    history_days before the clock start and extended forward in chunks as the
+    clock advances, so any number of coins can be served reproducibly.
+    Timestamps before the history window hold the first price.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, clock: MarketClock, currency_rates: Dict[str, float], seed: int = MARKET_DATA_SEED,
+                 tick_seconds: int = 300, history_days: int = 30, drift: float = 0.05, volatility: float = 0.8,
+                 base_prices: Optional[Dict[str, float]] = None, coin_symbols: Optional[Dict[str, str]] = None):
+        super().__init__(clock, currency_rates, coin_symbols)
+        self.seed = seed
+        self.tick_seconds = tick_seconds
+        self.drift = drift
+        self.volatility = volatility
+        self.base_prices = base_prices or {}
+        self.origin = clock.start - history_days * DAY_SECONDS
+        # Per coin: [log-price path, generator used to extend it]
+        self._paths: Dict[str, list] = {}
+
+    def _path(self, coin_id: str, ticks_needed: int) -> np.ndarray:
+        entry = self._paths.get(coin_id)
+        if entry is None:
+            generator = np.random.default_rng([self.seed, int(_stable_fraction(coin_id, "seed") * 2**32)])
+            start_price = self.base_prices.get(coin_id, 10 ** (_stable_fraction(coin_id, "price") * 6 - 2))
+            entry = self._paths[coin_id] = [np.array([math.log(start_price)]), generator]
+        path, generator = entry
+        if len(path) < ticks_needed:
+            # Extend in chunks; the generator continues the same stream, so the path is chunking-independent
+            dt = self.tick_seconds / (365 * DAY_SECONDS)
+            count = max(ticks_needed - len(path), 288)
+            steps = (self.drift - self.volatility ** 2 / 2) * dt + self.volatility * math.sqrt(dt) * generator.standard_normal(count)
+            path = entry[0] = np.concatenate([path, path[-1] + np.cumsum(steps)])
+        return path
+
+    def price_at(self, coin_id: str, timestamps: np.ndarray) -> np.ndarray:
+        ticks = np.clip(((timestamps - self.origin) // self.tick_seconds).astype(np.int64), 0, None)
+        path = self._path(coin_id, int(ticks.max()) + 1)
+        return np.exp(path[ticks])
+
+
+class ReplayProvider(_SeriesProvider):
+    """Replays recorded ticks: one JSON object per line, {"t": epoch seconds, "prices": {coin_id: usd}}.
+
+    The clock starts at the first tick (or start_offset seconds after it) and the
+    replay holds the last tick once the recording runs out.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str, currency_rates: Dict[str, float], speed: float = 1.0, start_offset: float = 0.0,
+                 coin_symbols: Optional[Dict[str, str]] = None):
+        with open(path) as f:
+            ticks = [json.loads(line) for line in f if line.strip()]
+        if not ticks:
+            raise MarketDataError(f"Replay file {path} has no ticks")
+        ticks.sort(key=lambda tick: tick["t"])
+
+        series = {}
+        for tick in ticks:
+            for coin_id, price in tick["prices"].items():
+                times, prices = series.setdefault(coin_id, ([], []))
+                times.append(float(tick["t"]))
+                prices.append(float(price))
+        self._series = {coin_id: (np.asarray(times), np.asarray(prices)) for coin_id, (times, prices) in series.items()}
+        self.end = float(ticks[-1]["t"])
+        super().__init__(MarketClock(speed, float(ticks[0]["t"]) + start_offset), currency_rates, coin_symbols)
+
+    def price_at(self, coin_id: str, timestamps: np.ndarray) -> np.ndarray:
+        if coin_id not in self._series:
+            raise MarketDataError(f"{coin_id} is not in the replay recording")
+        times, prices = self._series[coin_id]
+        indexes = np.clip(np.searchsorted(times, timestamps, side="right") - 1, 0, len(prices) - 1)
+        return prices[indexes]
+
+    @property
+    def finished(self) -> bool:
+        return self.clock.now() >= self.end
+
+
+def create_market_data_provider(currency_rates: Dict[str, float], name: str = MARKET_DATA_PROVIDER,
+                                speed: float = MARKET_DATA_SPEED, replay_file: str = MARKET_DATA_REPLAY_FILE,
+                                seed: int = MARKET_DATA_SEED, base_prices: Optional[Dict[str, float]] = None,
+                                coin_symbols: Optional[Dict[str, str]] = None) -> MarketDataProvider:
+    if name == "coingecko":
+        return CoinGeckoProvider()
+    if name == "replay":
+        if not replay_file:
+            raise ValueError("MARKET_DATA_REPLAY_FILE is required for the replay provider")
+        return ReplayProvider(replay_file, currency_rates, speed, coin_symbols=coin_symbols)
+    if name == "synthetic":
+        return SyntheticProvider(MarketClock(speed), currency_rates, seed, base_prices=base_prices, coin_symbols=coin_symbols)
+    raise ValueError(f"Unknown market data provider {name!r}, expected one of {PROVIDERS}")
+
+
+async def record_ticks(provider: MarketDataProvider, coin_ids: List[str], path: str, interval: float, count: int):
+    """Append USD ticks from a provider to a replay file"""
+    with open(path, "a") as f:
+        for index in range(count):
+            try:
+                markets = await provider.get_markets("USD", coin_ids)
+                prices = {row["id"]: row["current_price"] for row in markets if row.get("current_price") is not None}
+                f.write(json.dumps({"t": time.time(), "prices": prices}) + "\n")
+                f.flush()
+            except Exception as e:
+                logger.error(f"Error recording market tick: {e}")
+            if index < count - 1:
+                await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record live CoinGecko ticks for the replay provider")
+    parser.add_argument("output")
+    parser.add_argument("--coins", nargs="+", default=["bitcoin", "ethereum", "binancecoin", "cardano", "solana",
+                                                       "polkadot", "dogecoin", "avalanche-2", "chainlink", "polygon"])
+    parser.add_argument("--interval", type=float, default=60.0)
+    parser.add_argument("--count", type=int, default=60)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(record_ticks(CoinGeckoProvider(), args.coins, args.output, args.interval, args.count))
@@ -0,0 +1,300 @@
+"""Latest prices and indicators for CRYPTO_LIST, shared by every worker process.
+
+One worker - whichever holds the publisher lock - fetches from upstream and
+writes a float64 matrix with one row per coin into a named shared-memory
+segment. Every worker maps the same segment and reads rows straight out of it,
+so N workers make one set of upstream calls and hold one copy of the data. If
+the publisher exits, the OS drops its lock and the next worker to refresh takes
+over.
+
+Writes follow a seqlock: the sequence counter is odd while the matrix is being
+written and even once it is consistent. Readers copy out the cells they need and
+retry if the counter moved meanwhile. Python has no memory fences, so this leans
+on the strong store ordering of x86-64; on weaker architectures a reader may
+rarely see a torn row.
+"""
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+import zlib
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Per-coin market columns, in CoinGecko field names; prices_at is when the row was fetched
+MARKET_COLUMNS = ("current_price", "price_change_percentage_24h", "total_volume", "market_cap", "prices_at")
+
+# Keys returned by analysis.compute_technical_indicators, stored once per timeframe with computed_at
+INDICATOR_KEYS = (
+    "sma_5", "sma_10", "rsi", "macd", "bb_upper", "bb_middle", "bb_lower",
+    "volatility", "price_vs_sma5", "price_vs_sma10",
+)
+
+# Header slots: sequence, rows, columns, metadata length, metadata version
+HEADER_SLOTS = 8
+SEQUENCE, ROWS, COLUMNS, METADATA_LENGTH, METADATA_VERSION = range(5)
+METADATA_CAPACITY = 64 * 1024
+
+READ_RETRIES = 100
+
+
+class SharedMarketSnapshot:
+    def __init__(self, name: str, coin_ids: Sequence[str], timeframes: Iterable[str],
+                 max_price_age: float = 120.0, max_indicator_age: float = 600.0):
+        self.coin_ids = list(coin_ids)
+        self.rows = {coin_id: row for row, coin_id in enumerate(self.coin_ids)}
+        self.timeframes = list(timeframes)
+        self.columns = {column: index for index, column in enumerate(MARKET_COLUMNS)}
+        for timeframe in self.timeframes:
+            for key in INDICATOR_KEYS + ("computed_at",):
+                self.columns[f"{timeframe}:{key}"] = len(self.columns)
+        self.max_price_age = max_price_age
+        self.max_indicator_age = max_indicator_age
+
+        # The layout is part of the name, so a deploy that changes it never maps an old segment
+        layout = zlib.crc32(json.dumps([self.coin_ids, list(self.columns)]).encode())
+        self.name = f"{name}_{layout:08x}"
+        self.lock_path = os.path.join(tempfile.gettempdir(), f"{self.name}.lock")
+
+        self._shm: Optional[SharedMemory] = None
+        self._header: Optional[np.ndarray] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._lock_file = None
+        self._staging: Optional[np.ndarray] = None
+        self._metadata: List[Optional[dict]] = [None] * len(self.coin_ids)
+        self._metadata_dirty = False
+        self._read_metadata_version = -1
+        self._read_metadata: List[Optional[dict]] = []
+
+    @property
+    def available(self) -> bool:
+        return self._matrix is not None
+
+    @property
+    def is_publisher(self) -> bool:
+        return self._lock_file is not None
+
+    @property
+    def sequence(self) -> int:
+        return int(self._header[SEQUENCE]) if self.available else 0
+
+    def open(self):
+        """Create the segment, or map the one another worker already created"""
+        if os.name != "posix":
+            raise RuntimeError("The shared market snapshot needs POSIX shared memory and flock")
+        matrix_bytes = len(self.coin_ids) * len(self.columns) * 8
+        size = HEADER_SLOTS * 8 + matrix_bytes + METADATA_CAPACITY
+        try:
+            shm = SharedMemory(self.name, create=True, size=size)
+            created = True
+            # The resource tracker would unlink the segment when this process exits, under the other workers
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except FileExistsError:
+            shm = self._attach(size)
+            created = False
+
+        self._shm = shm
+        self._header = np.ndarray((HEADER_SLOTS,), np.int64, shm.buf)
+        self._matrix = np.ndarray((len(self.coin_ids), len(self.columns)), np.float64, shm.buf, HEADER_SLOTS * 8)
+        if created:
+            self._header[SEQUENCE] += 1
+            self._matrix.fill(np.nan)
+            self._header[ROWS] = len(self.coin_ids)
+            self._header[COLUMNS] = len(self.columns)
+            self._header[SEQUENCE] += 1
+        logger.info(f"{'Created' if created else 'Attached'} shared market snapshot {self.name}")
+        return self
+
+    def _attach(self, size: int) -> SharedMemory:
+        # Workers boot together, so the creator may not have sized the segment yet
+        for _ in range(100):
+            try:
+                shm = SharedMemory(self.name)
+            except ValueError:
+                shm = None
+            else:
+                resource_tracker.unregister(shm._name, "shared_memory")
+                if shm.size >= size:
+                    return shm
+                shm.close()
+            time.sleep(0.01)
+        raise RuntimeError(f"Shared market snapshot {self.name} exists but was never sized")
+
+    def close(self):
+        self.release_publisher()
+        self._header = self._matrix = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        """Remove the segment name; only for tests and manual cleanup, workers keep it for restarts"""
+        SharedMemory(self.name).unlink()
+
+    # Publisher side
+
+    def acquire_publisher(self) -> bool:
+        """Become the publishing worker if no live process holds the lock; cheap once held"""
+        if self._lock_file is not None:
+            return True
+        if not self.available:
+            return False
+        import fcntl
+
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        # Start from what the previous publisher left, so rows this one has not fetched yet survive
+        self._staging = self._read(lambda matrix: matrix.copy())
+        if self._staging is None:
+            self._staging = np.full(self._matrix.shape, np.nan)
+        self._metadata = list(self._read_metadata_rows()) or [None] * len(self.coin_ids)
+        logger.info(f"Process {os.getpid()} is publishing the shared market snapshot")
+        return True
+
+    def release_publisher(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def update_markets(self, markets: List[dict], now: Optional[float] = None):
+        """Stage CoinGecko /coins/markets rows in USD"""
+        now = time.time() if now is None else now
+        for coin in markets:
+            row = self.rows.get(coin.get("id"))
+            if row is None:
+                continue
+            for column in MARKET_COLUMNS[:-1]:
+                value = coin.get(column)
+                self._staging[row, self.columns[column]] = np.nan if value is None else float(value)
+            self._staging[row, self.columns["prices_at"]] = now
+            metadata = {"symbol": coin.get("symbol", ""), "name": coin.get("name", ""), "image": coin.get("image", "")}
+            if self._metadata[row] != metadata:
+                self._metadata[row] = metadata
+                self._metadata_dirty = True
+
+    def update_indicators(self, coin_id: str, timeframe: str, indicators: dict, now: Optional[float] = None):
+        row = self.rows.get(coin_id)
+        if row is None or timeframe not in self.timeframes:
+            return
+        for key in INDICATOR_KEYS:
+            self._staging[row, self.columns[f"{timeframe}:{key}"]] = indicators.get(key, np.nan)
+        self._staging[row, self.columns[f"{timeframe}:computed_at"]] = time.time() if now is None else now
+
+    def publish(self):
+        """Copy the staged matrix into the segment under the seqlock"""
+        if not self.is_publisher:
+            raise RuntimeError("Only the publishing process can write the shared market snapshot")
+        metadata = None
+        if self._metadata_dirty:
+            metadata = json.dumps(self._metadata, separators=(",", ":")).encode()
+            if len(metadata) > METADATA_CAPACITY:
+                logger.error(f"Shared market metadata is {len(metadata)} bytes, over {METADATA_CAPACITY}; not updated")
+                metadata = None
+
+        self._header[SEQUENCE] += 1
+        self._matrix[:] = self._staging
+        if metadata is not None:
+            offset = HEADER_SLOTS * 8 + self._matrix.nbytes
+            self._shm.buf[offset:offset + len(metadata)] = metadata
+            self._header[METADATA_LENGTH] = len(metadata)
+            self._header[METADATA_VERSION] += 1
+            self._metadata_dirty = False
+        self._header[SEQUENCE] += 1
+
+    # Reader side
+
+    def _read(self, copy_out):
+        """Run copy_out on a consistent matrix; None if the segment is unavailable or kept changing"""
+        if not self.available:
+            return None
+        for _ in range(READ_RETRIES):
+            before = int(self._header[SEQUENCE])
+            if before % 2 == 0:
+                result = copy_out(self._matrix)
+                if int(self._header[SEQUENCE]) == before:
+                    return result
+            time.sleep(0)
+        return None
+
+    def _read_metadata_rows(self) -> List[Optional[dict]]:
+        def copy_out(matrix):
+            version = int(self._header[METADATA_VERSION])
+            if version == self._read_metadata_version:
+                return version, None
+            offset = HEADER_SLOTS * 8 + matrix.nbytes
+            return version, bytes(self._shm.buf[offset:offset + int(self._header[METADATA_LENGTH])])
+
+        read = self._read(copy_out)
+        if read is not None and read[1] is not None:
+            self._read_metadata_version = read[0]
+            self._read_metadata = json.loads(read[1]) if read[1] else []
+        return self._read_metadata
+
+    def markets(self, limit: int, now: Optional[float] = None) -> Optional[List[dict]]:
+        """Fresh market rows of the first limit coins in USD, or None when the snapshot is missing or stale"""
+        now = time.time() if now is None else now
+        block = self._read(lambda matrix: matrix[:limit, :len(MARKET_COLUMNS)].copy())
+        if block is None:
+            return None
+        fetched_at = block[:, -1]
+        fetched_at = fetched_at[~np.isnan(fetched_at)]
+        if not len(fetched_at) or now - fetched_at.max() > self.max_price_age:
+            return None
+
+        metadata = self._read_metadata_rows()
+        markets = []
+        for row, values in enumerate(block):
+            if math.isnan(values[0]) or now - values[-1] > self.max_price_age:
+                continue
+            coin = {"id": self.coin_ids[row], **(metadata[row] if row < len(metadata) and metadata[row] else {})}
+            coin.update({column: None if math.isnan(value) else float(value)
+                         for column, value in zip(MARKET_COLUMNS[:-1], values)})
+            coin["prices_at"] = float(values[-1])
+            markets.append(coin)
+        return markets
+
+    def price(self, coin_id: str, now: Optional[float] = None) -> Optional[float]:
+        """Fresh USD price of one coin, or None"""
+        row = self.rows.get(coin_id)
+        if row is None:
+            return None
+        price_column, at_column = self.columns["current_price"], self.columns["prices_at"]
+        cells = self._read(lambda matrix: (float(matrix[row, price_column]), float(matrix[row, at_column])))
+        if cells is None or math.isnan(cells[0]):
+            return None
+        now = time.time() if now is None else now
+        return cells[0] if now - cells[1] <= self.max_price_age else None
+
+    def indicators(self, coin_id: str, timeframe: str, now: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """Fresh technical indicators of one coin and timeframe, or None"""
+        row = self.rows.get(coin_id)
+        if row is None or timeframe not in self.timeframes:
+            return None
+        start = self.columns[f"{timeframe}:{INDICATOR_KEYS[0]}"]
+        cells = self._read(lambda matrix: matrix[row, start:start + len(INDICATOR_KEYS) + 1].copy())
+        if cells is None or math.isnan(cells[-1]):
+            return None
+        now = time.time() if now is None else now
+        if now - cells[-1] > self.max_indicator_age:
+            return None
+        return {key: float(value) for key, value in zip(INDICATOR_KEYS, cells)}
+
+    def age(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since the newest price row was fetched"""
+        column = self.columns["prices_at"]
+        fetched_at = self._read(lambda matrix: np.nanmax(matrix[:, column]) if not np.isnan(matrix[:, column]).all() else None)
+        if fetched_at is None:
+            return None
+        return (time.time() if now is None else now) - float(fetched_at)
@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def input_digest(*values) -> str:
+    """Short stable digest of JSON-like call arguments, for memo keys"""
+    encoded = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class TimeBucketedMemo:
+    """Results of async calls memoized per key and time bucket, bounded by LRU eviction.
+
+    Calls for the same key in the same bucket share one result, including calls
+    made while the first is still running. A result expires with its bucket;
+    entries from past buckets are dropped as new ones come in.
+    """
+
+    def __init__(self, bucket_seconds: float, max_entries: int = 1024, clock: Callable[[], float] = time.time):
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+
+    def bucket(self) -> int:
+        return int(self.clock() // self.bucket_seconds)
+
+    async def get(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                  cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Memoized result for key in the current bucket; results failing cache_if are returned but not kept"""
+        bucket = self.bucket()
+        entry_key = (key, bucket)
+        if entry_key in self._entries:
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            return self._entries[entry_key]
+
+        task = self._inflight.get(entry_key)
+        if task is not None:
+            self.hits += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = self._inflight[entry_key] = asyncio.ensure_future(factory())
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(entry_key, None)
+
+        if cache_if is None or cache_if(result):
+            self._entries[entry_key] = result
+            # Past buckets are never read again; hits keep current entries at the end
+            while self._entries and (len(self._entries) > self.max_entries or next(iter(self._entries))[1] < bucket):
+                self._entries.popitem(last=False)
+        return result
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,259 @@
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+CYCLE_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(float(self.callback()))}",
+        ]
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by label values.
+
+    Recording is a bisect and a few list/dict updates with no lock. Observations
+    can come from the event loop or from driver threads; under the GIL a racing
+    pair of increments may very rarely lose one, which is acceptable for metrics.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [per-bucket counts (last slot is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series.setdefault(labelvalues, [[0] * (len(self.buckets) + 1), 0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), list(counts)):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route, method and status",
+    ("route", "method", "status")
+))
+upstream_request_duration = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Upstream market-data request latency by endpoint and outcome",
+    ("endpoint", "outcome")
+))
+mongo_operation_duration = registry.register(Histogram(
+    "mongo_operation_duration_seconds", "MongoDB command latency by collection, operation and outcome",
+    ("collection", "operation", "outcome"), MONGO_BUCKETS
+))
+generation_cycle_duration = registry.register(Histogram(
+    "generation_cycle_duration_seconds", "Duration of the background AI prediction generation cycle",
+    buckets=CYCLE_BUCKETS
+))
+mongo_pool_wait = registry.register(Histogram(
+    "mongo_pool_wait_seconds", "Time spent waiting for a MongoDB connection by workload pool and outcome",
+    ("pool", "outcome"), MONGO_BUCKETS
+))
+event_loop_lag = registry.register(Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a periodic timer", buckets=LAG_BUCKETS
+))
+
+
+class UpstreamCall:
+    """Times one upstream request; the caller sets outcome to ok or fallback.
+
+    Timeouts are detected automatically; any other exception counts as a fallback
+    since every market-data helper falls back to mock data.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.outcome = "fallback"
+        self._started = 0.0
+
+    async def __aenter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None and issubclass(exc_type, asyncio.TimeoutError):
+            self.outcome = "timeout"
+        elif exc_type is not None:
+            self.outcome = "fallback"
+        upstream_request_duration.observe(time.perf_counter() - self._started, self.endpoint, self.outcome)
+        return False
+
+
+def track_upstream(endpoint: str) -> UpstreamCall:
+    return UpstreamCall(endpoint)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener that feeds mongo_operation_duration"""
+
+    # Commands whose first value is not a collection name
+    _NON_COLLECTION_COMMANDS = {"getMore", "killCursors", "endSessions", "commitTransaction", "abortTransaction"}
+
+    def __init__(self):
+        self._collections: Dict[Tuple, str] = {}
+
+    def started(self, event):
+        command_name = event.command_name
+        if command_name == "getMore":
+            collection = event.command.get("collection", "")
+        elif command_name in self._NON_COLLECTION_COMMANDS:
+            collection = ""
+        else:
+            collection = event.command.get(command_name, "")
+        if not isinstance(collection, str):
+            collection = ""
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _record(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongo_operation_duration.observe(event.duration_micros / 1e6, collection, event.command_name, outcome)
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """pymongo pool listener that feeds mongo_pool_wait for one workload's client.
+
+    A checkout starts and ends on the same driver thread, so the thread identifies
+    which start event a checkout or failure belongs to.
+    """
+
+    def __init__(self, pool: str):
+        self.pool = pool
+        self.checked_out = 0
+        self._started: Dict[Tuple, float] = {}
+
+    def connection_check_out_started(self, event):
+        self._started[(event.address, threading.get_ident())] = time.perf_counter()
+
+    def _record(self, event, outcome: str):
+        started = self._started.pop((event.address, threading.get_ident()), None)
+        if started is not None:
+            mongo_pool_wait.observe(time.perf_counter() - started, self.pool, outcome)
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        self._record(event, "ok")
+
+    def connection_check_out_failed(self, event):
+        self._record(event, "timeout" if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT else "error")
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+
+def register_gauge(name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+    return registry.register(Gauge(name, documentation, callback))
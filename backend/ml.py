@@ -0,0 +1,355 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+import metrics
+from analysis import adjust_confidence, build_features, compute_technical_indicators, predict_direction
+from compute_executor import ComputeExecutor
+from database import background_db
+from generation_pipeline import Pipeline, SharedResults, Stage
+from market import (
+    MARKET_SNAPSHOT_INDICATOR_INTERVAL, MOCK_CRYPTO_DATA, SHARED_INDICATOR_TIMEFRAMES, coin_id_for,
+    get_crypto_chart_data, get_current_price_for_symbol, market_data, market_snapshot
+)
+from memo import TimeBucketedMemo, input_digest
+from request_timing import span, timed
+from sentiment import SENTIMENT_SOURCES, SentimentIngestor, SentimentStore, parse_sources
+from signal_store import build_prediction_reference, build_signal_document
+from structured_logging import log_event
+from write_buffer import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+# Write-behind buffer for per-user AI prediction documents
+ai_prediction_writer = WriteBehindBuffer(
+    background_db.ai_predictions,
+    max_batch=int(os.environ.get('PREDICTION_WRITE_BATCH_SIZE', 500)),
+    flush_interval=float(os.environ.get('PREDICTION_WRITE_FLUSH_INTERVAL', 1.0)),
+    max_pending=int(os.environ.get('PREDICTION_WRITE_MAX_PENDING', 10000))
+)
+
+# Executor for CPU-bound indicator and model work
+analysis_executor = ComputeExecutor()
+
+# Time-decayed per-symbol sentiment, filled by the background ingestion task
+sentiment_store = SentimentStore()
+
+metrics.register_gauge("ai_prediction_writer_pending", "AI prediction documents buffered or in flight", lambda: ai_prediction_writer.pending)
+metrics.register_gauge("ai_prediction_writer_dropped", "AI prediction documents dropped after retries", lambda: ai_prediction_writer.dropped)
+
+# News sources are matched to symbols by ticker, CoinGecko id and name
+sentiment_ingestor = SentimentIngestor(
+    sentiment_store,
+    parse_sources(SENTIMENT_SOURCES),
+    {crypto["symbol"]: {crypto["id"], crypto["name"], crypto["id"].replace("-", " ")} for crypto in MOCK_CRYPTO_DATA},
+    db=background_db,
+    run=analysis_executor.run
+)
+
+# AI Analysis Functions
+async def analyze_crypto_sentiment(symbol: str) -> dict:
+    """Current sentiment for a symbol; ingestion and scoring run in the background"""
+    return sentiment_store.lookup(symbol)
+
+@timed("indicators")
+async def calculate_technical_indicators(symbol: str, timeframe: str) -> dict:
+    """Technical indicators from the shared snapshot, computed from chart data when not published"""
+    shared = market_snapshot.indicators(coin_id_for(symbol), timeframe)
+    if shared is not None:
+        return shared
+    return await compute_chart_indicators(symbol, timeframe)
+
+async def compute_chart_indicators(symbol: str, timeframe: str) -> dict:
+    """Calculate technical indicators from price data"""
+    try:
+        # Get price data
+        chart_data = await get_crypto_chart_data(symbol, timeframe)
+        
+        if not chart_data or not chart_data.get("prices"):
+            return {}
+        
+        prices = [price[1] for price in chart_data["prices"]][-20:]  # Last 20 prices
+        
+        if len(prices) < 5:
+            return {}
+        
+        with span("indicators_compute"):
+            return await analysis_executor.run(compute_technical_indicators, prices)
+    except Exception as e:
+        logger.error(f"Error calculating technical indicators for {symbol}: {e}")
+        return {}
+
+# Model results per (symbol, timeframe, inputs) and time bucket; requests within a bucket share one analysis
+AI_PREDICTION_MEMO_SECONDS = float(os.environ.get('AI_PREDICTION_MEMO_SECONDS', 60))
+ai_prediction_memo = TimeBucketedMemo(
+    AI_PREDICTION_MEMO_SECONDS / market_data.speed,
+    max_entries=int(os.environ.get('AI_PREDICTION_MEMO_SIZE', 1024))
+)
+# Shared signals handed out to manual requests within the same bucket
+ai_signal_memo = TimeBucketedMemo(
+    AI_PREDICTION_MEMO_SECONDS / market_data.speed,
+    max_entries=int(os.environ.get('AI_PREDICTION_MEMO_SIZE', 1024))
+)
+
+metrics.register_gauge("ai_prediction_memo_hit_ratio", "Hit ratio of memoized AI direction predictions", lambda: ai_prediction_memo.stats()["hit_ratio"])
+
+async def ai_predict_direction(symbol: str, timeframe: str, tech_indicators: Optional[dict] = None, sentiment: Optional[dict] = None) -> dict:
+    """Use AI model to predict price direction, memoized per symbol, timeframe, inputs and time bucket"""
+    result = await ai_prediction_memo.get(
+        (symbol, timeframe, input_digest(tech_indicators, sentiment)),
+        lambda: compute_ai_direction(symbol, timeframe, tech_indicators, sentiment),
+        cache_if=is_model_result
+    )
+    return dict(result)
+
+def is_model_result(result: dict) -> bool:
+    """Whether a direction came from the model rather than a random fallback, which is not worth sharing"""
+    return "technical_score" in result
+
+@timed("ai_predict")
+async def compute_ai_direction(symbol: str, timeframe: str, tech_indicators: Optional[dict] = None, sentiment: Optional[dict] = None) -> dict:
+    """Run the AI model for a price direction, reusing indicators and sentiment when already computed"""
+    try:
+        # Get technical indicators
+        if tech_indicators is None:
+            tech_indicators = await calculate_technical_indicators(symbol, timeframe)
+        if sentiment is None:
+            sentiment = await analyze_crypto_sentiment(symbol)
+        
+        if not tech_indicators:
+            # Fallback to simple prediction
+            return {
+                "direction": random.choice(["UP", "DOWN"]),
+                "confidence": random.uniform(55, 75),
+                "reasoning": "Limited data available, using basic analysis"
+            }
+        
+        # Prepare features and run the AI model off the event loop
+        features = build_features(tech_indicators, sentiment)
+        with span("inference"):
+            prediction, prediction_proba = await analysis_executor.run(predict_direction, features)
+        
+        direction = "UP" if prediction == 1 else "DOWN"
+        confidence = float(adjust_confidence(
+            max(prediction_proba) * 100,
+            tech_indicators.get("volatility", 0),
+            sentiment.get("overall_sentiment", 0)
+        ))
+        
+        reasoning_parts = []
+        
+        if tech_indicators.get("rsi", 50) > 70:
+            reasoning_parts.append("RSI показывает перекупленность")
+        elif tech_indicators.get("rsi", 50) < 30:
+            reasoning_parts.append("RSI показывает перепроданность")
+        
+        if sentiment.get("overall_sentiment", 0) > 0.3:
+            reasoning_parts.append("Позитивный настрой в социальных сетях")
+        elif sentiment.get("overall_sentiment", 0) < -0.3:
+            reasoning_parts.append("Негативный настрой в социальных сетях")
+        
+        if tech_indicators.get("price_vs_sma5", 0) > 2:
+            reasoning_parts.append("Цена выше скользящей средней")
+        elif tech_indicators.get("price_vs_sma5", 0) < -2:
+            reasoning_parts.append("Цена ниже скользящей средней")
+        
+        reasoning = "; ".join(reasoning_parts) if reasoning_parts else "Комплексный технический анализ"
+        
+        return {
+            "direction": direction,
+            "confidence": round(confidence, 1),
+            "reasoning": reasoning,
+            "technical_score": prediction_proba[1] if prediction == 1 else prediction_proba[0],
+            "sentiment_score": sentiment.get("overall_sentiment", 0)
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in AI prediction for {symbol}: {e}")
+        return {
+            "direction": random.choice(["UP", "DOWN"]),
+            "confidence": random.uniform(60, 80),
+            "reasoning": "Использован резервный алгоритм анализа"
+        }
+
+# Expiry in minutes for AI prediction timeframes
+AI_TIMEFRAME_MINUTES = {"15m": 15, "1h": 60, "4h": 240}
+
+# Top crypto symbols to analyze
+GENERATION_SYMBOLS = ["BTC", "ETH", "BNB", "ADA", "SOL", "DOT", "DOGE", "AVAX"]
+GENERATION_TIMEFRAMES = list(AI_TIMEFRAME_MINUTES)
+
+# Background generation cycle settings
+GENERATION_INTERVAL_SECONDS = float(os.environ.get('GENERATION_INTERVAL_SECONDS', 300))
+GENERATION_FETCH_CONCURRENCY = int(os.environ.get('GENERATION_FETCH_CONCURRENCY', 8))
+GENERATION_ANALYZE_CONCURRENCY = int(os.environ.get('GENERATION_ANALYZE_CONCURRENCY', 4))
+GENERATION_PERSIST_CONCURRENCY = int(os.environ.get('GENERATION_PERSIST_CONCURRENCY', 16))
+GENERATION_QUEUE_SIZE = int(os.environ.get('GENERATION_QUEUE_SIZE', 1000))
+
+# Summary of the most recent generation cycle
+last_generation_cycle = {}
+
+async def create_ai_signal(symbol: str, timeframe: str, now: Optional[datetime] = None) -> dict:
+    """Run the AI analysis for a symbol/timeframe and store it as a shared signal"""
+    signal, _ = await analyze_ai_signal(symbol, timeframe, now)
+    return signal
+
+async def analyze_ai_signal(symbol: str, timeframe: str, now: Optional[datetime] = None) -> Tuple[dict, bool]:
+    """Create and store a shared signal; also says whether the model produced it"""
+    tech_indicators, sentiment = await asyncio.gather(
+        calculate_technical_indicators(symbol, timeframe),
+        analyze_crypto_sentiment(symbol)
+    )
+    ai_result = await ai_predict_direction(symbol, timeframe, tech_indicators, sentiment)
+    
+    signal = build_signal_document(symbol, timeframe, ai_result, tech_indicators, sentiment, now)
+    with span("db_signal_insert"):
+        await background_db.ai_signals.insert_one(signal)
+    return signal, is_model_result(ai_result)
+
+async def get_ai_signal(symbol: str, timeframe: str) -> dict:
+    """Shared signal for a manual request, created at most once per symbol, timeframe and time bucket"""
+    signal, _ = await ai_signal_memo.get(
+        (symbol, timeframe),
+        lambda: analyze_ai_signal(symbol, timeframe),
+        # A fallback signal is shared only by requests already waiting on it
+        cache_if=lambda analyzed: analyzed[1]
+    )
+    return signal
+
+async def run_generation_cycle() -> dict:
+    """Generate one round of AI predictions as a fetch -> analyze -> persist pipeline"""
+    # One shared signal per (symbol, timeframe) and one price per (symbol, currency) per cycle
+    cycle_signals = SharedResults()
+    cycle_prices = SharedResults()
+    
+    async def planned_predictions():
+        # Stream users with auto predictions enabled and draw 1-2 predictions for each
+        users = background_db.users.find(
+            {"auto_predictions_enabled": {"$ne": False}},
+            {"_id": 0, "id": 1, "name": 1, "preferred_currency": 1}
+        )
+        async for user in users:
+            for _ in range(random.randint(1, 2)):
+                yield {"user": user, "symbol": random.choice(GENERATION_SYMBOLS), "timeframe": random.choice(GENERATION_TIMEFRAMES)}
+    
+    async def fetch(item):
+        currency = item["user"].get("preferred_currency", "USD")
+        item["currency"] = currency
+        item["entry_price"] = await cycle_prices.get(
+            (item["symbol"], currency),
+            lambda: get_current_price_for_symbol(item["symbol"], currency)
+        )
+        return item
+    
+    async def analyze(item):
+        item["signal"] = await cycle_signals.get(
+            (item["symbol"], item["timeframe"]),
+            lambda: create_ai_signal(item["symbol"], item["timeframe"])
+        )
+        return item
+    
+    async def persist(item):
+        now = datetime.utcnow()
+        expiry_time = now + timedelta(minutes=AI_TIMEFRAME_MINUTES.get(item["timeframe"], 60))
+        
+        # Queue lightweight per-user reference for a batched insert
+        prediction_data = build_prediction_reference(
+            item["signal"], item["user"]["id"], item["entry_price"], now, expiry_time, item["currency"]
+        )
+        await ai_prediction_writer.put(prediction_data)
+        
+        # Sampled by LOG_SAMPLE_RATES; the cycle summary carries the totals
+        logger.info("Generated AI prediction", extra=log_event(
+            "generation.prediction",
+            user_id=item["user"]["id"],
+            symbol=item["symbol"],
+            timeframe=item["timeframe"],
+            direction=item["signal"]["direction"],
+            confidence=item["signal"]["confidence_score"]
+        ))
+    
+    pipeline = Pipeline([
+        Stage("fetch", fetch, GENERATION_FETCH_CONCURRENCY, GENERATION_QUEUE_SIZE),
+        Stage("analyze", analyze, GENERATION_ANALYZE_CONCURRENCY, GENERATION_QUEUE_SIZE),
+        Stage("persist", persist, GENERATION_PERSIST_CONCURRENCY, GENERATION_QUEUE_SIZE),
+    ])
+    summary = await pipeline.run(planned_predictions())
+    summary["shared_signals"] = len(cycle_signals)
+    summary["shared_prices"] = len(cycle_prices)
+    return summary
+
+# Background task for generating AI predictions
+async def generate_ai_predictions():
+    """Background task that generates AI predictions every 5 minutes"""
+    global last_generation_cycle
+    
+    while True:
+        started = time.monotonic()
+        try:
+            last_generation_cycle = await run_generation_cycle()
+            metrics.generation_cycle_duration.observe(time.monotonic() - started)
+            
+            # One summary record per cycle instead of a line per prediction
+            stages = last_generation_cycle["stages"]
+            logger.info("AI predictions generation completed", extra=log_event(
+                "generation.cycle",
+                predictions=stages["persist"]["count"] - stages["persist"]["errors"],
+                errors=sum(stage["errors"] for stage in stages.values()),
+                writer=ai_prediction_writer.stats(),
+                **last_generation_cycle
+            ))
+            
+        except Exception as e:
+            logger.error(f"Error in AI predictions background task: {e}", extra=log_event("generation.cycle_failed"))
+        
+        # Keep a fixed cadence regardless of how long the cycle took
+        # Replay and synthetic market data can run faster than real time; scale the cycle with it
+        interval = GENERATION_INTERVAL_SECONDS / market_data.speed
+        await asyncio.sleep(max(0, interval - (time.monotonic() - started)))
+
+async def publish_shared_indicators():
+    """Background task that computes indicators once and publishes them to every worker"""
+    while True:
+        started = time.monotonic()
+        try:
+            if market_snapshot.acquire_publisher():
+                for symbol in GENERATION_SYMBOLS:
+                    for timeframe in SHARED_INDICATOR_TIMEFRAMES:
+                        indicators = await compute_chart_indicators(symbol, timeframe)
+                        if indicators:
+                            market_snapshot.update_indicators(coin_id_for(symbol), timeframe, indicators)
+                market_snapshot.publish()
+        except Exception as e:
+            logger.error(f"Error publishing shared indicators: {e}")
+        
+        interval = MARKET_SNAPSHOT_INDICATOR_INTERVAL / market_data.speed
+        await asyncio.sleep(max(0, interval - (time.monotonic() - started)))
+
+def calculate_prediction_confidence(symbol: str, direction: str, timeframe: str):
+    """Calculate prediction confidence based on market analysis (mock)"""
+    import random
+    
+    # Base confidence varies by symbol volatility
+    base_confidence = {
+        "BTC": 75.0, "ETH": 73.0, "BNB": 70.0, "ADA": 68.0, "SOL": 65.0,
+        "DOT": 67.0, "DOGE": 60.0, "AVAX": 66.0, "LINK": 69.0, "MATIC": 68.0
+    }
+    
+    confidence = base_confidence.get(symbol, 65.0)
+    
+    # Adjust for timeframe (shorter = lower confidence)
+    timeframe_multipliers = {
+        "1m": 0.85, "5m": 0.90, "15m": 0.95, "30m": 1.0,
+        "1h": 1.05, "4h": 1.10, "1d": 1.15
+    }
+    
+    confidence *= timeframe_multipliers.get(timeframe, 1.0)
+    
+    # Add some randomness
+    confidence += random.uniform(-5, 5)
+    
+    return round(min(95, max(55, confidence)), 1)
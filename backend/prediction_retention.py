@@ -0,0 +1,170 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+
+from prediction_stats import counter_key
+from signal_store import join_signals
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_RETENTION_DAYS = float(os.environ.get('PREDICTION_RETENTION_DAYS', 7))
+PREDICTION_ARCHIVE_DIR = Path(os.environ.get('PREDICTION_ARCHIVE_DIR', Path(__file__).parent / "archive"))
+RETENTION_INTERVAL_SECONDS = float(os.environ.get('RETENTION_INTERVAL_SECONDS', 3600))
+RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', 1000))
+
+# Collections covered by retention; AI predictions are joined with their signals before archiving
+RETAINED_COLLECTIONS = ("ai_predictions", "binary_predictions")
+
+SETTLED_STATUSES = {"WON": "won", "LOST": "lost", "EXPIRED": "expired"}
+
+
+def _day(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+
+def _write_archive(archive_dir: Path, collection: str, documents: List[dict]) -> List[Path]:
+    """Append documents to per-day gzip NDJSON files, one gzip member per call"""
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    by_day = {}
+    for doc in documents:
+        by_day.setdefault(_day(doc["created_at"]), []).append(doc)
+
+    paths = []
+    for day, docs in by_day.items():
+        path = archive_dir / f"{collection}-{day}.ndjson.gz"
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json.dumps(doc, ensure_ascii=False, default=str))
+                f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        paths.append(path)
+    return paths
+
+
+def build_rollup_updates(collection: str, documents: List[dict]) -> List[UpdateOne]:
+    """Aggregate documents into per-user/per-symbol daily counters as $inc upserts"""
+    rollups = {}
+    for doc in documents:
+        key = (doc.get("user_id"), doc.get("symbol"), _day(doc["created_at"]))
+        counters = rollups.setdefault(key, {"total": 0, "won": 0, "lost": 0, "expired": 0, "active": 0, "confidence_sum": 0.0})
+        outcome = SETTLED_STATUSES.get(doc.get("status"), "active")
+        counters["total"] += 1
+        counters[outcome] += 1
+        counters["confidence_sum"] += float(doc.get("confidence_score") or 0)
+        # Per-timeframe win/loss counters let accuracy stats be rebuilt after raw documents are archived
+        if outcome in ("won", "lost") and doc.get("timeframe"):
+            counter = f"timeframes.{counter_key(doc['timeframe'])}.{outcome}"
+            counters[counter] = counters.get(counter, 0) + 1
+
+    now = datetime.utcnow()
+    return [
+        UpdateOne(
+            {"source": collection, "user_id": user_id, "symbol": symbol, "day": day},
+            {"$inc": counters, "$set": {"updated_at": now}},
+            upsert=True
+        )
+        for (user_id, symbol, day), counters in rollups.items()
+    ]
+
+
+def format_rollup(rollup: dict) -> dict:
+    """Add derived win rate and average confidence to a stored rollup"""
+    settled = rollup.get("won", 0) + rollup.get("lost", 0)
+    total = rollup.get("total", 0)
+    rollup = {k: v for k, v in rollup.items() if k != "_id"}
+    rollup["win_rate"] = round(rollup.get("won", 0) / settled * 100, 2) if settled else None
+    rollup["average_confidence"] = round(rollup.get("confidence_sum", 0) / total, 2) if total else None
+    return rollup
+
+
+async def ensure_retention_indexes(db):
+    await db.prediction_rollups.create_index(
+        [("user_id", ASCENDING), ("source", ASCENDING), ("day", ASCENDING), ("symbol", ASCENDING)],
+        unique=True
+    )
+    for collection in RETAINED_COLLECTIONS:
+        await db[collection].create_index("created_at")
+
+
+async def archive_collection(db, collection: str, cutoff: datetime, archive_dir: Path = PREDICTION_ARCHIVE_DIR,
+                             batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Archive, roll up and delete documents older than cutoff, oldest first.
+
+    Each batch is written to disk and rolled up before it is deleted, so a crash
+    can at worst archive and count a batch twice, never lose one.
+    """
+    archived = 0
+    while True:
+        documents = await db[collection].find({"created_at": {"$lt": cutoff}}).sort("created_at", 1).to_list(batch_size)
+        if not documents:
+            break
+
+        ids = [doc.pop("_id") for doc in documents]
+        if collection == "ai_predictions":
+            documents = await join_signals(db, documents)
+
+        await asyncio.to_thread(_write_archive, archive_dir, collection, documents)
+        await db.prediction_rollups.bulk_write(build_rollup_updates(collection, documents), ordered=False)
+        await db[collection].delete_many({"_id": {"$in": ids}})
+        archived += len(ids)
+
+    return archived
+
+
+async def prune_signals(db, cutoff: datetime, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Delete shared signals older than cutoff that no prediction references any more"""
+    pruned = 0
+    last_id = None
+    while True:
+        query = {"created_at": {"$lt": cutoff}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        signals = await db.ai_signals.find(query, {"id": 1}).sort("_id", 1).to_list(batch_size)
+        if not signals:
+            break
+        last_id = signals[-1]["_id"]
+
+        ids = [signal["id"] for signal in signals]
+        referenced = set(await db.ai_predictions.distinct("signal_id", {"signal_id": {"$in": ids}}))
+        orphaned = [signal_id for signal_id in ids if signal_id not in referenced]
+        if orphaned:
+            result = await db.ai_signals.delete_many({"id": {"$in": orphaned}})
+            pruned += result.deleted_count
+
+    return pruned
+
+
+async def run_retention(db, now: Optional[datetime] = None, retention_days: float = PREDICTION_RETENTION_DAYS,
+                        archive_dir: Path = PREDICTION_ARCHIVE_DIR) -> dict:
+    """Run one retention pass over every retained prediction collection"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    result = {"cutoff": cutoff.isoformat()}
+    for collection in RETAINED_COLLECTIONS:
+        result[collection] = await archive_collection(db, collection, cutoff, archive_dir)
+    result["ai_signals_pruned"] = await prune_signals(db, cutoff)
+    return result
+
+
+async def retention_loop(db, interval: float = RETENTION_INTERVAL_SECONDS, should_run: Callable[[], bool] = lambda: True):
+    """Background task that applies prediction retention periodically.
+
+    Batches are archived and rolled up before they are deleted, so two workers
+    running it at once would count them twice; should_run elects one.
+    """
+    while True:
+        try:
+            if should_run():
+                result = await run_retention(db)
+                logger.info(f"Prediction retention completed: {result}")
+        except Exception as e:
+            logger.error(f"Error in prediction retention task: {e}")
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+from urllib.parse import unquote
+
+from signal_store import join_signals
+
+logger = logging.getLogger(__name__)
+
+SETTLEMENT_INTERVAL_SECONDS = float(os.environ.get('SETTLEMENT_INTERVAL_SECONDS', 60))
+SETTLEMENT_BATCH_SIZE = int(os.environ.get('SETTLEMENT_BATCH_SIZE', 500))
+
+# Collections whose predictions are settled and counted
+SETTLED_COLLECTIONS = ("ai_predictions", "binary_predictions")
+
+PriceGetter = Callable[[str, str], Awaitable[float]]
+
+
+def prediction_outcome(direction: str, entry_price: float, result_price: float) -> str:
+    """WON when the price moved in the predicted direction, LOST otherwise"""
+    if direction == "UP":
+        return "WON" if result_price > entry_price else "LOST"
+    return "WON" if result_price < entry_price else "LOST"
+
+
+def counter_key(value: str) -> str:
+    """A symbol or timeframe as a counter field name; '.' and '$' would otherwise be read as path syntax"""
+    return str(value).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _stats_increments(symbol: str, timeframe: str, won: bool) -> dict:
+    outcome = "won" if won else "lost"
+    return {
+        "total": 1,
+        outcome: 1,
+        f"symbols.{counter_key(symbol)}.{outcome}": 1,
+        f"timeframes.{counter_key(timeframe)}.{outcome}": 1,
+    }
+
+
+async def record_outcome(db, user_id: str, symbol: str, timeframe: str, won: bool):
+    """Atomically add one settled prediction to the user's counters"""
+    await db.prediction_stats.update_one(
+        {"user_id": user_id},
+        {"$inc": _stats_increments(symbol, timeframe, won), "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    if won:
+        await db.users.update_one({"id": user_id}, {"$inc": {"successful_predictions": 1}})
+
+
+async def settle_collection(db, collection: str, get_price: PriceGetter, now: Optional[datetime] = None,
+                            batch_size: int = SETTLEMENT_BATCH_SIZE) -> int:
+    """Settle expired ACTIVE predictions in one collection.
+
+    The status flip is conditional on the document still being ACTIVE, so a
+    prediction is only ever counted by the settler that flipped it.
+    """
+    now = now or datetime.utcnow()
+    settled = 0
+    prices = {}
+    while True:
+        predictions = await db[collection].find(
+            {"status": "ACTIVE", "expiry_time": {"$lte": now}}, {"_id": 0}
+        ).to_list(batch_size)
+        if not predictions:
+            break
+        if collection == "ai_predictions":
+            predictions = await join_signals(db, predictions)
+
+        flipped = 0
+        for prediction in predictions:
+            symbol = prediction.get("symbol")
+            currency = prediction.get("currency", "USD")
+            if (symbol, currency) not in prices:
+                prices[(symbol, currency)] = await get_price(symbol, currency)
+            result_price = prices[(symbol, currency)]
+
+            status = prediction_outcome(prediction.get("direction"), prediction.get("entry_price", 0), result_price)
+            result = await db[collection].update_one(
+                {"id": prediction["id"], "status": "ACTIVE"},
+                {"$set": {"status": status, "result_price": result_price, "settled_at": now}}
+            )
+            if result.modified_count:
+                flipped += 1
+                await record_outcome(db, prediction["user_id"], symbol, prediction.get("timeframe"), status == "WON")
+
+        settled += flipped
+        if len(predictions) < batch_size:
+            break
+
+    return settled
+
+
+async def settle_expired_predictions(db, get_price: PriceGetter, now: Optional[datetime] = None) -> dict:
+    return {collection: await settle_collection(db, collection, get_price, now) for collection in SETTLED_COLLECTIONS}
+
+
+async def settlement_loop(db, get_price: PriceGetter, interval: float = SETTLEMENT_INTERVAL_SECONDS):
+    """Background task that settles expired predictions and updates accuracy counters"""
+    while True:
+        try:
+            result = await settle_expired_predictions(db, get_price)
+            if any(result.values()):
+                logger.info(f"Settled predictions: {result}")
+        except Exception as e:
+            logger.error(f"Error in prediction settlement task: {e}")
+
+        await asyncio.sleep(interval)
+
+
+def _accuracy(counters: dict) -> dict:
+    won = counters.get("won", 0)
+    lost = counters.get("lost", 0)
+    settled = won + lost
+    return {
+        "won": won,
+        "lost": lost,
+        "total": settled,
+        "accuracy": round(won / settled * 100, 2) if settled else None,
+    }
+
+
+def format_stats(stats: Optional[dict]) -> dict:
+    """Turn a stored counters document into the API response"""
+    stats = stats or {}
+    return {
+        **_accuracy(stats),
+        "by_symbol": {unquote(symbol): _accuracy(c) for symbol, c in stats.get("symbols", {}).items()},
+        "by_timeframe": {unquote(timeframe): _accuracy(c) for timeframe, c in stats.get("timeframes", {}).items()},
+        "updated_at": stats.get("updated_at"),
+    }
+
+
+async def get_user_stats(db, user_id: str) -> dict:
+    return format_stats(await db.prediction_stats.find_one({"user_id": user_id}, {"_id": 0}))
+
+
+async def ensure_stats_indexes(db):
+    await db.prediction_stats.create_index("user_id", unique=True)
+    for collection in SETTLED_COLLECTIONS:
+        await db[collection].create_index([("status", 1), ("expiry_time", 1)])
+
+
+def _add(stats: dict, user_id: str, path: tuple, won: int, lost: int):
+    doc = stats.setdefault(user_id, {"user_id": user_id, "total": 0, "won": 0, "lost": 0, "symbols": {}, "timeframes": {}})
+    if not path:
+        doc["won"] += won
+        doc["lost"] += lost
+        doc["total"] += won + lost
+        return
+    group, key = path
+    counters = doc[group].setdefault(counter_key(key), {"won": 0, "lost": 0})
+    counters["won"] += won
+    counters["lost"] += lost
+
+
+async def rebuild_prediction_stats(db, user_id: Optional[str] = None) -> int:
+    """Recompute counters from settled predictions and archived rollups.
+
+    Used when counters drift; the result replaces the stored counters.
+    """
+    match = {"user_id": user_id} if user_id else {}
+    stats = {}
+
+    for collection in SETTLED_COLLECTIONS:
+        pipeline = [
+            {"$match": {**match, "status": {"$in": ["WON", "LOST"]}}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "symbol": "$symbol", "timeframe": "$timeframe"},
+                "won": {"$sum": {"$cond": [{"$eq": ["$status", "WON"]}, 1, 0]}},
+                "lost": {"$sum": {"$cond": [{"$eq": ["$status", "LOST"]}, 1, 0]}},
+            }},
+        ]
+        async for row in db[collection].aggregate(pipeline):
+            key = row["_id"]
+            _add(stats, key["user_id"], (), row["won"], row["lost"])
+            _add(stats, key["user_id"], ("symbols", key["symbol"]), row["won"], row["lost"])
+            if key.get("timeframe"):
+                _add(stats, key["user_id"], ("timeframes", key["timeframe"]), row["won"], row["lost"])
+
+    # Archived predictions only survive as daily rollups
+    symbol_pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "symbol": "$symbol"},
+            "won": {"$sum": "$won"},
+            "lost": {"$sum": "$lost"},
+        }},
+    ]
+    async for row in db.prediction_rollups.aggregate(symbol_pipeline):
+        key = row["_id"]
+        _add(stats, key["user_id"], (), row["won"], row["lost"])
+        _add(stats, key["user_id"], ("symbols", key["symbol"]), row["won"], row["lost"])
+
+    timeframe_pipeline = [
+        {"$match": {**match, "timeframes": {"$exists": True}}},
+        {"$project": {"user_id": 1, "timeframes": {"$objectToArray": "$timeframes"}}},
+        {"$unwind": "$timeframes"},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "timeframe": "$timeframes.k"},
+            "won": {"$sum": {"$ifNull": ["$timeframes.v.won", 0]}},
+            "lost": {"$sum": {"$ifNull": ["$timeframes.v.lost", 0]}},
+        }},
+    ]
+    async for row in db.prediction_rollups.aggregate(timeframe_pipeline):
+        key = row["_id"]
+        _add(stats, key["user_id"], ("timeframes", unquote(key["timeframe"])), row["won"], row["lost"])
+
+    now = datetime.utcnow()
+    if user_id and user_id not in stats:
+        stats[user_id] = {"user_id": user_id, "total": 0, "won": 0, "lost": 0, "symbols": {}, "timeframes": {}}
+    for doc in stats.values():
+        doc["updated_at"] = now
+        await db.prediction_stats.replace_one({"user_id": doc["user_id"]}, doc, upsert=True)
+
+    return len(stats)
@@ -0,0 +1,36 @@
+import time
+from typing import Dict, Optional
+
+
+class PriceSnapshot:
+    """Latest USD price per symbol, shared by every request in the process.
+
+    Refreshed from the market-data fetches the app already performs, so
+    request paths can price entries without their own upstream call.
+    """
+
+    def __init__(self, max_age: float = 120.0):
+        self.max_age = max_age
+        self._prices: Dict[str, float] = {}
+        self.updated_at: Optional[float] = None
+        self.version = 0
+
+    def update(self, prices: Dict[str, float]):
+        self._prices.update({symbol.upper(): float(price) for symbol, price in prices.items() if price})
+        self.updated_at = time.monotonic()
+        self.version += 1
+
+    def update_from_market_data(self, crypto_data: list):
+        """Update from the list returned by the prices endpoint in USD"""
+        self.update({crypto["symbol"]: crypto.get("current_price") for crypto in crypto_data if crypto.get("symbol")})
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.updated_at is not None and time.monotonic() - self.updated_at <= self.max_age
+
+    def get(self, symbol: str, currency_rate: float = 1.0) -> Optional[float]:
+        """Price of symbol converted with currency_rate, or None when missing or stale"""
+        if not self.is_fresh:
+            return None
+        price = self._prices.get(symbol.upper())
+        return price * currency_rate if price is not None else None
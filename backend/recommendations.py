@@ -0,0 +1,219 @@
+"""Investment recommendations scored from price history.
+
+Every refresh pulls the recent chart of each coin, resamples them onto one
+hourly axis and scores the whole coins x hours matrix at once: the trend is a
+least-squares slope of log price, volatility the spread of hourly log returns
+and momentum the return over the last week. Target and stop-loss levels are
+placed a horizon's worth of volatility away from the current price. Ranked
+results are kept per currency, so serving them is a slice.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_HISTORY_DAYS = int(os.environ.get('RECOMMENDATION_HISTORY_DAYS', 30))
+RECOMMENDATION_HORIZON_DAYS = float(os.environ.get('RECOMMENDATION_HORIZON_DAYS', 30))
+RECOMMENDATION_FETCH_CONCURRENCY = int(os.environ.get('RECOMMENDATION_FETCH_CONCURRENCY', 8))
+
+MOMENTUM_DAYS = 7
+POINTS_PER_DAY = 24
+# |score| above this is a BUY or SELL, below it a HOLD
+SIGNAL_THRESHOLD = 0.25
+
+BUY, HOLD, SELL = "BUY", "HOLD", "SELL"
+
+
+def score_price_matrix(prices: np.ndarray, horizon_days: float = RECOMMENDATION_HORIZON_DAYS,
+                       points_per_day: int = POINTS_PER_DAY) -> Dict[str, np.ndarray]:
+    """Score every row of a coins x points matrix of evenly spaced prices.
+
+    Needs more than a week and a day of points per row. Returns per-coin arrays:
+    score in [-1, 1], recommendation type, confidence, target and stop-loss
+    prices, and the trend, momentum, volatility and hit rate behind them.
+    """
+    log_prices = np.log(prices)
+    points = prices.shape[1]
+    lookback = MOMENTUM_DAYS * points_per_day
+    if points <= lookback + points_per_day:
+        raise ValueError(f"Need more than {lookback + points_per_day} points per coin, got {points}")
+
+    # Trend: least-squares slope of log price in log return per day, and how well a line fits
+    days = np.arange(points) / points_per_day
+    days -= days.mean()
+    centered = log_prices - log_prices.mean(axis=1, keepdims=True)
+    slope = centered @ days / (days @ days)
+    residual = centered - np.outer(slope, days)
+    total = (centered ** 2).sum(axis=1)
+    fit = np.where(total > 0, 1 - (residual ** 2).sum(axis=1) / np.where(total > 0, total, 1), 0.0)
+
+    volatility = np.diff(log_prices, axis=1).std(axis=1) * np.sqrt(points_per_day)
+    volatility = np.maximum(volatility, 1e-9)
+    momentum = log_prices[:, -1] - log_prices[:, -1 - lookback]
+
+    # Drift and momentum in units of the volatility expected over the same span
+    trend_strength = slope * np.sqrt(horizon_days) / volatility
+    momentum_strength = momentum / (volatility * np.sqrt(MOMENTUM_DAYS))
+    score = 0.6 * np.tanh(trend_strength) + 0.4 * np.tanh(momentum_strength)
+
+    kind = np.where(score > SIGNAL_THRESHOLD, BUY, np.where(score < -SIGNAL_THRESHOLD, SELL, HOLD))
+    conviction = np.abs(score)
+    confidence = np.where(
+        kind == HOLD,
+        55 + 20 * (1 - conviction / SIGNAL_THRESHOLD),
+        50 + 45 * conviction * (0.5 + 0.5 * fit)
+    )
+    confidence = np.clip(confidence, 55, 95)
+
+    # Levels: one horizon of volatility plus the trend's drift over the horizon, capped at another one;
+    # the stop is one horizon of volatility against the position
+    current = prices[:, -1]
+    move = volatility * np.sqrt(horizon_days)
+    drift = np.clip(slope * horizon_days, -move, move)
+    target = np.where(
+        kind == BUY, current * np.exp(np.maximum(drift, 0) + move),
+        np.where(kind == SELL, current * np.exp(np.minimum(drift, 0) - move), current * np.exp(move / 2))
+    )
+    stop_loss = np.where(kind == SELL, current * np.exp(move), current * np.exp(-move))
+
+    # How often the sign of the trailing week called the direction of the following day
+    past = log_prices[:, lookback:points - points_per_day] - log_prices[:, :points - points_per_day - lookback]
+    future = log_prices[:, lookback + points_per_day:] - log_prices[:, lookback:points - points_per_day]
+    hit_rate = (np.sign(past) == np.sign(future)).mean(axis=1)
+
+    return {
+        "score": score,
+        "type": kind,
+        "confidence": confidence,
+        "target_price": target,
+        "stop_loss": stop_loss,
+        "current_price": current,
+        "trend": np.expm1(slope * (points - 1) / points_per_day),
+        "momentum": np.expm1(momentum),
+        "volatility": volatility,
+        "hit_rate": hit_rate,
+    }
+
+
+def resample(timestamps: np.ndarray, prices: np.ndarray, axis: np.ndarray) -> Optional[np.ndarray]:
+    """Prices at each axis point, or None if the series starts after the axis does"""
+    if not len(timestamps) or timestamps[0] > axis[0]:
+        return None
+    return np.interp(axis, timestamps, prices)
+
+
+def _round_price(value: float) -> float:
+    return float(f"{value:.6g}")
+
+
+def _holding_period(volatility: float) -> str:
+    if volatility > 0.05:
+        return "1-2 weeks"
+    if volatility > 0.025:
+        return "2-4 weeks"
+    return "1-3 months"
+
+
+def _reason(trend: float, momentum: float, volatility: float, days: int) -> str:
+    direction = "Восходящий тренд" if trend >= 0 else "Нисходящий тренд"
+    return (f"{direction} {trend * 100:+.1f}% за {days} дней, импульс {momentum * 100:+.1f}% за неделю, "
+            f"волатильность {volatility * 100:.1f}% в день")
+
+
+class RecommendationEngine:
+    """Periodically recomputed, ranked recommendations for a list of coins"""
+
+    def __init__(self, coin_ids: List[str], get_chart: Callable[[str, int], Awaitable[dict]],
+                 get_symbols: Callable[[], Awaitable[Dict[str, str]]], currency_rates: Dict[str, float],
+                 history_days: int = RECOMMENDATION_HISTORY_DAYS, concurrency: int = RECOMMENDATION_FETCH_CONCURRENCY):
+        self.coin_ids = list(coin_ids)
+        self.get_chart = get_chart
+        self.get_symbols = get_symbols
+        self.currency_rates = currency_rates
+        self.history_days = history_days
+        self.concurrency = concurrency
+        self.refreshed_at: Optional[float] = None
+        self._results: Dict[str, List[dict]] = {}
+        self._refreshing: Optional[asyncio.Task] = None
+
+    async def _history(self, coin_id: str, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                chart = await self.get_chart(coin_id, self.history_days)
+                points = np.asarray(chart.get("prices") or [], dtype=float).reshape(-1, 2)
+            except Exception as e:
+                logger.warning(f"No price history for {coin_id}: {e}")
+                return None
+        points = points[np.isfinite(points[:, 1]) & (points[:, 1] > 0)]
+        return points[:, 0] / 1000, points[:, 1]
+
+    async def refresh(self) -> int:
+        """Rescore every coin; keeps the previous results if no history could be fetched"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        histories = await asyncio.gather(*(self._history(coin_id, semaphore) for coin_id in self.coin_ids))
+        available = [(coin_id, history) for coin_id, history in zip(self.coin_ids, histories)
+                     if history is not None and len(history[0])]
+        if not available:
+            logger.warning("No price history for any coin, keeping the previous recommendations")
+            return 0
+
+        # One hourly axis ending at the newest point any coin has
+        end = max(history[0][-1] for _, history in available)
+        axis = end - np.arange(self.history_days * POINTS_PER_DAY, -1, -1) * (86400 / POINTS_PER_DAY)
+        rows, coin_ids = [], []
+        for coin_id, (timestamps, prices) in available:
+            row = resample(timestamps, prices, axis)
+            if row is not None:
+                rows.append(row)
+                coin_ids.append(coin_id)
+        if not rows:
+            logger.warning("No coin has a full price history, keeping the previous recommendations")
+            return 0
+
+        scores = score_price_matrix(np.vstack(rows))
+        symbols = await self.get_symbols()
+        created_at = datetime.utcnow().isoformat()
+        ranked = []
+        for index in np.argsort(-scores["confidence"], kind="stable"):
+            ranked.append({
+                "id": str(uuid.uuid4()),
+                "symbol": symbols.get(coin_ids[index], coin_ids[index].upper()),
+                "recommendation_type": str(scores["type"][index]),
+                "confidence": round(float(scores["confidence"][index]), 1),
+                "current_price": float(scores["current_price"][index]),
+                "target_price": float(scores["target_price"][index]),
+                "stop_loss": float(scores["stop_loss"][index]),
+                "timeframe": _holding_period(float(scores["volatility"][index])),
+                "reason": _reason(float(scores["trend"][index]), float(scores["momentum"][index]),
+                                  float(scores["volatility"][index]), self.history_days),
+                "accuracy_rating": round(float(scores["hit_rate"][index]) * 100, 1),
+                "score": round(float(scores["score"][index]), 3),
+                "created_at": created_at
+            })
+
+        self._results = {
+            currency: [
+                {**recommendation, "currency": currency,
+                 **{key: _round_price(recommendation[key] * rate) for key in ("current_price", "target_price", "stop_loss")}}
+                for recommendation in ranked
+            ]
+            for currency, rate in self.currency_rates.items()
+        }
+        self.refreshed_at = time.time()
+        return len(ranked)
+
+    async def top(self, currency: str = "USD", limit: int = 10) -> List[dict]:
+        """Highest-confidence recommendations in a currency; scores once if nothing was computed yet"""
+        if self.refreshed_at is None:
+            if self._refreshing is None or self._refreshing.done():
+                self._refreshing = asyncio.ensure_future(self.refresh())
+            await asyncio.shield(self._refreshing)
+        results = self._results.get(currency.upper()) or self._results.get("USD", [])
+        return results[:limit]
@@ -0,0 +1,104 @@
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+
+class Span:
+    __slots__ = ("name", "parent", "started", "duration", "children")
+
+    def __init__(self, name: str, parent: Optional["Span"]):
+        self.name = name
+        self.parent = parent
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.children: List["Span"] = []
+
+
+class Trace:
+    """Spans recorded while serving one request"""
+
+    def __init__(self, name: str = "total"):
+        self.root = Span(name, None)
+        self.spans: List[Span] = []
+
+    def finish(self):
+        self.root.duration = time.perf_counter() - self.root.started
+
+    def server_timing(self) -> str:
+        """Aggregate spans by name into a Server-Timing header value"""
+        totals = {}
+        for span in self.spans:
+            if span.duration is None:
+                continue
+            duration, count = totals.get(span.name, (0.0, 0))
+            totals[span.name] = (duration + span.duration, count + 1)
+
+        entries = [f"{self.root.name};dur={self.root.duration * 1000:.1f}"]
+        for name, (duration, count) in totals.items():
+            entry = f"{name};dur={duration * 1000:.1f}"
+            if count > 1:
+                entry += f';desc="x{count}"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+    def format_tree(self) -> str:
+        lines = []
+
+        def walk(span: Span, depth: int):
+            duration = f"{span.duration * 1000:.1f}ms" if span.duration is not None else "unfinished"
+            offset = (span.started - self.root.started) * 1000
+            lines.append(f"{'  ' * depth}{span.name} {duration} (+{offset:.1f}ms)")
+            for child in span.children:
+                walk(child, depth + 1)
+
+        walk(self.root, 0)
+        return "\n".join(lines)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+# The parent is tracked per task: tasks copy the context, so concurrent children never see each other
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def start_trace(name: str = "total") -> Trace:
+    trace = Trace(name)
+    _current_trace.set(trace)
+    _current_span.set(trace.root)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """Record a timed span in the current request; a no-op outside a request"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get() or trace.root
+    record = Span(name, parent)
+    parent.children.append(record)
+    trace.spans.append(record)
+    token = _current_span.set(record)
+    try:
+        yield record
+    finally:
+        record.duration = time.perf_counter() - record.started
+        _current_span.reset(token)
+
+
+def timed(name: str):
+    """Decorator recording every call of an async function as a span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from bson import ObjectId
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def encode_json(content) -> bytes:
+    """Encode content the same way FastAPI's JSONResponse does"""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=_default,
+    ).encode("utf-8")
+
+
+class ResponseCache:
+    """Cache of pre-encoded JSON response bodies.
+
+    Entries are keyed by route and normalized query parameters and are tagged
+    with the version of the data namespace they were built from. Bumping a
+    namespace version invalidates every entry built from it; an optional TTL
+    bounds how long an entry may be served without a bump.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[int, float, bytes]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def make_key(route: str, params: Optional[dict] = None) -> Tuple:
+        return (route, tuple(sorted((params or {}).items())))
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str) -> int:
+        """Invalidate every entry built from the given data namespace"""
+        self._versions[namespace] = self.version(namespace) + 1
+        return self._versions[namespace]
+
+    def get(self, key: Tuple, namespace: str, ttl: Optional[float] = None) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        version, built_at, body = entry
+        if version != self.version(namespace) or (ttl is not None and time.monotonic() - built_at > ttl):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return body
+
+    def put(self, key: Tuple, namespace: str, body: bytes, version: Optional[int] = None):
+        if version is None:
+            version = self.version(namespace)
+        self._entries[key] = (version, time.monotonic(), body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_build(
+        self,
+        route: str,
+        params: Optional[dict],
+        builder: Callable[[], Awaitable],
+        namespace: str = "default",
+        ttl: Optional[float] = None,
+    ) -> bytes:
+        """Return the cached body for route/params, building and encoding it on a miss.
+
+        Concurrent misses for the same key share a single build.
+        """
+        key = self.make_key(route, params)
+        body = self.get(key, namespace, ttl)
+        if body is not None:
+            self.hits += 1
+            self.bytes_served += len(body)
+            self.bytes_saved += len(body)
+            return body
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            body = await asyncio.shield(inflight)
+            self.hits += 1
+            self.bytes_served += len(body)
+            self.bytes_saved += len(body)
+            return body
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            version = self.version(namespace)
+            body = encode_json(await builder())
+            self.put(key, namespace, body, version)
+            future.set_result(body)
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        self.bytes_served += len(body)
+        return body
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes_served": self.bytes_served,
+            "bytes_saved": self.bytes_saved,
+            "versions": dict(self._versions),
+        }
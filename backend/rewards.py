@@ -0,0 +1,123 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+DAILY_BONUS_PREDICTIONS = 1
+REFERRAL_BONUS_PREDICTIONS = 1
+
+# Server error code returned when transactions are used against a standalone mongod
+ILLEGAL_OPERATION = 20
+
+
+class RewardError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+async def claim_daily_bonus(db, user_id: str, now: Optional[datetime] = None) -> int:
+    """Grant the daily bonus in a single conditional update.
+
+    The eligibility check lives in the filter, so concurrent claims cannot
+    both succeed. Returns the new free_predictions balance.
+    """
+    now = now or datetime.utcnow()
+    previous = await db.users.find_one_and_update(
+        {
+            "id": user_id,
+            "$or": [
+                {"last_bonus_claim": None},
+                {"last_bonus_claim": {"$lte": now - timedelta(days=1)}}
+            ]
+        },
+        {
+            "$inc": {"free_predictions": DAILY_BONUS_PREDICTIONS},
+            "$set": {"last_bonus_claim": now}
+        },
+        projection={"_id": 0, "free_predictions": 1}
+    )
+    if not previous:
+        raise RewardError(400, "Bonus already claimed today")
+    return previous.get("free_predictions", 0) + DAILY_BONUS_PREDICTIONS
+
+
+async def _credit_referral(db, user_id: str, referral_code: str, session=None) -> dict:
+    referrer = await db.users.find_one_and_update(
+        {"referral_code": referral_code, "id": {"$ne": user_id}},
+        {"$inc": {"referral_count": 1, "referral_earnings": 1, "free_predictions": REFERRAL_BONUS_PREDICTIONS}},
+        projection={"_id": 0, "id": 1},
+        session=session
+    )
+    if not referrer:
+        raise RewardError(404, "Invalid referral code")
+
+    referred = await db.users.find_one_and_update(
+        {"id": user_id, "referred_by": None},
+        {"$set": {"referred_by": referrer["id"]}, "$inc": {"free_predictions": REFERRAL_BONUS_PREDICTIONS}},
+        projection={"_id": 0, "id": 1},
+        session=session
+    )
+    if not referred:
+        raise RewardError(400, "Referral code already used")
+    return referrer
+
+
+async def _apply_referral_without_transaction(db, user_id: str, referral_code: str) -> dict:
+    # The conditional update on the referred user is what makes this exactly-once;
+    # the referrer is only credited after it succeeds.
+    referrer = await db.users.find_one({"referral_code": referral_code, "id": {"$ne": user_id}}, {"_id": 0, "id": 1})
+    if not referrer:
+        raise RewardError(404, "Invalid referral code")
+
+    referred = await db.users.find_one_and_update(
+        {"id": user_id, "referred_by": None},
+        {"$set": {"referred_by": referrer["id"]}, "$inc": {"free_predictions": REFERRAL_BONUS_PREDICTIONS}},
+        projection={"_id": 0, "id": 1}
+    )
+    if not referred:
+        raise RewardError(400, "Referral code already used")
+
+    await db.users.update_one(
+        {"id": referrer["id"]},
+        {"$inc": {"referral_count": 1, "referral_earnings": 1, "free_predictions": REFERRAL_BONUS_PREDICTIONS}}
+    )
+    return referrer
+
+
+class ReferralService:
+    """Applies referral codes as one transaction over both users.
+
+    Falls back to ordered conditional updates when the deployment does not
+    support transactions (standalone mongod).
+    """
+
+    def __init__(self, client, db):
+        self.client = client
+        self.db = db
+        self.transactions_supported: Optional[bool] = None
+
+    async def apply(self, user_id: str, referral_code: str) -> dict:
+        if self.transactions_supported is not False:
+            try:
+                return await self._apply_in_transaction(user_id, referral_code)
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                logger.warning("MongoDB transactions unavailable, applying referrals without a transaction")
+                self.transactions_supported = False
+
+        return await _apply_referral_without_transaction(self.db, user_id, referral_code)
+
+    async def _apply_in_transaction(self, user_id: str, referral_code: str) -> dict:
+        async def callback(session):
+            return await _credit_referral(self.db, user_id, referral_code, session=session)
+
+        async with await self.client.start_session() as session:
+            referrer = await session.with_transaction(callback)
+        self.transactions_supported = True
+        return referrer
@@ -0,0 +1,716 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import aiohttp
+from fastapi import APIRouter, Cookie, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+import metrics
+from binary_predictions import BinaryPredictionError, create_binary_prediction, validate_binary_prediction
+from candles import CANDLE_MAX_CACHED, CANDLE_TIMEFRAMES, format_candles
+from database import client, db, history_db, own_history_db
+from idempotency import (
+    IdempotencyError, claim_idempotency_key, complete_idempotency_key, record_idempotency_resource,
+    release_idempotency_key, request_fingerprint
+)
+from market import (
+    CHART_BATCH_MAX_SYMBOLS, CHART_CACHE_TTL, CRYPTO_LIST, CURRENCY_RATES, PRICES_CACHE_TTL,
+    RECOMMENDATIONS_CACHE_TTL, SUPPORTED_CURRENCIES, candle_store, coin_id_for, fetch_crypto_prices,
+    get_crypto_chart_data, get_crypto_charts, get_current_price_for_symbol, get_entry_price, is_supported_symbol,
+    mock_crypto_prices, recommendation_engine, resolve_symbol, response_cache
+)
+from ml import AI_TIMEFRAME_MINUTES, ai_prediction_writer, calculate_prediction_confidence, get_ai_signal
+from prediction_retention import format_rollup
+from prediction_stats import get_user_stats, rebuild_prediction_stats
+from request_timing import span
+from response_cache import encode_json
+from rewards import ReferralService, RewardError, claim_daily_bonus as grant_daily_bonus
+from signal_store import build_prediction_reference, join_signals, merge_prediction
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Auth upstream; overridable so load tests can point at a local stand-in
+AUTH_SESSION_URL = os.environ.get('AUTH_SESSION_URL', 'https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data')
+referral_service = ReferralService(client, db)
+
+# Models
+class User(BaseModel):
+    id: str
+    email: str
+    name: str
+    picture: str
+    free_predictions: int = 5
+    total_predictions_used: int = 0
+    successful_predictions: int = 0
+    referral_code: str
+    referred_by: Optional[str] = None
+    referral_count: int = 0
+    referral_earnings: int = 0
+    created_at: datetime
+    last_bonus_claim: Optional[datetime] = None
+    # User settings
+    theme: str = "green"  # Changed default to green theme
+    language: str = "ru"
+    notifications_enabled: bool = True
+    preferred_currency: str = "USD"
+    auto_predictions_enabled: bool = True
+
+class Session(BaseModel):
+    session_token: str
+    user_id: str
+    expires_at: datetime
+    created_at: datetime
+
+class AIBinaryPrediction(BaseModel):
+    id: str
+    user_id: str
+    symbol: str
+    direction: str  # "UP" or "DOWN"
+    timeframe: str  # "5m", "15m", "1h", "4h"
+    entry_price: float
+    entry_time: datetime
+    expiry_time: datetime
+    confidence_score: float
+    status: str = "ACTIVE"  # "ACTIVE", "WON", "LOST", "EXPIRED"
+    result_price: Optional[float] = None
+    created_at: datetime
+    ai_generated: bool = True
+    technical_indicators: dict
+    sentiment_analysis: dict
+
+class BinaryPrediction(BaseModel):
+    id: str
+    user_id: str
+    symbol: str
+    direction: str  # "UP" or "DOWN"
+    timeframe: str  # "1m", "5m", "15m", "30m", "1h", "4h", "1d"
+    entry_price: float
+    entry_time: datetime
+    expiry_time: datetime
+    stake_amount: int  # Number of free predictions used (1 for normal, 2 for high stakes)
+    confidence_score: float
+    status: str = "ACTIVE"  # "ACTIVE", "WON", "LOST", "EXPIRED"
+    result_price: Optional[float] = None
+    created_at: datetime
+    is_free: bool = True
+
+class InvestmentRecommendation(BaseModel):
+    id: str
+    symbol: str
+    recommendation_type: str  # "BUY", "SELL", "HOLD"
+    confidence: float
+    target_price: float
+    stop_loss: float
+    timeframe: str
+    reason: str
+    created_at: datetime
+    accuracy_rating: float
+
+class CryptoData(BaseModel):
+    symbol: str
+    current_price: float
+    price_change_24h: float
+    price_change_percentage_24h: float
+    volume_24h: float
+    market_cap: float
+    last_updated: datetime
+
+# Dependency to get current user
+async def get_current_user(request: Request, session_token: Optional[str] = Cookie(None)) -> Optional[User]:
+    token = session_token
+    if not token:
+        auth_header = request.headers.get("Authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            token = auth_header.split(" ")[1]
+    
+    if not token:
+        return None
+    
+    with span("db_auth"):
+        session = await db.sessions.find_one({"session_token": token})
+        if not session or session["expires_at"] < datetime.utcnow():
+            return None
+        
+        user = await db.users.find_one({"id": session["user_id"]})
+    return User(**user) if user else None
+
+
+# Authentication endpoints
+@router.post("/api/auth/session")
+async def create_session(request: Request, response: Response):
+    data = await request.json()
+    session_id = data.get("session_id")
+    
+    if not session_id:
+        raise HTTPException(status_code=400, detail="Session ID required")
+    
+    # Call Emergent auth API
+    headers = {"X-Session-ID": session_id}
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            AUTH_SESSION_URL,
+            headers=headers
+        ) as resp:
+            if resp.status != 200:
+                raise HTTPException(status_code=401, detail="Invalid session")
+            
+            auth_data = await resp.json()
+    
+    # Check if user exists, if not create new user
+    existing_user = await db.users.find_one({"email": auth_data["email"]})
+    
+    if not existing_user:
+        # Generate referral code
+        referral_code = str(uuid.uuid4())[:8].upper()
+        
+        user_data = {
+            "id": auth_data["id"],
+            "email": auth_data["email"],
+            "name": auth_data["name"],
+            "picture": auth_data["picture"],
+            "free_predictions": 5,
+            "total_predictions_used": 0,
+            "referral_code": referral_code,
+            "referred_by": None,
+            "referral_count": 0,
+            "referral_earnings": 0,
+            "created_at": datetime.utcnow(),
+            "last_bonus_claim": None,
+            "theme": "green",
+            "language": "ru",
+            "notifications_enabled": True,
+            "preferred_currency": "USD",
+            "auto_predictions_enabled": True
+        }
+        await db.users.insert_one(user_data)
+        user = User(**user_data)
+    else:
+        user = User(**existing_user)
+    
+    # Create session
+    session_token = auth_data["session_token"]
+    session_data = {
+        "session_token": session_token,
+        "user_id": user.id,
+        "expires_at": datetime.utcnow() + timedelta(days=7),
+        "created_at": datetime.utcnow()
+    }
+    await db.sessions.insert_one(session_data)
+    
+    # Set session cookie
+    response.set_cookie(
+        key="session_token",
+        value=session_token,
+        httponly=True,
+        secure=True,
+        samesite="none",
+        path="/",
+        max_age=7 * 24 * 60 * 60  # 7 days
+    )
+    
+    return {"user": user.dict(), "session_token": session_token}
+
+@router.get("/api/auth/me")
+async def get_me(user: User = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user
+
+@router.post("/api/auth/logout")
+async def logout(response: Response, user: User = Depends(get_current_user)):
+    if user:
+        await db.sessions.delete_many({"user_id": user.id})
+    
+    response.delete_cookie(key="session_token", path="/")
+    return {"message": "Logged out successfully"}
+
+
+async def load_crypto_prices_body(currency: str = "USD", limit: int = 50) -> bytes:
+    """Encoded prices list, shared by the prices and dashboard endpoints"""
+    currency = currency.upper()
+    limit = max(0, min(limit, len(CRYPTO_LIST)))
+    
+    try:
+        return await response_cache.get_or_build(
+            "/api/crypto/prices",
+            {"currency": currency, "limit": limit},
+            lambda: fetch_crypto_prices(currency, limit, fallback=False),
+            namespace="prices",
+            ttl=PRICES_CACHE_TTL
+        )
+    except Exception as e:
+        # Mock prices stand in while upstream is down but are never cached, so the next request retries it
+        logger.error(f"Error fetching crypto prices: {e}")
+        return encode_json(mock_crypto_prices(currency, limit))
+
+@router.get("/api/crypto/prices")
+async def get_crypto_prices(currency: str = "USD", limit: int = 50):
+    """Get current crypto prices with support for multiple currencies"""
+    body = await load_crypto_prices_body(currency, limit)
+    return Response(content=body, media_type="application/json")
+
+
+# Dashboard sections, loaded concurrently for one authenticated request
+DASHBOARD_SECTIONS = ("prices", "binary_predictions", "ai_predictions")
+
+def parse_dashboard_fields(fields: Optional[str]) -> dict:
+    """'section.field,...' into {section: {field, ...}}; sections not named keep every field"""
+    selected = {}
+    if not fields:
+        return selected
+    for item in fields.split(","):
+        section, _, field = item.strip().partition(".")
+        if section not in DASHBOARD_SECTIONS or not field:
+            raise HTTPException(status_code=400, detail=f"Invalid field {item.strip()!r}, expected section.field")
+        selected.setdefault(section, set()).add(field)
+    return selected
+
+def select_fields(rows: List[dict], fields: Optional[set]) -> List[dict]:
+    if not fields:
+        return rows
+    return [{key: value for key, value in row.items() if key in fields} for row in rows]
+
+@router.get("/api/dashboard")
+async def get_dashboard(
+    request: Request,
+    currency: Optional[str] = None,
+    limit: int = 50,
+    sections: Optional[str] = None,
+    fields: Optional[str] = None,
+    user: User = Depends(get_current_user)
+):
+    """Prices, binary predictions and AI predictions in one response, authenticated once"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    requested = [section.strip() for section in sections.split(",")] if sections else list(DASHBOARD_SECTIONS)
+    unknown = [section for section in requested if section not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dashboard sections: {', '.join(unknown)}")
+    requested = list(dict.fromkeys(requested))
+    selected = parse_dashboard_fields(fields)
+    
+    async def load(section: str) -> bytes:
+        if section == "prices":
+            body = await load_crypto_prices_body(currency or user.preferred_currency, limit)
+            # The cached prices body is spliced in as is unless fields are selected
+            return encode_json(select_fields(json.loads(body), selected["prices"])) if "prices" in selected else body
+        if section == "binary_predictions":
+            return encode_json(select_fields(await load_binary_predictions(user.id), selected.get(section)))
+        return encode_json(select_fields(await load_ai_predictions(user.id), selected.get(section)))
+    
+    bodies = await asyncio.gather(*(load(section) for section in requested))
+    
+    # The ETag covers every section, so it changes when any of them does
+    digest = hashlib.sha1()
+    for section, body in zip(requested, bodies):
+        digest.update(section.encode())
+        digest.update(hashlib.sha1(body).digest())
+    etag = f'"{digest.hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    content = b"{" + b",".join(b'"' + section.encode() + b'":' + body for section, body in zip(requested, bodies)) + b"}"
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@router.get("/api/crypto/chart/{symbol}")
+async def get_crypto_chart(symbol: str, timeframe: str = "1h"):
+    """Get crypto chart data with fallback to mock data"""
+    return await get_crypto_chart_data(symbol, timeframe)
+
+@router.get("/api/crypto/candles/{symbol}")
+async def get_crypto_candles(symbol: str, timeframe: str = "1h", limit: int = 200, currency: str = "USD"):
+    """Get OHLCV candles, oldest first; the last one is still forming"""
+    if timeframe not in CANDLE_TIMEFRAMES:
+        raise HTTPException(status_code=400, detail=f"Unsupported timeframe, expected one of {', '.join(CANDLE_TIMEFRAMES)}")
+    symbol = resolve_symbol(symbol)
+    if not is_supported_symbol(symbol):
+        raise HTTPException(status_code=404, detail="Unknown symbol")
+    currency = currency.upper()
+    
+    rows, forming = await candle_store.get(coin_id_for(symbol), timeframe, max(0, min(limit, CANDLE_MAX_CACHED)))
+    return {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "interval_seconds": CANDLE_TIMEFRAMES[timeframe],
+        "currency": currency,
+        "last_candle_open": forming and len(rows) > 0,
+        "candles": format_candles(rows, CURRENCY_RATES.get(currency, 1.0))
+    }
+
+@router.get("/api/crypto/charts")
+async def get_crypto_charts_batch(symbols: str, timeframe: str = "1h"):
+    """Get charts of several comma-separated symbols in one response"""
+    requested = list(dict.fromkeys(resolve_symbol(symbol) for symbol in symbols.split(",") if symbol.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="No symbols requested")
+    if len(requested) > CHART_BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {CHART_BATCH_MAX_SYMBOLS} symbols per request")
+    
+    body = await response_cache.get_or_build(
+        "/api/crypto/charts",
+        {"symbols": ",".join(requested), "timeframe": timeframe},
+        lambda: get_crypto_charts(requested, timeframe),
+        namespace="charts",
+        ttl=CHART_CACHE_TTL
+    )
+    return Response(content=body, media_type="application/json")
+
+# NEW AI Predictions endpoints
+def serialize_predictions(predictions: List[dict]) -> List[dict]:
+    """Drop Mongo ids and convert datetimes to ISO strings, in place, for a prediction list response"""
+    for prediction in predictions:
+        if "_id" in prediction:
+            del prediction["_id"]
+        if "created_at" in prediction and isinstance(prediction["created_at"], datetime):
+            prediction["created_at"] = prediction["created_at"].isoformat()
+        if "entry_time" in prediction and isinstance(prediction["entry_time"], datetime):
+            prediction["entry_time"] = prediction["entry_time"].isoformat()
+        if "expiry_time" in prediction and isinstance(prediction["expiry_time"], datetime):
+            prediction["expiry_time"] = prediction["expiry_time"].isoformat()
+    return predictions
+
+async def load_ai_predictions(user_id: str) -> List[dict]:
+    """The user's latest AI predictions joined with their signals"""
+    with span("db_predictions"):
+        references = await own_history_db.ai_predictions.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(50)
+        predictions = await join_signals(own_history_db, references)
+    
+    return serialize_predictions(predictions)
+
+@router.get("/api/ai-predictions")
+async def get_ai_predictions(user: User = Depends(get_current_user)):
+    """Get AI-generated predictions for the user"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    return await load_ai_predictions(user.id)
+
+@router.get("/api/ai-predictions/history")
+async def get_ai_prediction_history(symbol: Optional[str] = None, days: int = 30, user: User = Depends(get_current_user)):
+    """Get daily rollups of the user's archived predictions"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    query = {"user_id": user.id, "day": {"$gte": (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")}}
+    if symbol:
+        query["symbol"] = symbol.upper()
+    
+    rollups = await history_db.prediction_rollups.find(query).sort("day", -1).to_list(1000)
+    return [format_rollup(rollup) for rollup in rollups]
+
+@router.post("/api/ai-predictions/manual")
+async def generate_manual_ai_prediction(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    user: User = Depends(get_current_user)
+):
+    """Generate a manual AI prediction for specific symbol; retries with the same Idempotency-Key get the stored one"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    data = await request.json()
+    symbol = resolve_symbol(data.get("symbol", "BTC"))
+    timeframe = data.get("timeframe", "1h")
+    if not is_supported_symbol(symbol):
+        raise HTTPException(status_code=400, detail="Unsupported symbol")
+    if timeframe not in AI_TIMEFRAME_MINUTES:
+        raise HTTPException(status_code=400, detail="Unsupported timeframe")
+    
+    if idempotency_key is not None:
+        try:
+            previous = await claim_idempotency_key(
+                db, user.id, idempotency_key,
+                request_fingerprint("/api/ai-predictions/manual", {"symbol": symbol, "timeframe": timeframe})
+            )
+        except IdempotencyError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        if previous is not None and previous["status"] == "completed":
+            return previous["response"]
+        if previous is not None and previous.get("resource_id"):
+            # An earlier attempt stopped before storing its response; return its prediction if it was written
+            reference = await db.ai_predictions.find_one({"id": previous["resource_id"], "user_id": user.id}, {"_id": 0})
+            if reference is not None:
+                prediction_data = serialize_predictions(await join_signals(db, [reference]))[0]
+                await complete_idempotency_key(db, user.id, idempotency_key, prediction_data)
+                return prediction_data
+    
+    writing = False
+    try:
+        # Get shared AI signal; requests for the same symbol and timeframe within a bucket share it
+        signal = await get_ai_signal(symbol, timeframe)
+        
+        # Get current price
+        current_price = await get_current_price_for_symbol(symbol, user.preferred_currency)
+        
+        # Calculate expiry time
+        expiry_minutes = AI_TIMEFRAME_MINUTES.get(timeframe, 60)
+        
+        now = datetime.utcnow()
+        expiry_time = now + timedelta(minutes=expiry_minutes)
+        
+        # Save lightweight per-user reference ahead of queued writes and wait for it so the next read sees it
+        reference = build_prediction_reference(signal, user.id, current_price, now, expiry_time, user.preferred_currency)
+        if idempotency_key is not None:
+            await record_idempotency_resource(db, user.id, idempotency_key, reference["id"])
+        writing = True
+        with span("db_prediction_write"):
+            await ai_prediction_writer.write(reference)
+        prediction_data = merge_prediction(reference, signal)
+        
+        # Clean response data
+        if "_id" in prediction_data:
+            del prediction_data["_id"]
+        prediction_data["created_at"] = prediction_data["created_at"].isoformat()
+        prediction_data["entry_time"] = prediction_data["entry_time"].isoformat()
+        prediction_data["expiry_time"] = prediction_data["expiry_time"].isoformat()
+        
+        if idempotency_key is not None:
+            await complete_idempotency_key(db, user.id, idempotency_key, prediction_data)
+        return prediction_data
+        
+    except Exception as e:
+        logger.error(f"Error generating manual AI prediction: {e}")
+        # Once the write has started the prediction may exist; the claim then stays until its lease runs out
+        if idempotency_key is not None and not writing:
+            await release_idempotency_key(db, user.id, idempotency_key)
+        raise HTTPException(status_code=500, detail="Error generating prediction")
+
+# Binary Options Predictions endpoints
+async def load_binary_predictions(user_id: str) -> List[dict]:
+    """The user's latest binary predictions"""
+    predictions = await own_history_db.binary_predictions.find({"user_id": user_id}).sort("created_at", -1).to_list(100)
+    
+    return serialize_predictions(predictions)
+
+@router.get("/api/binary-predictions")
+async def get_binary_predictions(user: User = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    return await load_binary_predictions(user.id)
+
+async def create_user_binary_prediction(user: User, symbol: str, direction: str, timeframe: str, stake_amount, extra: Optional[dict] = None):
+    """Validate, debit the stake and store a binary prediction for the user"""
+    try:
+        stake_amount = validate_binary_prediction(direction, timeframe, stake_amount)
+        symbol = resolve_symbol(symbol)
+        if not is_supported_symbol(symbol):
+            raise BinaryPredictionError(400, "Unsupported symbol")
+        prediction_data = await create_binary_prediction(
+            db,
+            user.id,
+            symbol,
+            direction,
+            timeframe,
+            stake_amount,
+            lambda: get_entry_price(symbol, user.preferred_currency),
+            calculate_prediction_confidence(symbol, direction, timeframe),
+            currency=user.preferred_currency,
+            extra=extra
+        )
+    except BinaryPredictionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    prediction_data["created_at"] = prediction_data["created_at"].isoformat()
+    prediction_data["entry_time"] = prediction_data["entry_time"].isoformat()
+    prediction_data["expiry_time"] = prediction_data["expiry_time"].isoformat()
+    return prediction_data
+
+@router.post("/api/binary-predictions")
+async def create_binary_prediction_endpoint(request: Request, user: User = Depends(get_current_user)):
+    """Create a binary prediction, paying the stake with free predictions"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    data = await request.json()
+    return await create_user_binary_prediction(
+        user,
+        data.get("symbol", "BTC"),
+        str(data.get("direction", "")).upper(),
+        data.get("timeframe", "5m"),
+        data.get("stake_amount", 1)
+    )
+
+@router.get("/api/predictions")
+async def get_predictions(user: User = Depends(get_current_user)):
+    """Get the user's price predictions"""
+    return await get_binary_predictions(user)
+
+@router.post("/api/predictions")
+async def create_prediction(request: Request, user: User = Depends(get_current_user)):
+    """Create a bullish/bearish price prediction for one free prediction"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    data = await request.json()
+    prediction_type = data.get("prediction_type", "bullish")
+    extra = {"prediction_type": prediction_type}
+    for field in ("target_price", "stop_loss"):
+        try:
+            extra[field] = float(data[field]) if data.get(field) not in (None, "") else None
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Invalid {field}")
+    
+    return await create_user_binary_prediction(
+        user,
+        data.get("symbol", "BTC"),
+        "UP" if prediction_type == "bullish" else "DOWN",
+        data.get("timeframe", "1h"),
+        1,
+        extra=extra
+    )
+
+@router.get("/api/investment-recommendations")
+async def get_investment_recommendations(currency: str = "USD", limit: int = 10):
+    """Get AI-powered investment recommendations"""
+    currency = currency.upper()
+    limit = max(0, limit)
+    
+    body = await response_cache.get_or_build(
+        "/api/investment-recommendations",
+        {"currency": currency, "limit": limit},
+        lambda: build_investment_recommendations(currency, limit),
+        namespace="recommendations",
+        ttl=RECOMMENDATIONS_CACHE_TTL
+    )
+    return Response(content=body, media_type="application/json")
+
+async def build_investment_recommendations(currency: str = "USD", limit: int = 10):
+    """Top precomputed investment recommendations in the currency"""
+    return await recommendation_engine.top(currency, limit)
+
+# User Settings endpoints
+@router.get("/api/user/settings")
+async def get_user_settings(user: User = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    return {
+        "theme": user.theme,
+        "language": user.language,
+        "notifications_enabled": user.notifications_enabled,
+        "preferred_currency": user.preferred_currency,
+        "auto_predictions_enabled": getattr(user, 'auto_predictions_enabled', True)
+    }
+
+@router.put("/api/user/settings")
+async def update_user_settings(
+    request: Request,
+    user: User = Depends(get_current_user)
+):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    data = await request.json()
+    
+    update_data = {}
+    if "theme" in data:
+        update_data["theme"] = data["theme"]
+    if "language" in data:
+        update_data["language"] = data["language"]
+    if "notifications_enabled" in data:
+        update_data["notifications_enabled"] = data["notifications_enabled"]
+    if "preferred_currency" in data:
+        update_data["preferred_currency"] = data["preferred_currency"]
+    if "auto_predictions_enabled" in data:
+        update_data["auto_predictions_enabled"] = data["auto_predictions_enabled"]
+    
+    await db.users.update_one(
+        {"id": user.id},
+        {"$set": update_data}
+    )
+    
+    return {"message": "Settings updated successfully"}
+
+
+@router.get("/api/currencies")
+async def get_supported_currencies():
+    """Get list of supported currencies"""
+    async def build():
+        return {"currencies": SUPPORTED_CURRENCIES}
+    
+    body = await response_cache.get_or_build("/api/currencies", None, build, namespace="currencies")
+    return Response(content=body, media_type="application/json")
+
+@router.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics in text exposition format"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/api/cache/stats")
+async def get_response_cache_stats():
+    """Get response cache hit ratio and bytes saved"""
+    return response_cache.stats()
+
+
+# Prediction accuracy statistics endpoints
+@router.get("/api/stats/predictions")
+async def get_prediction_stats(user: User = Depends(get_current_user)):
+    """Get the user's prediction accuracy overall, per symbol and per timeframe"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    return await get_user_stats(own_history_db, user.id)
+
+@router.post("/api/stats/predictions/rebuild")
+async def rebuild_user_prediction_stats(user: User = Depends(get_current_user)):
+    """Recompute the user's accuracy counters from prediction history"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    await rebuild_prediction_stats(db, user.id)
+    return await get_user_stats(db, user.id)
+
+# Bonus and referral endpoints
+@router.post("/api/bonus/claim")
+async def claim_daily_bonus(user: User = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    try:
+        free_predictions = await grant_daily_bonus(db, user.id)
+    except RewardError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    return {"message": "Daily bonus claimed!", "free_predictions": free_predictions}
+
+@router.get("/api/referral/stats")
+async def get_referral_stats(user: User = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    return {
+        "referral_code": user.referral_code,
+        "referral_count": user.referral_count,
+        "referral_earnings": user.referral_earnings
+    }
+
+@router.post("/api/referral/use/{referral_code}")
+async def use_referral_code(referral_code: str, user: User = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    if user.referred_by:
+        raise HTTPException(status_code=400, detail="Referral code already used")
+    
+    if referral_code == user.referral_code:
+        raise HTTPException(status_code=400, detail="Cannot use your own referral code")
+    
+    # Credit both users atomically
+    try:
+        await referral_service.apply(user.id, referral_code)
+    except RewardError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    return {"message": "Referral code applied successfully!", "bonus_predictions": 1}
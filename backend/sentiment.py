@@ -0,0 +1,343 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated name=url pairs; RSS/Atom feeds and HTML pages are both understood
+SENTIMENT_SOURCES = os.environ.get(
+    'SENTIMENT_SOURCES',
+    'coindesk=https://www.coindesk.com/arc/outboundfeeds/rss/,cointelegraph=https://cointelegraph.com/rss'
+)
+SENTIMENT_INTERVAL_SECONDS = float(os.environ.get('SENTIMENT_INTERVAL_SECONDS', 300))
+SENTIMENT_HALF_LIFE_HOURS = float(os.environ.get('SENTIMENT_HALF_LIFE_HOURS', 6))
+SENTIMENT_FETCH_CONCURRENCY = int(os.environ.get('SENTIMENT_FETCH_CONCURRENCY', 8))
+SENTIMENT_DOCUMENT_TTL_DAYS = int(os.environ.get('SENTIMENT_DOCUMENT_TTL_DAYS', 7))
+
+NEUTRAL_SENTIMENT = {"overall_sentiment": 0, "sources": [], "confidence": 0.5}
+
+# Word polarity in [-1, 1]; English and Russian market vocabulary
+LEXICON = {
+    "surge": 1.0, "surges": 1.0, "soar": 1.0, "soars": 1.0, "rally": 0.9, "rallies": 0.9, "bullish": 1.0,
+    "gain": 0.6, "gains": 0.6, "rise": 0.5, "rises": 0.5, "jump": 0.7, "jumps": 0.7, "record": 0.5, "high": 0.3,
+    "breakout": 0.8, "adoption": 0.6, "approval": 0.7, "approved": 0.7, "inflows": 0.6, "upgrade": 0.5,
+    "partnership": 0.5, "recover": 0.5, "recovers": 0.5, "recovery": 0.5, "optimism": 0.7, "strong": 0.4,
+    "plunge": -1.0, "plunges": -1.0, "crash": -1.0, "crashes": -1.0, "bearish": -1.0, "drop": -0.6, "drops": -0.6,
+    "fall": -0.5, "falls": -0.5, "slump": -0.8, "selloff": -0.8, "sell-off": -0.8, "loss": -0.6, "losses": -0.6,
+    "hack": -1.0, "hacked": -1.0, "exploit": -0.9, "fraud": -1.0, "lawsuit": -0.7, "ban": -0.8, "bans": -0.8,
+    "outflows": -0.6, "liquidations": -0.7, "fear": -0.6, "weak": -0.4, "decline": -0.5, "declines": -0.5,
+    "рост": 0.6, "растет": 0.6, "вырос": 0.6, "ралли": 0.9, "бычий": 1.0, "рекорд": 0.5, "максимум": 0.4,
+    "одобрение": 0.7, "приток": 0.6, "восстановление": 0.5, "падение": -0.6, "упал": -0.6, "падает": -0.6,
+    "обвал": -1.0, "медвежий": -1.0, "взлом": -1.0, "мошенничество": -1.0, "запрет": -0.8, "отток": -0.6,
+    "ликвидации": -0.7, "страх": -0.6, "снижение": -0.5,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _lexicon_vectorizer():
+    """Vectorizer over the lexicon and its weights; scikit-learn is imported on first scoring"""
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    vectorizer = CountVectorizer(vocabulary=list(LEXICON), token_pattern=r"(?u)\b[\w-]+\b", lowercase=True)
+    return vectorizer, np.array([LEXICON[word] for word in vectorizer.vocabulary])
+
+
+def parse_sources(value: str) -> Dict[str, str]:
+    sources = {}
+    for part in value.split(","):
+        name, _, url = part.strip().partition("=")
+        if name and url:
+            sources[name] = url
+    return sources
+
+
+def parse_documents(source: str, body: str) -> List[dict]:
+    """Extract items from an RSS/Atom feed, or headlines and paragraphs from an HTML page"""
+    from bs4 import BeautifulSoup
+
+    if body.lstrip()[:200].lower().startswith("<?xml") or "<rss" in body[:500] or "<feed" in body[:500]:
+        soup = BeautifulSoup(body, "xml")
+        documents = []
+        for item in soup.find_all(["item", "entry"]):
+            title = item.find("title")
+            summary = item.find(["description", "summary", "content"])
+            link = item.find("link")
+            documents.append({
+                "source": source,
+                "title": title.get_text(" ", strip=True) if title else "",
+                # Descriptions are often escaped HTML
+                "text": BeautifulSoup(summary.get_text(), "lxml").get_text(" ", strip=True) if summary else "",
+                "link": (link.get("href") or link.get_text(strip=True)) if link else "",
+            })
+        return documents
+
+    soup = BeautifulSoup(body, "lxml")
+    blocks = soup.find_all("article") or [soup]
+    documents = []
+    for block in blocks:
+        heading = block.find(["h1", "h2", "h3"])
+        anchor = block.find("a", href=True)
+        documents.append({
+            "source": source,
+            "title": heading.get_text(" ", strip=True) if heading else "",
+            "text": " ".join(p.get_text(" ", strip=True) for p in block.find_all("p")),
+            "link": anchor["href"] if anchor else "",
+        })
+    return documents
+
+
+def score_documents(texts: List[str]) -> np.ndarray:
+    """Lexicon polarity of each text in [-1, 1], scored as one sparse matrix product"""
+    if not texts:
+        return np.empty(0)
+    vectorizer, weights = _lexicon_vectorizer()
+    counts = vectorizer.transform(texts)
+    raw = counts @ weights
+    matched = np.asarray(counts.sum(axis=1)).ravel()
+    # Saturate with the number of polar words so one strong word is not a certainty
+    return np.tanh(raw / np.sqrt(np.maximum(matched, 1)))
+
+
+def document_id(document: dict) -> str:
+    return hashlib.sha1(f"{document['source']}|{document['link']}|{document['title']}".encode()).hexdigest()
+
+
+class SymbolMatcher:
+    """Finds which symbols a text mentions by name (any case) or ticker (upper case or $-prefixed)"""
+
+    def __init__(self, aliases: Dict[str, Iterable[str]]):
+        self._names = {name.lower(): symbol for symbol, names in aliases.items() for name in names}
+        self._tickers = {symbol.upper(): symbol for symbol in aliases}
+        # Longest names first so "bitcoin cash" wins over "bitcoin"
+        names = "|".join(re.escape(name) for name in sorted(self._names, key=len, reverse=True)) or "(?!)"
+        tickers = "|".join(re.escape(ticker) for ticker in sorted(self._tickers, key=len, reverse=True)) or "(?!)"
+        # Tickers such as DOT or LINK are also plain words, so they must be upper case or carry a $
+        self._name_regex = re.compile(rf"(?<!\w)({names})(?!\w)", re.IGNORECASE)
+        self._ticker_regex = re.compile(rf"(?<![\w$])(?:({tickers})|\$({tickers}))(?!\w)", re.IGNORECASE)
+
+    def symbols(self, text: str) -> set:
+        found = {self._names[match.lower()] for match in self._name_regex.findall(text)}
+        for upper, prefixed in self._ticker_regex.findall(text):
+            if prefixed:
+                found.add(self._tickers[prefixed.upper()])
+            elif upper.isupper():
+                found.add(self._tickers[upper])
+        return found
+
+
+class _DecayedScore:
+    """Exponentially time-decayed weighted mean of document scores"""
+
+    __slots__ = ("total", "weight", "mentions", "updated")
+
+    def __init__(self, total: float = 0.0, weight: float = 0.0, mentions: int = 0, updated: float = 0.0):
+        self.total = total
+        self.weight = weight
+        self.mentions = mentions
+        self.updated = updated
+
+    def decayed_weight(self, now: float, half_life: float) -> float:
+        return self.weight * 0.5 ** (max(0.0, now - self.updated) / half_life)
+
+    def add(self, scores: List[float], now: float, half_life: float):
+        factor = 0.5 ** (max(0.0, now - self.updated) / half_life) if self.weight else 0.0
+        self.total = self.total * factor + sum(scores)
+        self.weight = self.weight * factor + len(scores)
+        self.mentions += len(scores)
+        self.updated = now
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.weight if self.weight else 0.0
+
+
+class SentimentStore:
+    """Per-symbol, per-source decayed sentiment kept in memory and mirrored to Mongo"""
+
+    def __init__(self, half_life_hours: float = SENTIMENT_HALF_LIFE_HOURS):
+        self.half_life = half_life_hours * 3600
+        self._scores: Dict[str, Dict[str, _DecayedScore]] = {}
+
+    def add(self, symbol: str, source: str, scores: List[float], now: Optional[float] = None):
+        sources = self._scores.setdefault(symbol, {})
+        sources.setdefault(source, _DecayedScore()).add(scores, time.time() if now is None else now, self.half_life)
+
+    def lookup(self, symbol: str, now: Optional[float] = None) -> dict:
+        """Current sentiment for a symbol in the shape predictions store; a dict lookup per source"""
+        sources = self._scores.get(symbol.upper())
+        if not sources:
+            return dict(NEUTRAL_SENTIMENT, sources=[])
+        now = time.time() if now is None else now
+
+        weights = {name: score.decayed_weight(now, self.half_life) for name, score in sources.items()}
+        total_weight = sum(weights.values())
+        overall = sum(score.mean * weights[name] for name, score in sources.items()) / total_weight if total_weight else 0.0
+        return {
+            "overall_sentiment": overall,
+            "sources": [
+                {"source": name, "sentiment": score.mean, "mentions": score.mentions}
+                for name, score in sources.items()
+            ],
+            # Grows with recent evidence: 0.5 with none, approaching 0.9
+            "confidence": 0.5 + 0.4 * total_weight / (total_weight + 5),
+            "updated_at": datetime.utcfromtimestamp(max(score.updated for score in sources.values())).isoformat(),
+        }
+
+    async def load(self, db):
+        async for doc in db.sentiment_scores.find({}, {"_id": 0}):
+            self._scores[doc["symbol"]] = {
+                name: _DecayedScore(state["total"], state["weight"], state["mentions"], state["updated"])
+                for name, state in doc.get("sources", {}).items()
+            }
+
+    async def save(self, db, symbols: Iterable[str]):
+        operations = [
+            UpdateOne(
+                {"symbol": symbol},
+                {"$set": {
+                    "symbol": symbol,
+                    "sources": {
+                        name: {"total": score.total, "weight": score.weight, "mentions": score.mentions, "updated": score.updated}
+                        for name, score in self._scores[symbol].items()
+                    },
+                    "updated_at": datetime.utcnow(),
+                }},
+                upsert=True
+            )
+            for symbol in symbols if symbol in self._scores
+        ]
+        if operations:
+            await db.sentiment_scores.bulk_write(operations, ordered=False)
+
+
+async def ensure_sentiment_indexes(db):
+    await db.sentiment_scores.create_index("symbol", unique=True)
+    await db.sentiment_documents.create_index("id", unique=True)
+    await db.sentiment_documents.create_index("fetched_at", expireAfterSeconds=SENTIMENT_DOCUMENT_TTL_DAYS * 86400)
+
+
+Runner = Callable[..., Awaitable]
+
+
+class SentimentIngestor:
+    """Fetches sources concurrently, scores new documents in one batch and folds them into the store"""
+
+    def __init__(self, store: SentimentStore, sources: Dict[str, str], aliases: Dict[str, Iterable[str]],
+                 db=None, run: Optional[Runner] = None, concurrency: int = SENTIMENT_FETCH_CONCURRENCY,
+                 max_seen: int = 20000):
+        self.store = store
+        self.sources = sources
+        self.matcher = SymbolMatcher(aliases)
+        self.db = db
+        self.run = run or self._run_inline
+        self.concurrency = concurrency
+        # Without Mongo, duplicates are remembered in memory only
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._max_seen = max_seen
+
+    @staticmethod
+    async def _run_inline(fn, *args):
+        return fn(*args)
+
+    async def _fetch(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, name: str, url: str) -> List[dict]:
+        async with semaphore:
+            try:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                    if resp.status != 200:
+                        logger.error(f"Sentiment source {name} returned HTTP {resp.status}")
+                        return []
+                    body = await resp.text()
+            except Exception as e:
+                logger.error(f"Error fetching sentiment source {name}: {e}")
+                return []
+        # Parsing is CPU-bound; keep it off the event loop
+        return await self.run(parse_documents, name, body)
+
+    async def _claim_new(self, documents: List[dict]) -> List[dict]:
+        """Keep only documents not ingested before"""
+        for document in documents:
+            document["id"] = document_id(document)
+        unique = list({document["id"]: document for document in documents}.values())
+
+        if self.db is None:
+            new = [document for document in unique if document["id"] not in self._seen]
+            for document in new:
+                self._seen[document["id"]] = None
+            while len(self._seen) > self._max_seen:
+                self._seen.popitem(last=False)
+            return new
+
+        if not unique:
+            return []
+        now = datetime.utcnow()
+        try:
+            await self.db.sentiment_documents.insert_many(
+                [{"id": document["id"], "source": document["source"], "fetched_at": now} for document in unique],
+                ordered=False
+            )
+            return unique
+        except BulkWriteError as e:
+            duplicates = {error["index"] for error in e.details.get("writeErrors", []) if error.get("code") == 11000}
+            return [document for index, document in enumerate(unique) if index not in duplicates]
+
+    async def run_once(self) -> dict:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with aiohttp.ClientSession() as session:
+            fetched = await asyncio.gather(*(self._fetch(session, semaphore, name, url) for name, url in self.sources.items()))
+        documents = await self._claim_new([document for batch in fetched for document in batch])
+
+        texts = [f"{document['title']} {document['text']}" for document in documents]
+        scores = await self.run(score_documents, texts) if texts else []
+
+        grouped: Dict[tuple, List[float]] = {}
+        for document, text, score in zip(documents, texts, scores):
+            for symbol in self.matcher.symbols(text):
+                grouped.setdefault((symbol, document["source"]), []).append(float(score))
+
+        now = time.time()
+        for (symbol, source), symbol_scores in grouped.items():
+            self.store.add(symbol, source, symbol_scores, now)
+        symbols = {symbol for symbol, _ in grouped}
+        if self.db is not None and symbols:
+            await self.store.save(self.db, symbols)
+        return {"documents": len(documents), "symbols": len(symbols)}
+
+
+async def sentiment_loop(ingestor: SentimentIngestor, interval: float = SENTIMENT_INTERVAL_SECONDS,
+                         should_ingest: Callable[[], bool] = lambda: True):
+    """Background task that keeps the sentiment store fresh.
+
+    Scores are folded in memory and saved whole per symbol, so only one worker
+    may ingest (should_ingest); the others reload what it saved.
+    """
+    ingesting = False
+    while True:
+        try:
+            if should_ingest():
+                if not ingesting and ingestor.db is not None:
+                    # Taking over from another worker: continue from the scores it saved
+                    await ingestor.store.load(ingestor.db)
+                ingesting = True
+                result = await ingestor.run_once()
+                if result["documents"]:
+                    logger.info(f"Ingested sentiment: {result}")
+            else:
+                ingesting = False
+                if ingestor.db is not None:
+                    await ingestor.store.load(ingestor.db)
+        except Exception as e:
+            logger.error(f"Error in sentiment ingestion task: {e}")
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Fields that belong to the shared signal rather than to a user's prediction
+SIGNAL_FIELDS = (
+    "symbol", "timeframe", "direction", "confidence_score",
+    "technical_indicators", "sentiment_analysis", "ai_reasoning",
+)
+
+
+def build_signal_document(symbol: str, timeframe: str, ai_result: dict, tech_indicators: dict,
+                          sentiment: dict, now: Optional[datetime] = None) -> dict:
+    """Build the shared signal document for one (symbol, timeframe) analysis"""
+    return {
+        "id": str(uuid.uuid4()),
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "direction": ai_result["direction"],
+        "confidence_score": ai_result["confidence"],
+        "technical_indicators": tech_indicators,
+        "sentiment_analysis": sentiment,
+        "ai_reasoning": ai_result["reasoning"],
+        "created_at": now or datetime.utcnow(),
+    }
+
+
+def build_prediction_reference(signal: dict, user_id: str, entry_price: float,
+                               entry_time: datetime, expiry_time: datetime, currency: str = "USD") -> dict:
+    """Build the lightweight per-user prediction that points at a shared signal"""
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "signal_id": signal["id"],
+        "symbol": signal["symbol"],
+        "timeframe": signal["timeframe"],
+        "entry_price": entry_price,
+        "currency": currency,
+        "entry_time": entry_time,
+        "expiry_time": expiry_time,
+        "status": "ACTIVE",
+        "result_price": None,
+        "created_at": entry_time,
+        "ai_generated": True,
+    }
+
+
+def merge_prediction(reference: dict, signal: Optional[dict]) -> dict:
+    """Combine a prediction reference with its signal into the legacy prediction shape"""
+    prediction = dict(reference)
+    if signal:
+        for field in SIGNAL_FIELDS:
+            if field in signal:
+                prediction.setdefault(field, signal[field])
+    return prediction
+
+
+async def join_signals(db, references: List[dict]) -> List[dict]:
+    """Attach shared signal payloads to prediction references with a single $in lookup.
+
+    References without a signal_id (legacy, not yet migrated) pass through untouched.
+    """
+    signal_ids = list({ref["signal_id"] for ref in references if ref.get("signal_id")})
+    if not signal_ids:
+        return references
+
+    signals = {}
+    cursor = db.ai_signals.find({"id": {"$in": signal_ids}}, {"_id": 0})
+    async for signal in cursor:
+        signals[signal["id"]] = signal
+
+    return [
+        merge_prediction(ref, signals.get(ref["signal_id"])) if ref.get("signal_id") else ref
+        for ref in references
+    ]
+
+
+async def ensure_signal_indexes(db):
+    await db.ai_signals.create_index("id", unique=True)
+    await db.ai_signals.create_index([("symbol", ASCENDING), ("timeframe", ASCENDING), ("created_at", DESCENDING)])
+    await db.ai_predictions.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+
+
+def _signal_fingerprint(doc: dict) -> str:
+    payload = {field: doc.get(field) for field in SIGNAL_FIELDS}
+    encoded = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+# Migrated signals take ids derived from their payload, so a rerun finds the signal an earlier run created
+LEGACY_SIGNAL_NAMESPACE = uuid.UUID("6f1c2b8e-4d0a-4c55-9a61-2f3e8b7d9c10")
+
+
+def _legacy_signal_id(fingerprint: str) -> str:
+    return str(uuid.uuid5(LEGACY_SIGNAL_NAMESPACE, fingerprint))
+
+
+async def migrate_legacy_predictions(db, batch_size: int = 500) -> dict:
+    """Move embedded signal payloads out of ai_predictions into ai_signals.
+
+    Legacy documents carrying identical analysis payloads share one signal.
+    The migration is resumable: documents that already have a signal_id are skipped,
+    and signals are upserted by a payload-derived id, so rerunning after a failure
+    between the two writes reuses the signals instead of duplicating them.
+    """
+    migrated = 0
+    signals_created = 0
+
+    query = {"signal_id": {"$exists": False}, "technical_indicators": {"$exists": True}}
+    while True:
+        legacy = await db.ai_predictions.find(query).limit(batch_size).to_list(batch_size)
+        if not legacy:
+            break
+
+        signal_upserts = {}
+        updates = []
+        for doc in legacy:
+            signal_id = _legacy_signal_id(_signal_fingerprint(doc))
+            if signal_id not in signal_upserts:
+                signal = {field: doc.get(field) for field in SIGNAL_FIELDS}
+                signal["id"] = signal_id
+                signal["created_at"] = doc.get("created_at")
+                signal["migrated"] = True
+                signal_upserts[signal_id] = UpdateOne({"id": signal_id}, {"$setOnInsert": signal}, upsert=True)
+
+            updates.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {
+                    "$set": {"signal_id": signal_id},
+                    "$unset": {
+                        "direction": "", "confidence_score": "", "technical_indicators": "",
+                        "sentiment_analysis": "", "ai_reasoning": ""
+                    }
+                }
+            ))
+
+        result = await db.ai_signals.bulk_write(list(signal_upserts.values()), ordered=False)
+        signals_created += result.upserted_count
+        await db.ai_predictions.bulk_write(updates, ordered=False)
+        migrated += len(updates)
+        logger.info(f"Migrated {migrated} AI predictions into {signals_created} shared signals")
+
+    return {"migrated_predictions": migrated, "signals_created": signals_created}
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        db = AsyncIOMotorClient(os.environ.get('MONGO_URL')).criptex
+        await ensure_signal_indexes(db)
+        print(await migrate_legacy_predictions(db))
+
+    asyncio.run(main())
@@ -0,0 +1,204 @@
+"""Logging that never blocks the event loop, with per-event sampling and rate limits.
+
+configure_logging() points the root logger at a QueueHandler; a QueueListener
+thread formats the records and writes them out. Records that should be searchable
+carry an event name and fields, passed with extra=log_event(...):
+
+    logger.info("Generation cycle completed", extra=log_event("generation.cycle", items=120, errors=0))
+
+Events can be sampled (LOG_SAMPLE_RATES=generation.prediction=0.01) or rate
+limited to a number of records per second (LOG_RATE_LIMITS=pipeline.stage_error=5).
+Both decisions are made before the record is queued; the next record of a rate
+limited event that gets through says how many were suppressed meanwhile.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, Optional
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', 'generation.prediction=0.01')
+LOG_RATE_LIMITS = os.environ.get('LOG_RATE_LIMITS', 'pipeline.stage_error=5')
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def log_event(event: str, **fields) -> dict:
+    """extra= for a structured record"""
+    return {"event": event, "fields": fields}
+
+
+def parse_event_settings(value: str) -> Dict[str, float]:
+    """'event=number,...' as used by LOG_SAMPLE_RATES and LOG_RATE_LIMITS"""
+    settings = {}
+    for part in value.split(","):
+        name, _, number = part.strip().partition("=")
+        if name and number:
+            settings[name] = float(number)
+    return settings
+
+
+class EventFilter(logging.Filter):
+    """Samples and rate limits records by event name; records without one always pass.
+
+    Attached to the QueueHandler, so it runs in whichever thread logs the record,
+    before it is queued. The token buckets and suppressed counts are shared by
+    those threads and updated under a lock.
+    """
+
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None, rate_limits: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic, rng: Callable[[], float] = random.random):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.rate_limits = rate_limits or {}
+        self.clock = clock
+        self.rng = rng
+        self.suppressed = 0
+        self._buckets: Dict[str, list] = {}
+        self._pending_suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is None:
+            return True
+
+        sample_rate = self.sample_rates.get(event)
+        if sample_rate is not None:
+            if self.rng() >= sample_rate:
+                return False
+            record.sample_rate = sample_rate
+
+        limit = self.rate_limits.get(event)
+        if limit is not None:
+            with self._lock:
+                # Token bucket holding up to one second of records
+                now = self.clock()
+                bucket = self._buckets.setdefault(event, [limit, now])
+                bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * limit)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    self.suppressed += 1
+                    self._pending_suppressed[event] = self._pending_suppressed.get(event, 0) + 1
+                    return False
+                bucket[0] -= 1
+                suppressed = self._pending_suppressed.pop(event, 0)
+            if suppressed:
+                record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, event fields and exception"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "fields":
+                entry[key] = value
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The usual one-line format, with event fields appended as JSON"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line = line.split("\n", 1)
+            line[0] += " " + json.dumps(fields, default=str)
+            line = "\n".join(line)
+        return line
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of raising"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve arguments and tracebacks now, but leave formatting to the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+    def __init__(self, handler: NonBlockingQueueHandler, event_filter: EventFilter, listener: QueueListener):
+        self.handler = handler
+        self.filter = event_filter
+        self.listener = listener
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    @property
+    def suppressed(self) -> int:
+        return self.filter.suppressed
+
+    def stop(self):
+        """Write out what is still queued and stop the listener thread"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+
+def configure_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT, stream=None,
+                      force: bool = False) -> Optional[LoggingPipeline]:
+    """Route the root logger through a queue; like basicConfig, a no-op if it already has handlers"""
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return None
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    event_filter = EventFilter(parse_event_settings(LOG_SAMPLE_RATES), parse_event_settings(LOG_RATE_LIMITS))
+    handler.addFilter(event_filter)
+    listener = QueueListener(handler.queue, output)
+
+    root.addHandler(handler)
+    root.setLevel(level)
+    listener.start()
+    pipeline = LoggingPipeline(handler, event_filter, listener)
+    atexit.register(pipeline.stop)
+    return pipeline
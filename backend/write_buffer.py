@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindBuffer:
+    """Collects documents and writes them with insert_many(ordered=False).
+
+    A batch is flushed when max_batch documents are waiting or flush_interval
+    seconds have passed. At most max_pending documents may be buffered or in
+    flight; put() waits for room beyond that. Failed documents are retried up
+    to max_retries times. Documents keep their _id across retries, so a
+    duplicate-key error on retry means an earlier attempt already landed.
+
+    put() returns once a document is queued; write() also waits until the
+    document is stored, writing it ahead of anything queued by put().
+    """
+
+    def __init__(self, collection, max_batch: int = 500, flush_interval: float = 1.0,
+                 max_pending: int = 10000, max_retries: int = 3, retry_backoff: float = 0.5):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        # (document, attempts so far, future of a write() waiting for it)
+        self._queue: Deque[Tuple[dict, int, Optional[asyncio.Future]]] = deque()
+        self._slots = asyncio.Semaphore(max_pending)
+        self._batch_ready = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._pending = 0
+
+        self.inserted = 0
+        self.batches = 0
+        self.retried = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, document: dict):
+        """Queue a document, waiting while the buffer is full"""
+        await self._acquire()
+        self._queue.append((document, 0, None))
+        if len(self._queue) >= self.max_batch:
+            self._batch_ready.set()
+
+    async def write(self, document: dict):
+        """Write a document now and wait until it is stored; raises the last error if it was dropped"""
+        await self._acquire()
+        stored = asyncio.get_running_loop().create_future()
+        self._queue.appendleft((document, 0, stored))
+        # The document is at the front, and so are its retries
+        while not stored.done():
+            async with self._flush_lock:
+                if not stored.done():
+                    await self._write_batch()
+        await stored
+
+    async def flush(self):
+        """Write every document queued before this call and wait for it"""
+        while True:
+            # One batch per turn of the lock, so a write() waits for at most the batch in flight
+            async with self._flush_lock:
+                if not self._queue:
+                    return
+                await self._write_batch()
+
+    async def close(self):
+        """Stop the background writer and flush whatever is left"""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing {self.collection.name} write buffer: {e}")
+
+    async def _acquire(self):
+        if self._closed:
+            raise RuntimeError("Write buffer is closed")
+        await self._slots.acquire()
+        self._pending += 1
+
+    def _release(self, stored: Optional[asyncio.Future], error: Optional[Exception] = None):
+        self._pending -= 1
+        self._slots.release()
+        if stored is not None and not stored.done():
+            if error is None:
+                stored.set_result(None)
+            else:
+                stored.set_exception(error)
+
+    def _take_batch(self) -> List[Tuple[dict, int, Optional[asyncio.Future]]]:
+        batch = []
+        while self._queue and len(batch) < self.max_batch:
+            batch.append(self._queue.popleft())
+        return batch
+
+    async def _write_batch(self):
+        batch = self._take_batch()
+        if not batch:
+            return
+
+        failed_indexes = set()
+        error = None
+        try:
+            await self.collection.insert_many([document for document, _, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            if e.details.get("writeConcernErrors"):
+                # Nothing in the batch is acknowledged; retries of documents that did land hit duplicate keys
+                failed_indexes = set(range(len(batch))) - {
+                    write_error["index"] for write_error in write_errors if write_error.get("code") == DUPLICATE_KEY
+                }
+            else:
+                failed_indexes = {
+                    write_error["index"] for write_error in write_errors if write_error.get("code") != DUPLICATE_KEY
+                }
+            error = e
+        except PyMongoError as e:
+            failed_indexes = set(range(len(batch)))
+            error = e
+        except BaseException:
+            # Cancelled mid-write (close()) or an unexpected error: the batch goes back as it was,
+            # still holding its slots, to be written by the next flush
+            self._queue.extendleft(reversed(batch))
+            raise
+
+        self.batches += 1
+        retry = []
+        for index, (document, attempts, stored) in enumerate(batch):
+            if index not in failed_indexes:
+                self.inserted += 1
+                self._release(stored)
+            elif attempts < self.max_retries:
+                retry.append((document, attempts + 1, stored))
+            else:
+                self.dropped += 1
+                self._release(stored, error)
+
+        if error is not None:
+            logger.warning(f"Write to {self.collection.name} failed for {len(failed_indexes)} documents: {error}")
+        if len(failed_indexes) > len(retry):
+            logger.error(f"Dropped {len(failed_indexes) - len(retry)} documents for {self.collection.name} after {self.max_retries} retries")
+        if retry:
+            self.retried += len(retry)
+            # Retried documents go back to the front so they are written before newer ones
+            self._queue.extendleft(reversed(retry))
+            await asyncio.sleep(self.retry_backoff * retry[0][1])
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "queued": len(self._queue),
+            "inserted": self.inserted,
+            "batches": self.batches,
+            "retried": self.retried,
+            "dropped": self.dropped,
+        }
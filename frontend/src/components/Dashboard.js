@@ -12,47 +12,26 @@ const Dashboard = ({ user }) => {
   const [selectedCrypto, setSelectedCrypto] = useState('BTC');
 
   useEffect(() => {
-    fetchCryptoData();
-    fetchActivePredictions();
-    fetchAIPredictions();
-    const interval = setInterval(() => {
-      fetchCryptoData();
-      fetchAIPredictions();
-    }, 60000); // Update every minute
+    fetchDashboard();
+    const interval = setInterval(fetchDashboard, 60000); // Update every minute
     return () => clearInterval(interval);
   }, [user]);
 
-  const fetchCryptoData = async () => {
+  // Prices, binary and AI predictions in one request; the browser revalidates it with the ETag
+  const fetchDashboard = async () => {
     try {
       const currency = user.preferred_currency || 'USD';
-      const response = await axios.get(`/api/crypto/prices?currency=${currency}&limit=50`);
-      setCryptoData(response.data);
+      const response = await axios.get(`/api/dashboard?currency=${currency}&limit=50`);
+      setCryptoData(response.data.prices);
+      setActivePredictions(response.data.binary_predictions.filter(p => p.status === 'ACTIVE').slice(0, 3));
+      setAiPredictions(response.data.ai_predictions.slice(0, 3)); // Show latest 3 AI predictions
     } catch (error) {
-      console.error('Error fetching crypto data:', error);
+      console.error('Error fetching dashboard:', error);
     } finally {
       setLoading(false);
     }
   };
 
-  const fetchActivePredictions = async () => {
-    try {
-      const response = await axios.get('/api/binary-predictions');
-      const active = response.data.filter(p => p.status === 'ACTIVE');
-      setActivePredictions(active.slice(0, 3));
-    } catch (error) {
-      console.error('Error fetching predictions:', error);
-    }
-  };
-
-  const fetchAIPredictions = async () => {
-    try {
-      const response = await axios.get('/api/ai-predictions');
-      setAiPredictions(response.data.slice(0, 3)); // Show latest 3 AI predictions
-    } catch (error) {
-      console.error('Error fetching AI predictions:', error);
-    }
-  };
-
   const getCurrencySymbol = (currency) => {
     const symbols = {
       'USD': '$', 'RUB': '₽', 'EUR': '€', 'GBP': '£',
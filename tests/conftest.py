@@ -0,0 +1,38 @@
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+MONGO_URL = os.environ.get("TEST_MONGO_URL", os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+
+
+@pytest.fixture
+def mongo():
+    """Run an async scenario against a throwaway database on a real MongoDB server"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    def run(scenario):
+        async def main():
+            client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+            try:
+                await client.admin.command("ping")
+            except Exception:
+                client.close()
+                pytest.skip(f"MongoDB not reachable at {MONGO_URL}")
+
+            db = client[f"criptex_test_{uuid.uuid4().hex[:8]}"]
+            try:
+                return await scenario(client, db)
+            finally:
+                await client.drop_database(db.name)
+                client.close()
+
+        return asyncio.run(main())
+
+    return run
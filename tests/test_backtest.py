@@ -0,0 +1,29 @@
+import numpy as np
+
+import analysis
+from backtest import WINDOW, backtest_series, score, window_features, window_indicators
+
+
+def test_window_features_match_the_live_path():
+    rng = np.random.default_rng(3)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 200)))
+    prices[50:70] = prices[50]  # a flat stretch exercises the zero-loss RSI branch
+
+    features = window_features(window_indicators(prices))
+
+    for end in (WINDOW, 69, 70, 120, len(prices)):
+        expected = analysis.build_features(analysis.compute_technical_indicators(list(prices[:end])), {})
+        assert np.allclose(features[end - WINDOW], expected)
+
+
+def test_outcomes_are_scored_at_the_timeframe_horizon():
+    # A steadily rising series: every window's price is higher one horizon later
+    prices = np.linspace(100, 200, 2000)
+
+    outcome = backtest_series(prices, 300, "15m")
+    report = score(outcome)
+
+    assert report["windows"] == 2000 - WINDOW + 1 - 3
+    assert report["always_up_accuracy"] == 1.0
+    assert report["accuracy"] == report["predicted_up_rate"]
+    assert sum(bucket["windows"] for bucket in report["calibration"]) == report["windows"]
@@ -0,0 +1,82 @@
+import asyncio
+import random
+
+from binary_predictions import BinaryPredictionError, create_binary_prediction
+
+REQUESTS = 1000
+
+
+async def fixed_price():
+    return 45230.5
+
+
+async def create(db, user_id, stake_amount=1):
+    return await create_binary_prediction(
+        db, user_id, "BTC", random.choice(["UP", "DOWN"]), "5m", stake_amount, fixed_price, 70.0
+    )
+
+
+async def run_load(db, calls):
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, BinaryPredictionError):
+            raise result
+    created = [r for r in results if isinstance(r, dict)]
+    return created, [r for r in results if isinstance(r, BinaryPredictionError)]
+
+
+def test_concurrent_creates_never_overdraw_credits(mongo):
+    async def scenario(client, db):
+        await db.users.insert_one({"id": "u1", "free_predictions": 100, "total_predictions_used": 0})
+
+        created, rejected = await run_load(db, [create(db, "u1") for _ in range(REQUESTS)])
+
+        assert len(created) == 100
+        assert len(rejected) == REQUESTS - 100
+        assert all(e.status_code == 400 for e in rejected)
+        user = await db.users.find_one({"id": "u1"})
+        assert user["free_predictions"] == 0
+        assert user["total_predictions_used"] == 100
+        assert await db.binary_predictions.count_documents({"user_id": "u1"}) == 100
+
+    mongo(scenario)
+
+
+def test_mixed_stakes_spend_exactly_the_balance(mongo):
+    async def scenario(client, db):
+        users = [{"id": f"u{i}", "free_predictions": 10, "total_predictions_used": 0} for i in range(50)]
+        await db.users.insert_many(users)
+
+        calls = [create(db, f"u{i % 50}", stake_amount=random.randint(1, 3)) for i in range(REQUESTS)]
+        created, _ = await run_load(db, calls)
+
+        async for user in db.users.find({}):
+            spent = sum(p["stake_amount"] for p in created if p["user_id"] == user["id"])
+            assert user["free_predictions"] >= 0
+            assert user["free_predictions"] == 10 - spent
+            assert user["total_predictions_used"] == spent
+        assert await db.binary_predictions.count_documents({}) == len(created)
+
+    mongo(scenario)
+
+
+def test_failed_insert_refunds_stake(mongo):
+    async def scenario(client, db):
+        await db.users.insert_one({"id": "u1", "free_predictions": 3, "total_predictions_used": 0})
+
+        async def broken_price():
+            raise RuntimeError("price unavailable")
+
+        try:
+            await create_binary_prediction(db, "u1", "BTC", "UP", "5m", 2, broken_price, 70.0)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("prediction was created without a price")
+
+        user = await db.users.find_one({"id": "u1"})
+        assert user["free_predictions"] == 3
+        assert user["total_predictions_used"] == 0
+        assert await db.binary_predictions.count_documents({}) == 0
+
+    mongo(scenario)
@@ -0,0 +1,60 @@
+import asyncio
+
+import numpy as np
+
+from candles import CANDLE_BACKFILL_DAYS, CandleSeries, CandleStore, bin_candles, format_candles
+
+
+def test_points_are_binned_into_ohlcv_buckets():
+    timestamps = np.array([0, 60, 120, 180, 300, 360], dtype=float)
+    prices = np.array([10, 12, 9, 11, 20, 19], dtype=float)
+    volumes = np.full(6, 86400.0)
+
+    candles = bin_candles(timestamps, prices, volumes, 300)
+
+    assert candles.tolist() == [[0, 10, 12, 9, 11, 300], [300, 20, 20, 19, 19, 300]]
+
+
+def test_closed_candles_are_kept_and_only_the_open_one_is_recomputed():
+    series = CandleSeries(300)
+    # The window starts mid-bucket, so the bucket at 0 is partial and skipped
+    series.update(np.array([150, 300, 450, 600, 750.0]), np.array([1, 2, 3, 4, 5.0]), None)
+    assert series.candles(10)[:, :5].tolist() == [[300, 2, 3, 2, 3], [600, 4, 5, 4, 5]]
+
+    # Later charts can differ in what is already closed; only the open bucket and newer are taken
+    series.update(np.array([300, 450, 600, 750, 900.0]), np.array([7, 7, 4, 8, 6.0]), None)
+    assert series.candles(10)[:, :5].tolist() == [[300, 2, 3, 2, 3], [600, 4, 8, 4, 8], [900, 6, 6, 6, 6]]
+    assert series.candles(1)[:, 0].tolist() == [900]
+
+
+def test_store_serves_cached_candles_when_the_chart_fetch_fails():
+    responses = [
+        {"prices": [[ms * 1000, price] for ms, price in [(0, 1.0), (3600, 2.0), (7200, 3.0)]],
+         "total_volumes": [[0, 1.0], [3600000, 1.0], [7200000, 1.0]]},
+        RuntimeError("upstream down"),
+    ]
+
+    async def get_chart(coin_id, days):
+        if coin_id != "bitcoin":
+            raise RuntimeError("unknown coin")
+        if days == CANDLE_BACKFILL_DAYS["1h"]:
+            # Hourly points from before the detailed window, and overlapping it
+            return {"prices": [[ms * 1000, 0.5] for ms in (-7200, -3600, 0, 3600)],
+                    "total_volumes": [[ms * 1000, 1.0] for ms in (-7200, -3600, 0, 3600)]}
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    store = CandleStore(get_chart)
+    first, forming = asyncio.run(store.get("bitcoin", "1h"))
+    second, _ = asyncio.run(store.get("bitcoin", "1h"))
+    unknown, unknown_forming = asyncio.run(store.get("nope", "1h"))
+
+    assert forming and second.tolist() == first.tolist()
+    candles = format_candles(first, 2.0)
+    # Only backfill points from before the detailed window are used
+    assert [candle["time"] for candle in candles] == [-7200000, -3600000, 0, 3600000, 7200000]
+    assert candles[0]["close"] == candles[1]["close"] == 1.0 and candles[2]["close"] == 2.0
+    assert candles[-1]["close"] == 6.0 and candles[-1]["volume"] == 2.0 / 24
+    assert len(unknown) == 0 and not unknown_forming and list(store.series) == [("bitcoin", "1h")]
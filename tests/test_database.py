@@ -0,0 +1,51 @@
+import threading
+import time
+
+from pymongo.monitoring import (
+    ConnectionCheckedOutEvent, ConnectionCheckOutFailedEvent, ConnectionCheckOutFailedReason,
+    ConnectionCheckOutStartedEvent
+)
+from pymongo.read_preferences import PrimaryPreferred, SecondaryPreferred
+
+import database
+from metrics import MongoPoolMetrics, mongo_pool_wait
+
+ADDRESS = ("localhost", 27017)
+
+
+def test_workloads_get_their_own_pools_read_preferences_and_write_concerns():
+    clients = [database.client, database.history_client, database.own_history_client, database.background_client]
+    assert len({id(client) for client in clients}) == 4
+
+    assert database.db.read_preference.mode == 0
+    assert database.db.write_concern.document == {"w": "majority", "j": True}
+
+    history = database.history_db.read_preference
+    assert isinstance(history, SecondaryPreferred)
+    assert history.max_staleness == database.MONGO_HISTORY_MAX_STALENESS_SECONDS
+    assert database.history_client.options.pool_options.max_pool_size == database.MONGO_HISTORY_POOL_SIZE
+
+    assert isinstance(database.own_history_db.read_preference, PrimaryPreferred)
+    assert database.own_history_client.options.pool_options.max_pool_size == database.MONGO_OWN_HISTORY_POOL_SIZE
+
+    assert database.background_db.write_concern.document == {"w": 1}
+
+
+def test_pool_wait_is_recorded_per_thread_and_outcome():
+    listener = MongoPoolMetrics("test_pool")
+
+    listener.connection_check_out_started(ConnectionCheckOutStartedEvent(ADDRESS))
+    # Another thread's checkout in between must not be matched to this one
+    other = threading.Thread(target=listener.connection_check_out_started, args=(ConnectionCheckOutStartedEvent(ADDRESS),))
+    other.start()
+    other.join()
+    time.sleep(0.01)
+    listener.connection_checked_out(ConnectionCheckedOutEvent(ADDRESS, 1))
+
+    listener.connection_check_out_started(ConnectionCheckOutStartedEvent(ADDRESS))
+    listener.connection_check_out_failed(ConnectionCheckOutFailedEvent(ADDRESS, ConnectionCheckOutFailedReason.TIMEOUT))
+
+    ok = mongo_pool_wait._series[("test_pool", "ok")]
+    assert sum(ok[0]) == 1 and ok[1] >= 0.01
+    assert sum(mongo_pool_wait._series[("test_pool", "timeout")][0]) == 1
+    assert listener.checked_out == 1
@@ -0,0 +1,76 @@
+import asyncio
+
+from generation_pipeline import Pipeline, SharedResults, Stage
+
+
+async def numbers(n):
+    for i in range(n):
+        yield i
+
+
+def test_pipeline_respects_stage_concurrency():
+    async def scenario():
+        running = 0
+        peak = 0
+        collected = []
+
+        async def slow(item):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return item * 2
+
+        async def collect(item):
+            collected.append(item)
+
+        summary = await Pipeline([
+            Stage("slow", slow, concurrency=3, queue_size=2),
+            Stage("collect", collect, concurrency=1, queue_size=2),
+        ]).run(numbers(20))
+
+        assert peak == 3
+        assert sorted(collected) == [i * 2 for i in range(20)]
+        assert summary["items"] == 20
+        assert summary["stages"]["slow"]["count"] == 20
+
+    asyncio.run(scenario())
+
+
+def test_pipeline_counts_errors_and_drops_failed_items():
+    async def scenario():
+        collected = []
+
+        async def flaky(item):
+            if item % 2:
+                raise ValueError("odd")
+            return item
+
+        async def collect(item):
+            collected.append(item)
+
+        summary = await Pipeline([Stage("flaky", flaky, 4), Stage("collect", collect, 1)]).run(numbers(10))
+
+        assert sorted(collected) == [0, 2, 4, 6, 8]
+        assert summary["stages"]["flaky"]["errors"] == 5
+
+    asyncio.run(scenario())
+
+
+def test_shared_results_run_each_key_once():
+    async def scenario():
+        calls = []
+        shared = SharedResults()
+
+        async def load(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key.upper()
+
+        results = await asyncio.gather(*(shared.get(k, lambda k=k: load(k)) for k in ["a", "b", "a", "a", "b"]))
+
+        assert results == ["A", "B", "A", "A", "B"]
+        assert sorted(calls) == ["a", "b"]
+
+    asyncio.run(scenario())
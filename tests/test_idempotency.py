@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from idempotency import (
+    IdempotencyError, claim_idempotency_key, complete_idempotency_key, ensure_idempotency_indexes,
+    record_idempotency_resource, release_idempotency_key, request_fingerprint
+)
+
+
+def test_a_key_runs_its_request_once_and_replays_the_response(mongo):
+    fingerprint = request_fingerprint("/api/ai-predictions/manual", {"symbol": "BTC", "timeframe": "1h"})
+    other = request_fingerprint("/api/ai-predictions/manual", {"symbol": "ETH", "timeframe": "1h"})
+
+    async def scenario(client, db):
+        await ensure_idempotency_indexes(db)
+        assert await claim_idempotency_key(db, "u1", "k1", fingerprint) is None
+
+        with pytest.raises(IdempotencyError) as pending:
+            await claim_idempotency_key(db, "u1", "k1", fingerprint)
+        assert pending.value.status_code == 409
+
+        await complete_idempotency_key(db, "u1", "k1", {"id": "p1"})
+        assert (await claim_idempotency_key(db, "u1", "k1", fingerprint))["response"] == {"id": "p1"}
+        with pytest.raises(IdempotencyError) as mismatch:
+            await claim_idempotency_key(db, "u1", "k1", other)
+        assert mismatch.value.status_code == 422
+
+        # Keys are per user, and a failed request's key can be claimed again
+        assert await claim_idempotency_key(db, "u2", "k1", other) is None
+        await release_idempotency_key(db, "u2", "k1")
+        assert await claim_idempotency_key(db, "u2", "k1", other) is None
+
+        # A record past its TTL that the monitor has not removed yet is taken over
+        later = datetime.utcnow() + timedelta(hours=25)
+        assert await claim_idempotency_key(db, "u1", "k1", other, now=later) is None
+
+    mongo(scenario)
+
+
+def test_a_stale_pending_claim_is_taken_over_once_with_its_resource_id(mongo):
+    fingerprint = request_fingerprint("/api/ai-predictions/manual", {"symbol": "BTC", "timeframe": "1h"})
+
+    async def scenario(client, db):
+        await ensure_idempotency_indexes(db)
+        start = datetime.utcnow()
+        assert await claim_idempotency_key(db, "u1", "k1", fingerprint, now=start) is None
+        await record_idempotency_resource(db, "u1", "k1", "p1")
+
+        # The worker died before completing; after the lease the next retry gets the claim and the resource id
+        later = start + timedelta(minutes=5)
+        previous = await claim_idempotency_key(db, "u1", "k1", fingerprint, now=later)
+        assert previous["status"] == "pending" and previous["resource_id"] == "p1"
+        with pytest.raises(IdempotencyError) as taken:
+            await claim_idempotency_key(db, "u1", "k1", fingerprint, now=later)
+        assert taken.value.status_code == 409
+
+    mongo(scenario)
+
+
+def test_keys_must_be_reasonably_short():
+    with pytest.raises(IdempotencyError) as error:
+        asyncio.run(claim_idempotency_key(None, "u1", "x" * 256, "f"))
+    assert error.value.status_code == 400
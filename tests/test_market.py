@@ -0,0 +1,91 @@
+import asyncio
+
+import market
+
+
+def chart(timestamps, offset=0.0):
+    return {
+        "prices": [[ms, 100.0 + offset + i] for i, ms in enumerate(timestamps)],
+        "volumes": [[ms, 5.0] for ms in timestamps],
+        "market_caps": [],
+    }
+
+
+def test_charts_share_one_axis_only_when_their_points_line_up():
+    hourly = [1_700_000_000_000 + i * 3_600_000 for i in range(4)]
+    # CoinGecko stamps each coin's points a few seconds apart
+    shifted = [ms + 7_000 for ms in hourly]
+
+    aligned = market.align_charts({"BTC": chart(hourly), "ETH": chart(shifted, 10.0)})
+    assert aligned["aligned"] and aligned["timestamps"] == hourly
+    assert aligned["series"]["ETH"] == {"prices": [110.0, 111.0, 112.0, 113.0], "volumes": [5.0] * 4, "market_caps": []}
+
+    mixed = {"BTC": chart(hourly), "SOL": chart(hourly[:3])}
+    assert market.align_charts(mixed) == {"aligned": False, "timestamps": None, "series": mixed}
+
+
+def test_concurrent_chart_requests_share_one_upstream_fetch(monkeypatch):
+    calls = []
+
+    async def get_chart(coin_id, days):
+        calls.append((coin_id, days))
+        await asyncio.sleep(0.01)
+        return chart([1, 2, 3])
+
+    monkeypatch.setattr(market.market_data, "get_chart", get_chart)
+    monkeypatch.setattr(market, "chart_cache", {})
+
+    async def scenario():
+        first = await asyncio.gather(*(market.fetch_chart("bitcoin", 7) for _ in range(5)))
+        return first, await market.fetch_chart("bitcoin", 7), await market.fetch_chart("bitcoin", 1)
+
+    first, cached, other_range = asyncio.run(scenario())
+
+    assert calls == [("bitcoin", 7), ("bitcoin", 1)]
+    assert all(result is first[0] for result in first) and cached is first[0]
+
+
+def test_only_usd_prices_come_from_the_shared_snapshot(monkeypatch):
+    rows = [{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "image": "", "current_price": 40000.0,
+             "price_change_percentage_24h": 1.0, "total_volume": 1.0, "market_cap": 1.0}]
+    upstream = []
+
+    async def fetch_upstream(currency, limit):
+        upstream.append(currency)
+        return [{"symbol": "BTC", "current_price": 36500.0, "currency": currency}]
+
+    monkeypatch.setattr(market.market_snapshot, "markets", lambda limit: rows)
+    monkeypatch.setattr(market, "fetch_upstream_crypto_prices", fetch_upstream)
+
+    usd = asyncio.run(market.fetch_crypto_prices("USD", 1))
+    eur = asyncio.run(market.fetch_crypto_prices("EUR", 1))
+
+    assert usd[0]["current_price"] == 40000.0
+    assert eur[0]["current_price"] == 36500.0 and upstream == ["EUR"]
+
+
+def test_non_usd_prediction_prices_are_quoted_upstream_and_cached(monkeypatch):
+    quotes = []
+
+    async def get_price(coin_id, currency):
+        quotes.append((coin_id, currency))
+        return 36500.0 if currency == "EUR" else 40000.0
+
+    monkeypatch.setattr(market.market_snapshot, "price", lambda coin_id: 41000.0)
+    monkeypatch.setattr(market.market_data, "get_price", get_price)
+    monkeypatch.setattr(market, "currency_quotes", {})
+
+    async def scenario():
+        return (await market.get_entry_price("BTC", "USD"), await market.get_entry_price("BTC", "EUR"),
+                await market.get_current_price_for_symbol("BTC", "EUR"))
+
+    usd, eur_entry, eur_settlement = asyncio.run(scenario())
+
+    assert usd == 41000.0
+    assert eur_entry == eur_settlement == 36500.0 and quotes == [("bitcoin", "EUR")]
+
+
+def test_only_listed_coins_are_supported():
+    supported = [market.is_supported_symbol(market.resolve_symbol(s)) for s in ("btc", "litecoin", "$A.B", "NOPE")]
+
+    assert supported == [True, True, False, False]
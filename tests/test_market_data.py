@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from market_data import MarketClock, MarketDataError, MarketDataProvider, ReplayProvider, SyntheticProvider
+
+RATES = {"USD": 1.0, "EUR": 0.5}
+
+
+def test_synthetic_paths_are_reproducible_and_independent_of_request_order():
+    start = 1_700_000_000.0
+    first = SyntheticProvider(MarketClock(1.0, start), RATES, seed=7)
+    second = SyntheticProvider(MarketClock(1.0, start), RATES, seed=7)
+    timestamps = np.array([start - 86400, start - 3600, start])
+
+    # Touch other coins and a later point first; the bitcoin path must not change
+    second.price_at("ethereum", np.array([start + 86400]))
+    second.price_at("bitcoin", np.array([start + 7 * 86400]))
+
+    assert np.allclose(first.price_at("bitcoin", timestamps), second.price_at("bitcoin", timestamps))
+    assert not np.allclose(first.price_at("bitcoin", timestamps), first.price_at("ethereum", timestamps))
+
+
+def test_synthetic_chart_and_price_follow_the_clock():
+    provider = SyntheticProvider(MarketClock(1.0, 1_700_000_000.0), RATES, base_prices={"bitcoin": 40000.0})
+
+    async def scenario():
+        chart = await provider.get_chart("bitcoin", 1)
+        usd = await provider.get_price("bitcoin", "USD")
+        eur = await provider.get_price("bitcoin", "EUR")
+        return chart, usd, eur
+
+    chart, usd, eur = asyncio.run(scenario())
+
+    assert len(chart["prices"]) == 289
+    assert eur == usd * 0.5
+
+
+def test_replay_runs_faster_than_real_time_and_holds_the_last_tick(tmp_path):
+    path = tmp_path / "ticks.ndjson"
+    path.write_text("".join(
+        json.dumps({"t": 1_700_000_000 + i * 60, "prices": {"bitcoin": 40000 + i}}) + "\n" for i in range(5)
+    ))
+    provider = ReplayProvider(str(path), RATES, speed=10_000)
+
+    async def scenario():
+        first = await provider.get_price("bitcoin", "USD")
+        await asyncio.sleep(0.05)
+        return first, await provider.get_price("bitcoin", "USD")
+
+    first, later = asyncio.run(scenario())
+
+    assert first == 40000
+    assert later == 40004
+    assert provider.finished
+
+
+def test_replay_markets_leave_out_coins_missing_from_the_recording(tmp_path):
+    path = tmp_path / "ticks.ndjson"
+    path.write_text(json.dumps({"t": 1_700_000_000, "prices": {"bitcoin": 40000}}) + "\n")
+    provider = ReplayProvider(str(path), RATES)
+
+    markets = asyncio.run(provider.get_markets("EUR", ["bitcoin", "ethereum", "solana"]))
+
+    assert [row["id"] for row in markets] == ["bitcoin"]
+    assert markets[0]["current_price"] == 20000
+    with pytest.raises(MarketDataError):
+        asyncio.run(provider.get_price("ethereum", "USD"))
+
+
+def test_providers_missing_a_method_cannot_be_constructed():
+    class MarketsOnly(MarketDataProvider):
+        async def get_markets(self, currency, coin_ids):
+            return []
+
+    with pytest.raises(TypeError):
+        MarketsOnly()
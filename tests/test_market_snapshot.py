@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import uuid
+
+import pytest
+
+from market_snapshot import SEQUENCE, SharedMarketSnapshot
+
+COINS = ["bitcoin", "ethereum", "solana"]
+MARKETS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "image": "btc.png", "current_price": 40000.0,
+     "price_change_percentage_24h": 1.5, "total_volume": 1e9, "market_cap": 8e11},
+    {"id": "solana", "symbol": "sol", "name": "Solana", "image": "sol.png", "current_price": 100.0,
+     "price_change_percentage_24h": None, "total_volume": 2e8, "market_cap": 4e10},
+]
+INDICATORS = {"sma_5": 1.0, "sma_10": 2.0, "rsi": 55.0, "macd": 0.5, "bb_upper": 3.0, "bb_middle": 2.0,
+              "bb_lower": 1.0, "volatility": 4.0, "price_vs_sma5": 0.1, "price_vs_sma10": 0.2}
+
+
+@pytest.fixture
+def segment_name():
+    name = f"criptex_test_{uuid.uuid4().hex[:8]}"
+    yield name
+    probe = SharedMarketSnapshot(name, COINS, ["1h"])
+    try:
+        probe.unlink()
+    except FileNotFoundError:
+        pass
+    if os.path.exists(probe.lock_path):
+        os.remove(probe.lock_path)
+
+
+def publish_and_exit(name):
+    snapshot = SharedMarketSnapshot(name, COINS, ["1h"]).open()
+    assert snapshot.acquire_publisher()
+    snapshot.update_markets(MARKETS)
+    snapshot.update_indicators("bitcoin", "1h", INDICATORS)
+    snapshot.publish()
+
+
+def test_workers_read_what_another_process_published_and_take_over_when_it_exits(segment_name):
+    worker = SharedMarketSnapshot(segment_name, COINS, ["1h"]).open()
+    try:
+        publisher = multiprocessing.get_context("fork").Process(target=publish_and_exit, args=(segment_name,))
+        publisher.start()
+        publisher.join(10)
+        assert publisher.exitcode == 0
+
+        markets = worker.markets(len(COINS))
+        assert [coin["id"] for coin in markets] == ["bitcoin", "solana"]
+        assert markets[0]["symbol"] == "btc" and markets[0]["current_price"] == 40000.0
+        assert markets[1]["price_change_percentage_24h"] is None
+        assert worker.price("ethereum") is None
+        assert worker.indicators("bitcoin", "1h") == INDICATORS
+        assert worker.indicators("solana", "1h") is None
+
+        # The publisher's lock died with it
+        assert worker.acquire_publisher()
+        worker.update_markets([{**MARKETS[0], "current_price": 41000.0}])
+        worker.publish()
+        assert worker.price("bitcoin") == 41000.0
+        assert worker.markets(len(COINS))[1]["name"] == "Solana"
+    finally:
+        worker.close()
+
+
+def test_one_publisher_at_a_time_and_stale_or_torn_reads_are_refused(segment_name):
+    publisher = SharedMarketSnapshot(segment_name, COINS, ["1h"], max_price_age=60).open()
+    reader = SharedMarketSnapshot(segment_name, COINS, ["1h"], max_price_age=60).open()
+    try:
+        assert publisher.acquire_publisher()
+        assert not reader.acquire_publisher()
+        with pytest.raises(RuntimeError):
+            reader.publish()
+
+        publisher.update_markets(MARKETS, now=1000.0)
+        publisher.publish()
+        assert reader.price("bitcoin", now=1030.0) == 40000.0
+        assert reader.price("bitcoin", now=1061.0) is None
+        assert reader.markets(len(COINS), now=1061.0) is None
+
+        # A write in progress leaves the sequence odd
+        publisher._header[SEQUENCE] += 1
+        assert reader.price("bitcoin", now=1030.0) is None
+        publisher._header[SEQUENCE] += 1
+        assert reader.price("bitcoin", now=1030.0) == 40000.0
+    finally:
+        publisher.close()
+        reader.close()
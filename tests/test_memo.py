@@ -0,0 +1,57 @@
+import asyncio
+
+from memo import TimeBucketedMemo, input_digest
+
+
+def test_calls_in_one_bucket_share_a_result_and_later_buckets_recompute():
+    now = [0.0]
+    memo = TimeBucketedMemo(60, max_entries=2, clock=lambda: now[0])
+    calls = []
+
+    async def analyze(symbol):
+        calls.append(symbol)
+        await asyncio.sleep(0.01)
+        return {"symbol": symbol, "bucket": memo.bucket()}
+
+    async def scenario():
+        together = await asyncio.gather(*(memo.get(("BTC", "1h"), lambda: analyze("BTC")) for _ in range(5)))
+        now[0] = 59.0
+        same_bucket = await memo.get(("BTC", "1h"), lambda: analyze("BTC"))
+        now[0] = 61.0
+        next_bucket = await memo.get(("BTC", "1h"), lambda: analyze("BTC"))
+        await memo.get(("ETH", "1h"), lambda: analyze("ETH"))
+        await memo.get(("SOL", "1h"), lambda: analyze("SOL"))
+        # Over max_entries, the least recently used key goes
+        await memo.get(("BTC", "1h"), lambda: analyze("BTC"))
+        return together, same_bucket, next_bucket
+
+    together, same_bucket, next_bucket = asyncio.run(scenario())
+
+    assert all(result is together[0] for result in together) and same_bucket is together[0]
+    assert next_bucket["bucket"] == 1
+    assert calls == ["BTC", "BTC", "ETH", "SOL", "BTC"]
+    assert memo.stats()["entries"] == 2 and memo.hits == 5
+
+
+def test_results_rejected_by_cache_if_are_not_kept():
+    memo = TimeBucketedMemo(60, clock=lambda: 0.0)
+    calls = []
+
+    async def fallback():
+        calls.append(1)
+        return {"reasoning": "fallback"}
+
+    async def scenario():
+        for _ in range(2):
+            await memo.get("BTC", fallback, cache_if=lambda result: "technical_score" in result)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_input_digest_tells_different_arguments_apart():
+    indicators = {"rsi": 71.5, "volatility": 2.0}
+
+    assert input_digest(indicators, None) == input_digest({"volatility": 2.0, "rsi": 71.5}, None)
+    assert input_digest(indicators, None) != input_digest({"rsi": 28.0, "volatility": 2.0}, None)
+    assert input_digest(indicators, None) != input_digest(indicators, {"overall_sentiment": 0.4})
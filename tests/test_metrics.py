@@ -0,0 +1,44 @@
+import asyncio
+
+from metrics import Histogram, UpstreamCall, upstream_request_duration
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "/api/x")
+
+    lines = histogram.render()
+
+    assert 'latency_seconds_bucket{route="/api/x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/api/x",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/api/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/api/x"} 4' in lines
+    assert 'latency_seconds_sum{route="/api/x"} 6.05' in lines
+
+
+def test_label_values_are_escaped():
+    histogram = Histogram("h", "doc", ("route",), buckets=(1.0,))
+    histogram.observe(0.1, 'a"b\\c')
+
+    assert 'h_count{route="a\\"b\\\\c"} 1' in histogram.render()
+
+
+def test_upstream_call_classifies_outcomes():
+    async def scenario():
+        async with UpstreamCall("test/ok") as call:
+            call.outcome = "ok"
+        try:
+            async with UpstreamCall("test/timeout"):
+                raise asyncio.TimeoutError()
+        except asyncio.TimeoutError:
+            pass
+        async with UpstreamCall("test/fallback"):
+            pass
+
+    asyncio.run(scenario())
+
+    series = upstream_request_duration._series
+    assert ("test/ok", "ok") in series
+    assert ("test/timeout", "timeout") in series
+    assert ("test/fallback", "fallback") in series
@@ -0,0 +1,81 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from prediction_retention import prune_signals, retention_loop, run_retention
+
+NOW = datetime(2024, 3, 20, 12, 0)
+OLD = datetime(2024, 3, 1, 9, 0)
+
+
+def binary(id, status, created_at=OLD, symbol="BTC", timeframe="5m"):
+    return {"id": id, "user_id": "u1", "symbol": symbol, "timeframe": timeframe, "status": status,
+            "confidence_score": 70.0, "created_at": created_at}
+
+
+def test_old_predictions_are_archived_rolled_up_and_deleted(mongo, tmp_path):
+    async def scenario(client, db):
+        await db.binary_predictions.insert_many([
+            binary("b1", "WON"), binary("b2", "LOST"), binary("b3", "WON", timeframe="1h"),
+            binary("b4", "ACTIVE", created_at=NOW - timedelta(days=1)),
+        ])
+        await db.ai_signals.insert_many([
+            {"id": "s1", "symbol": "ETH", "timeframe": "1h", "direction": "UP", "confidence_score": 80.0, "created_at": OLD},
+            {"id": "s2", "symbol": "ETH", "timeframe": "1h", "direction": "DOWN", "confidence_score": 60.0, "created_at": OLD},
+        ])
+        await db.ai_predictions.insert_one({"id": "a1", "user_id": "u1", "signal_id": "s1", "symbol": "ETH",
+                                            "timeframe": "1h", "status": "LOST", "created_at": OLD})
+
+        result = await run_retention(db, now=NOW, retention_days=7, archive_dir=tmp_path)
+
+        assert result["binary_predictions"] == 3 and result["ai_predictions"] == 1
+        # s1 was only referenced by the archived prediction, s2 by none
+        assert result["ai_signals_pruned"] == 2
+        assert [doc["id"] async for doc in db.binary_predictions.find()] == ["b4"]
+        assert await db.ai_predictions.count_documents({}) == 0
+
+        with gzip.open(tmp_path / "binary_predictions-2024-03-01.ndjson.gz", "rt") as f:
+            assert sorted(json.loads(line)["id"] for line in f) == ["b1", "b2", "b3"]
+        with gzip.open(tmp_path / "ai_predictions-2024-03-01.ndjson.gz", "rt") as f:
+            # Archived AI predictions carry their signal's payload
+            assert [json.loads(line)["direction"] for line in f] == ["UP"]
+
+        rollup = await db.prediction_rollups.find_one({"source": "binary_predictions", "symbol": "BTC"}, {"_id": 0})
+        assert (rollup["total"], rollup["won"], rollup["lost"], rollup["day"]) == (3, 2, 1, "2024-03-01")
+        assert rollup["timeframes"] == {"5m": {"won": 1, "lost": 1}, "1h": {"won": 1}}
+        assert rollup["confidence_sum"] == 210.0
+
+    mongo(scenario)
+
+
+def test_only_old_unreferenced_signals_are_pruned(mongo):
+    async def scenario(client, db):
+        await db.ai_signals.insert_many([
+            {"id": "old-orphan", "created_at": OLD},
+            {"id": "old-referenced", "created_at": OLD},
+            {"id": "new-orphan", "created_at": NOW},
+        ])
+        await db.ai_predictions.insert_one({"id": "a1", "signal_id": "old-referenced", "created_at": NOW})
+
+        assert await prune_signals(db, NOW - timedelta(days=1), batch_size=1) == 1
+        assert sorted([s["id"] async for s in db.ai_signals.find()]) == ["new-orphan", "old-referenced"]
+
+    mongo(scenario)
+
+
+def test_retention_loop_runs_only_in_the_elected_worker():
+    touched = []
+
+    class RecordingDatabase:
+        def __getitem__(self, name):
+            touched.append(name)
+            raise RuntimeError("not elected")
+
+    async def scenario():
+        task = asyncio.create_task(retention_loop(RecordingDatabase(), interval=0.01, should_run=lambda: False))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert touched == []
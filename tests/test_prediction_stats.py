@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from prediction_retention import run_retention
+from prediction_stats import _stats_increments, format_stats, rebuild_prediction_stats, settle_collection
+
+NOW = datetime(2024, 3, 20, 12, 0)
+
+
+def binary(id, direction="UP", symbol="BTC", timeframe="5m", expiry_time=NOW - timedelta(minutes=1)):
+    return {"id": id, "user_id": "u1", "symbol": symbol, "timeframe": timeframe, "direction": direction,
+            "entry_price": 100.0, "currency": "USD", "status": "ACTIVE", "created_at": expiry_time,
+            "expiry_time": expiry_time}
+
+
+async def get_price(symbol, currency):
+    await asyncio.sleep(0)
+    return 110.0
+
+
+def test_symbols_and_timeframes_cannot_become_field_paths():
+    increments = _stats_increments("$A.B", "1h", won=True)
+
+    assert increments == {"total": 1, "won": 1, "symbols.%24A%2EB.won": 1, "timeframes.1h.won": 1}
+    stats = format_stats({"won": 1, "symbols": {"%24A%2EB": {"won": 1}}, "timeframes": {"1h": {"won": 1}}})
+    assert list(stats["by_symbol"]) == ["$A.B"] and list(stats["by_timeframe"]) == ["1h"]
+
+
+def test_only_the_settler_that_flips_a_prediction_counts_it(mongo):
+    async def scenario(client, db):
+        await db.users.insert_one({"id": "u1", "successful_predictions": 0})
+        await db.binary_predictions.insert_many([binary("b1"), binary("b2", direction="DOWN"), binary("b3"),
+                                                 binary("b4", expiry_time=NOW + timedelta(minutes=1))])
+
+        # Distinct settlement times, so a flip that ignored the status would still modify the document
+        settlers = (settle_collection(db, "binary_predictions", get_price, now=NOW + timedelta(seconds=i)) for i in range(4))
+        settled = await asyncio.gather(*settlers)
+
+        assert sum(settled) == 3
+        stats = await db.prediction_stats.find_one({"user_id": "u1"})
+        assert (stats["total"], stats["won"], stats["lost"]) == (3, 2, 1)
+        assert (await db.users.find_one({"id": "u1"}))["successful_predictions"] == 2
+        assert (await db.binary_predictions.find_one({"id": "b4"}))["status"] == "ACTIVE"
+
+    mongo(scenario)
+
+
+def test_settlement_pages_through_more_than_one_batch(mongo):
+    async def scenario(client, db):
+        await db.binary_predictions.insert_many([binary(f"b{i}") for i in range(7)])
+
+        settled = await settle_collection(db, "binary_predictions", get_price, now=NOW, batch_size=3)
+
+        assert settled == 7
+        assert await db.binary_predictions.count_documents({"status": "ACTIVE"}) == 0
+        assert (await db.prediction_stats.find_one({"user_id": "u1"}))["total"] == 7
+
+    mongo(scenario)
+
+
+def test_rebuild_matches_the_incremental_counters_including_rollups(mongo, tmp_path):
+    async def scenario(client, db):
+        old = NOW - timedelta(days=30)
+        await db.binary_predictions.insert_many([
+            binary("b1", expiry_time=old), binary("b2", direction="DOWN", timeframe="1h", expiry_time=old),
+            binary("b3", symbol="ETH"), binary("b4", direction="DOWN", symbol="ETH", timeframe="1h"),
+        ])
+        await settle_collection(db, "binary_predictions", get_price, now=NOW)
+        # b1 and b2 now only survive in the daily rollups
+        await run_retention(db, now=NOW, retention_days=7, archive_dir=tmp_path)
+        assert await db.binary_predictions.count_documents({}) == 2
+        counted = format_stats(await db.prediction_stats.find_one({"user_id": "u1"}))
+
+        assert await rebuild_prediction_stats(db, "u1") == 1
+
+        rebuilt = format_stats(await db.prediction_stats.find_one({"user_id": "u1"}))
+        counted.pop("updated_at"), rebuilt.pop("updated_at")
+        assert rebuilt == counted
+        assert counted["total"] == 4 and counted["by_timeframe"]["1h"] == {"won": 0, "lost": 2, "total": 2, "accuracy": 0.0}
+
+    mongo(scenario)
@@ -0,0 +1,63 @@
+import asyncio
+
+import numpy as np
+
+from recommendations import BUY, HOLD, POINTS_PER_DAY, SELL, RecommendationEngine, score_price_matrix
+
+HOURS = 30 * POINTS_PER_DAY + 1
+
+
+def series(drift_per_day: float, seed: int, start: float = 100.0) -> np.ndarray:
+    noise = np.random.default_rng(seed).normal(0, 0.003, HOURS)
+    return start * np.exp(np.arange(HOURS) * drift_per_day / POINTS_PER_DAY + np.cumsum(noise))
+
+
+def test_trends_are_scored_as_buy_sell_and_hold_with_levels_around_the_price():
+    sideways = 100 * np.exp(0.02 * np.sin(np.arange(HOURS) / 5))
+    scores = score_price_matrix(np.vstack([series(0.02, 1), series(-0.02, 2), sideways]))
+
+    assert list(scores["type"]) == [BUY, SELL, HOLD]
+    current = scores["current_price"]
+    assert scores["target_price"][0] > current[0] > scores["stop_loss"][0]
+    assert scores["target_price"][1] < current[1] < scores["stop_loss"][1]
+    assert scores["trend"][0] > 0.5 and scores["trend"][1] < -0.4
+    assert np.all((scores["confidence"] >= 55) & (scores["confidence"] <= 95))
+    assert np.all((scores["hit_rate"] >= 0) & (scores["hit_rate"] <= 1))
+
+
+def test_engine_ranks_once_and_serves_every_currency():
+    end_ms = 1_700_000_000_000
+    timestamps = end_ms - np.arange(HOURS)[::-1] * 3_600_000
+    charts = {
+        "bitcoin": series(0.03, 4, 40000.0),
+        "ethereum": series(-0.01, 5, 2000.0),
+        "dogecoin": series(0.0, 6, 0.1)[-100:],
+    }
+    calls = []
+
+    async def get_chart(coin_id, days):
+        calls.append(coin_id)
+        if coin_id not in charts:
+            raise RuntimeError("upstream down")
+        prices = charts[coin_id]
+        return {"prices": [[int(ms), float(price)] for ms, price in zip(timestamps[-len(prices):], prices)]}
+
+    async def get_symbols():
+        return {"bitcoin": "BTC", "ethereum": "ETH"}
+
+    engine = RecommendationEngine(["bitcoin", "ethereum", "dogecoin", "solana"], get_chart, get_symbols,
+                                  {"USD": 1.0, "RUB": 90.0})
+
+    async def scenario():
+        usd, rub = await asyncio.gather(engine.top("USD", 10), engine.top("rub", 1))
+        return usd, rub, await engine.top("GBP", 10)
+
+    usd, rub, unknown = asyncio.run(scenario())
+
+    # Both first requests waited on the same refresh; the short and missing histories were skipped
+    assert sorted(calls) == ["bitcoin", "dogecoin", "ethereum", "solana"]
+    assert {item["symbol"] for item in usd} == {"BTC", "ETH"}
+    assert usd[0]["confidence"] >= usd[1]["confidence"]
+    assert len(rub) == 1 and rub[0]["symbol"] == usd[0]["symbol"] and rub[0]["currency"] == "RUB"
+    assert abs(rub[0]["current_price"] / usd[0]["current_price"] - 90.0) < 1e-3
+    assert unknown == usd
@@ -0,0 +1,34 @@
+import asyncio
+
+from request_timing import current_trace, span, start_trace, timed
+
+
+def test_span_is_noop_outside_a_request():
+    with span("orphan") as record:
+        assert record is None
+    assert current_trace() is None
+
+
+def test_concurrent_children_nest_under_their_own_parent():
+    @timed("fetch")
+    async def fetch():
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        trace = start_trace()
+        with span("analyze"):
+            await asyncio.gather(fetch(), fetch())
+        with span("persist"):
+            pass
+        trace.finish()
+        return trace
+
+    trace = asyncio.run(scenario())
+
+    assert [child.name for child in trace.root.children] == ["analyze", "persist"]
+    assert [child.name for child in trace.root.children[0].children] == ["fetch", "fetch"]
+
+    header = trace.server_timing()
+    assert header.startswith("total;dur=")
+    assert 'fetch;dur=' in header and 'desc="x2"' in header
+    assert "  fetch" in trace.format_tree()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import response_cache
+from response_cache import ResponseCache
+
+
+def build(content, calls):
+    async def builder():
+        calls.append(content)
+        await asyncio.sleep(0.01)
+        return content
+    return builder
+
+
+def test_hits_misses_and_stats():
+    cache = ResponseCache()
+    calls = []
+
+    async def scenario():
+        first = await cache.get_or_build("/r", {"b": 2, "a": 1}, build({"x": 1}, calls))
+        # Parameter order does not change the key
+        second = await cache.get_or_build("/r", {"a": 1, "b": 2}, build({"x": 2}, calls))
+        other = await cache.get_or_build("/r", {"a": 2}, build({"x": 3}, calls))
+        return first, second, other
+
+    first, second, other = asyncio.run(scenario())
+
+    assert first == second == b'{"x":1}' and json.loads(other) == {"x": 3}
+    assert calls == [{"x": 1}, {"x": 3}]
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["hit_ratio"]) == (2, 1, 2, 0.3333)
+    assert stats["bytes_served"] == 3 * len(first) and stats["bytes_saved"] == len(first)
+
+
+def test_bumping_a_namespace_invalidates_only_its_entries():
+    cache = ResponseCache()
+    calls = []
+
+    async def scenario():
+        await cache.get_or_build("/prices", None, build("p1", calls), namespace="prices")
+        await cache.get_or_build("/currencies", None, build("c1", calls), namespace="currencies")
+        cache.bump("prices")
+        prices = await cache.get_or_build("/prices", None, build("p2", calls), namespace="prices")
+        currencies = await cache.get_or_build("/currencies", None, build("c2", calls), namespace="currencies")
+        return prices, currencies
+
+    assert asyncio.run(scenario()) == (b'"p2"', b'"c1"')
+    assert calls == ["p1", "c1", "p2"] and cache.stats()["versions"] == {"prices": 1}
+
+
+def test_a_bump_during_a_build_discards_what_it_built():
+    cache = ResponseCache()
+    calls = []
+
+    async def scenario():
+        build_task = asyncio.create_task(cache.get_or_build("/prices", None, build("stale", calls), namespace="prices"))
+        await asyncio.sleep(0)
+        cache.bump("prices")
+        await build_task
+        return await cache.get_or_build("/prices", None, build("fresh", calls), namespace="prices")
+
+    assert asyncio.run(scenario()) == b'"fresh"'
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    cache = ResponseCache()
+    calls = []
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+
+    async def get(content):
+        return await cache.get_or_build("/r", None, build(content, calls), ttl=60)
+
+    asyncio.run(get("old"))
+    now[0] += 59
+    assert asyncio.run(get("new")) == b'"old"'
+    now[0] += 2
+    assert asyncio.run(get("new")) == b'"new"'
+    assert calls == ["old", "new"]
+
+
+def test_concurrent_misses_share_one_build():
+    cache = ResponseCache()
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_build("/r", None, build("x", calls)) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == [b'"x"'] * 10
+    assert calls == ["x"]
+    assert (cache.hits, cache.misses) == (9, 1) and not cache._inflight
+
+
+def test_a_failed_build_reaches_every_waiter_and_is_not_cached():
+    cache = ResponseCache()
+    calls = []
+
+    async def failing():
+        calls.append("fail")
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_build("/r", None, failing) for _ in range(3)), return_exceptions=True)
+        retried = await cache.get_or_build("/r", None, build("ok", calls))
+        return results, retried
+
+    results, retried = asyncio.run(scenario())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert retried == b'"ok"' and calls == ["fail", "ok"]
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put(cache.make_key("/a"), "default", b"a")
+    cache.put(cache.make_key("/b"), "default", b"b")
+    cache.get(cache.make_key("/a"), "default")
+    cache.put(cache.make_key("/c"), "default", b"c")
+
+    assert [cache.get(cache.make_key(route), "default") for route in ("/a", "/b", "/c")] == [b"a", None, b"c"]
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from rewards import ReferralService, RewardError, claim_daily_bonus
+
+CONCURRENCY = 50
+
+
+def make_user(user_id, **fields):
+    user = {
+        "id": user_id,
+        "email": f"{user_id}@example.com",
+        "free_predictions": 5,
+        "referral_code": f"CODE-{user_id}",
+        "referred_by": None,
+        "referral_count": 0,
+        "referral_earnings": 0,
+        "last_bonus_claim": None,
+    }
+    user.update(fields)
+    return user
+
+
+async def gather_outcomes(calls):
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, RewardError):
+            raise result
+    return [r for r in results if not isinstance(r, RewardError)], [r for r in results if isinstance(r, RewardError)]
+
+
+def test_concurrent_daily_bonus_claims_grant_once(mongo):
+    async def scenario(client, db):
+        await db.users.insert_one(make_user("u1"))
+
+        granted, rejected = await gather_outcomes(claim_daily_bonus(db, "u1") for _ in range(CONCURRENCY))
+
+        assert granted == [6]
+        assert len(rejected) == CONCURRENCY - 1
+        assert all(e.status_code == 400 for e in rejected)
+        assert (await db.users.find_one({"id": "u1"}))["free_predictions"] == 6
+
+    mongo(scenario)
+
+
+def test_daily_bonus_available_again_after_a_day(mongo):
+    async def scenario(client, db):
+        yesterday = datetime.utcnow() - timedelta(days=1, minutes=1)
+        await db.users.insert_one(make_user("u1", last_bonus_claim=yesterday))
+
+        assert await claim_daily_bonus(db, "u1") == 6
+
+    mongo(scenario)
+
+
+def test_concurrent_referral_uses_credit_exactly_one_referrer(mongo):
+    async def scenario(client, db):
+        referrers = [make_user(f"r{i}") for i in range(CONCURRENCY)]
+        await db.users.insert_many(referrers + [make_user("u1")])
+        service = ReferralService(client, db)
+
+        applied, rejected = await gather_outcomes(
+            service.apply("u1", referrer["referral_code"]) for referrer in referrers
+        )
+
+        assert len(applied) == 1
+        assert all(e.status_code == 400 for e in rejected)
+        user = await db.users.find_one({"id": "u1"})
+        assert user["referred_by"] == applied[0]["id"]
+        assert user["free_predictions"] == 6
+        credited = await db.users.find({"referral_count": {"$gt": 0}}).to_list(None)
+        assert [r["id"] for r in credited] == [applied[0]["id"]]
+        assert credited[0]["referral_count"] == 1
+        assert credited[0]["free_predictions"] == 6
+
+    mongo(scenario)
+
+
+def test_concurrent_referrals_to_one_referrer_are_all_counted(mongo):
+    async def scenario(client, db):
+        users = [make_user(f"u{i}") for i in range(CONCURRENCY)]
+        await db.users.insert_many(users + [make_user("r1")])
+        service = ReferralService(client, db)
+
+        applied, rejected = await gather_outcomes(service.apply(u["id"], "CODE-r1") for u in users)
+
+        assert len(applied) == CONCURRENCY and not rejected
+        referrer = await db.users.find_one({"id": "r1"})
+        assert referrer["referral_count"] == CONCURRENCY
+        assert referrer["referral_earnings"] == CONCURRENCY
+        assert referrer["free_predictions"] == 5 + CONCURRENCY
+
+    mongo(scenario)
+
+
+def test_referral_rejects_unknown_and_own_code(mongo):
+    async def scenario(client, db):
+        await db.users.insert_one(make_user("u1"))
+        service = ReferralService(client, db)
+
+        for code, status_code in (("NOPE", 404), ("CODE-u1", 404)):
+            try:
+                await service.apply("u1", code)
+            except RewardError as e:
+                assert e.status_code == status_code
+            else:
+                raise AssertionError(f"referral code {code} was accepted")
+
+        assert (await db.users.find_one({"id": "u1"}))["referred_by"] is None
+
+    mongo(scenario)
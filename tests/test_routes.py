@@ -0,0 +1,102 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+
+import routes
+from response_cache import ResponseCache
+from server import create_app
+
+PRICES = [
+    {"id": "bitcoin", "symbol": "BTC", "current_price": 45000.0, "currency": "RUB"},
+    {"id": "ethereum", "symbol": "ETH", "current_price": 2800.0, "currency": "RUB"},
+]
+
+
+def test_dashboard_loads_every_section_for_one_session_and_honours_its_etag(mongo, monkeypatch):
+    async def fetch_prices(currency, limit, fallback=True):
+        return PRICES[:limit]
+
+    monkeypatch.setattr(routes, "fetch_crypto_prices", fetch_prices)
+    monkeypatch.setattr(routes.response_cache, "_entries", type(routes.response_cache._entries)())
+
+    async def scenario(client, db):
+        monkeypatch.setattr(routes, "db", db)
+        # The user's own lists come from their own primary reads, never the lagging history secondary
+        monkeypatch.setattr(routes, "own_history_db", db)
+        monkeypatch.setattr(routes, "history_db", None)
+        now = datetime.utcnow()
+        await db.users.insert_one({"id": "u1", "email": "a@b.c", "name": "A", "picture": "", "referral_code": "R",
+                                   "created_at": now, "preferred_currency": "RUB"})
+        await db.sessions.insert_one({"session_token": "t", "user_id": "u1", "expires_at": now + timedelta(days=1)})
+        await db.binary_predictions.insert_one({"id": "p1", "user_id": "u1", "symbol": "BTC", "status": "ACTIVE",
+                                                "created_at": now})
+
+        transport = httpx.ASGITransport(app=create_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     headers={"Authorization": "Bearer t"}) as http:
+            full = await http.get("/api/dashboard", params={"limit": 2})
+            unchanged = await http.get("/api/dashboard", params={"limit": 2}, headers={"If-None-Match": full.headers["ETag"]})
+            await db.binary_predictions.update_one({"id": "p1"}, {"$set": {"status": "WON"}})
+            changed = await http.get("/api/dashboard", params={"limit": 2}, headers={"If-None-Match": full.headers["ETag"]})
+            selected = await http.get("/api/dashboard", params={"sections": "prices", "fields": "prices.symbol"})
+            invalid = await http.get("/api/dashboard", params={"fields": "prices"})
+            anonymous = await http.get("/api/dashboard", headers={"Authorization": ""})
+
+        body = full.json()
+        assert body["prices"] == PRICES
+        assert [p["id"] for p in body["binary_predictions"]] == ["p1"] and body["ai_predictions"] == []
+        assert unchanged.status_code == 304
+        assert changed.status_code == 200 and changed.headers["ETag"] != full.headers["ETag"]
+        assert selected.json() == {"prices": [{"symbol": "BTC"}, {"symbol": "ETH"}]}
+        assert invalid.status_code == 400 and anonymous.status_code == 401
+
+    mongo(scenario)
+
+
+def test_predictions_for_unknown_symbols_are_rejected_before_any_debit(mongo, monkeypatch):
+    async def scenario(client, db):
+        monkeypatch.setattr(routes, "db", db)
+        now = datetime.utcnow()
+        await db.users.insert_one({"id": "u1", "email": "a@b.c", "name": "A", "picture": "", "referral_code": "R",
+                                   "created_at": now, "free_predictions": 5})
+        await db.sessions.insert_one({"session_token": "t", "user_id": "u1", "expires_at": now + timedelta(days=1)})
+
+        transport = httpx.ASGITransport(app=create_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     headers={"Authorization": "Bearer t"}) as http:
+            responses = [
+                await http.post("/api/binary-predictions", json={"symbol": "NOPE", "direction": "UP", "timeframe": "5m"}),
+                await http.post("/api/predictions", json={"symbol": "$A.B", "prediction_type": "bullish"}),
+                await http.post("/api/ai-predictions/manual", json={"symbol": "NOPE", "timeframe": "1h"}),
+            ]
+
+        assert [r.status_code for r in responses] == [400, 400, 400]
+        assert all(r.json()["detail"] == "Unsupported symbol" for r in responses)
+        assert (await db.users.find_one({"id": "u1"}))["free_predictions"] == 5
+        assert await db.binary_predictions.count_documents({}) == 0
+
+    mongo(scenario)
+
+
+def test_mock_prices_served_while_upstream_is_down_are_not_cached(monkeypatch):
+    calls = []
+
+    async def fetch_prices(currency, limit, fallback=True):
+        calls.append(fallback)
+        if len(calls) == 1:
+            raise RuntimeError("upstream down")
+        return PRICES[:limit]
+
+    monkeypatch.setattr(routes, "fetch_crypto_prices", fetch_prices)
+    monkeypatch.setattr(routes, "response_cache", ResponseCache())
+
+    async def scenario():
+        return [json.loads(await routes.load_crypto_prices_body("RUB", 2)) for _ in range(3)]
+
+    fallback, live, cached = asyncio.run(scenario())
+
+    assert [row["symbol"] for row in fallback] == ["BTC", "ETH"] and fallback != PRICES
+    assert live == cached == PRICES
+    assert calls == [False, False]
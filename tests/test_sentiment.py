@@ -0,0 +1,109 @@
+import asyncio
+
+from aiohttp import web
+
+from sentiment import SentimentIngestor, SentimentStore, sentiment_loop
+
+RSS = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>Fixture feed</title>
+<item><title>Bitcoin surges to a record high</title><link>https://news.test/1</link>
+<description>&lt;p&gt;ETF inflows drive a strong rally for BTC.&lt;/p&gt;</description></item>
+<item><title>Solana network outage</title><link>https://news.test/2</link>
+<description>SOL plunges after exchange hacked, fear spreads</description></item>
+<item><title>Cooking tips</title><link>https://news.test/3</link><description>Nothing about markets</description></item>
+</channel></rss>"""
+
+HTML = """<html><body>
+<article><h2><a href="/a">Ethereum upgrade approved</a></h2><p>Developers report strong adoption of Ethereum.</p></article>
+<article><h2><a href="/b">Click the link</a></h2><p>A dot and a link are not tickers.</p></article>
+</body></html>"""
+
+ALIASES = {"BTC": {"bitcoin"}, "ETH": {"ethereum"}, "SOL": {"solana"}, "DOT": {"polkadot"}, "LINK": {"chainlink"}}
+
+
+def fixture(status=200, text="", content_type="text/html"):
+    async def handler(request):
+        return web.Response(status=status, text=text, content_type=content_type)
+    return handler
+
+
+async def serve_fixtures():
+    app = web.Application()
+    app.router.add_get("/feed.xml", fixture(text=RSS, content_type="application/rss+xml"))
+    app.router.add_get("/news.html", fixture(text=HTML))
+    app.router.add_get("/broken", fixture(status=503))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+def test_ingestion_scores_symbols_and_skips_seen_documents():
+    async def scenario():
+        runner, base_url = await serve_fixtures()
+        try:
+            store = SentimentStore()
+            ingestor = SentimentIngestor(store, {
+                "rss": f"{base_url}/feed.xml",
+                "html": f"{base_url}/news.html",
+                "broken": f"{base_url}/broken",
+            }, ALIASES)
+            first = await ingestor.run_once()
+            second = await ingestor.run_once()
+            return store, first, second
+        finally:
+            await runner.cleanup()
+
+    store, first, second = asyncio.run(scenario())
+
+    assert first == {"documents": 5, "symbols": 3}
+    assert second == {"documents": 0, "symbols": 0}
+    assert store.lookup("BTC")["overall_sentiment"] > 0.5
+    assert store.lookup("ETH")["overall_sentiment"] > 0
+    assert store.lookup("SOL")["overall_sentiment"] < -0.5
+    # Lower-case "dot" and "link" are ordinary words
+    assert store.lookup("DOT") == {"overall_sentiment": 0, "sources": [], "confidence": 0.5}
+    assert store.lookup("LINK")["sources"] == []
+
+
+def test_recent_documents_outweigh_old_ones():
+    store = SentimentStore(half_life_hours=1)
+    store.add("BTC", "news", [-1.0, -1.0], now=0)
+    store.add("BTC", "news", [1.0], now=3 * 3600)
+
+    fresh = store.lookup("BTC", now=3 * 3600)
+    stale = store.lookup("BTC", now=30 * 3600)
+
+    # The older pair decayed to a quarter weight by the time the positive document arrived
+    assert fresh["overall_sentiment"] > 0.5
+    assert stale["overall_sentiment"] == fresh["overall_sentiment"]
+    assert stale["confidence"] < fresh["confidence"]
+
+
+def test_only_the_ingesting_worker_runs_ingestion_and_the_others_reload():
+    calls = []
+
+    class Store:
+        async def load(self, db):
+            calls.append("load")
+
+    class Ingestor:
+        store = Store()
+        db = object()
+
+        async def run_once(self):
+            calls.append("ingest")
+            return {"documents": 0, "symbols": 0}
+
+    # Follower for two rounds, then it takes over ingestion
+    turns = iter([False, False, True, True])
+
+    async def scenario():
+        task = asyncio.create_task(sentiment_loop(Ingestor(), interval=0.01, should_ingest=lambda: next(turns, True)))
+        while calls.count("ingest") < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert calls[:5] == ["load", "load", "load", "ingest", "ingest"]
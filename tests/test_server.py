@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import analysis
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+PROBE = """
+import json, sys
+import server
+app = server.create_app()
+print(json.dumps({
+    "loaded": [name for name in ("sklearn", "bs4", "requests") if name in sys.modules],
+    "routes": sorted(route.path for route in app.routes),
+}))
+"""
+
+
+def test_importing_the_app_defers_heavy_dependencies():
+    # A fresh interpreter, since other tests may already have imported them
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    probe = json.loads(output.stdout.strip().splitlines()[-1])
+
+    assert probe["loaded"] == []
+    assert "/api/ai-predictions/manual" in probe["routes"]
+    assert "/metrics" in probe["routes"]
+
+
+def test_model_trains_once_on_first_prediction():
+    analysis.set_model(None, None)
+
+    prediction, probabilities = analysis.predict_direction([0.5, 0.0, 0.3, 0.0, 0.0])
+    scaler, model = analysis.get_model()
+
+    assert prediction in (0, 1)
+    assert abs(sum(probabilities) - 1) < 1e-9
+    assert analysis.get_model()[1] is model
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from signal_store import SIGNAL_FIELDS, join_signals, merge_prediction, migrate_legacy_predictions
+
+NOW = datetime(2024, 1, 1)
+
+SIGNAL = {
+    "id": "s1", "symbol": "BTC", "timeframe": "1h", "direction": "UP", "confidence_score": 70,
+    "technical_indicators": {"rsi": 40}, "sentiment_analysis": {"score": 0.2}, "ai_reasoning": "trend",
+    "created_at": NOW,
+}
+
+
+def legacy_prediction(prediction_id, direction="UP"):
+    return {"id": prediction_id, "user_id": "u1", "symbol": "BTC", "timeframe": "1h", "direction": direction,
+            "confidence_score": 70, "technical_indicators": {"rsi": 40}, "sentiment_analysis": {"score": 0.2},
+            "ai_reasoning": "trend", "status": "ACTIVE", "created_at": NOW}
+
+
+def test_merge_keeps_the_reference_fields_and_takes_only_signal_fields():
+    reference = {"id": "p1", "signal_id": "s1", "symbol": "BTC", "status": "WON"}
+
+    merged = merge_prediction(reference, SIGNAL)
+
+    assert merged["id"] == "p1" and merged["status"] == "WON"
+    assert all(merged[field] == SIGNAL[field] for field in SIGNAL_FIELDS)
+    assert "created_at" not in merged
+    assert merge_prediction(reference, None) == reference
+
+
+def test_join_attaches_signals_and_passes_legacy_references_through(mongo):
+    async def scenario(client, db):
+        await db.ai_signals.insert_one(dict(SIGNAL))
+        references = [{"id": "p1", "signal_id": "s1"}, {"id": "p2", "direction": "DOWN"},
+                      {"id": "p3", "signal_id": "missing"}]
+
+        joined = await join_signals(db, references)
+
+        assert [p["id"] for p in joined] == ["p1", "p2", "p3"]
+        assert joined[0]["direction"] == "UP" and joined[0]["ai_reasoning"] == "trend"
+        assert joined[1] == references[1] and joined[2] == references[2]
+        assert await join_signals(db, []) == []
+
+    mongo(scenario)
+
+
+def test_migration_shares_signals_and_can_be_rerun(mongo):
+    async def scenario(client, db):
+        await db.ai_predictions.insert_many([legacy_prediction("p1"), legacy_prediction("p2"),
+                                             legacy_prediction("p3", direction="DOWN")])
+
+        first = await migrate_legacy_predictions(db, batch_size=2)
+
+        assert first == {"migrated_predictions": 3, "signals_created": 2}
+        signal_ids = {p["id"]: p["signal_id"] for p in await db.ai_predictions.find().to_list(None)}
+        assert signal_ids["p1"] == signal_ids["p2"] != signal_ids["p3"]
+
+        # A run that stopped after creating the signals leaves the predictions still embedding them
+        legacy = legacy_prediction("p1")
+        await db.ai_predictions.replace_one({"id": "p1"}, legacy)
+        rerun = await migrate_legacy_predictions(db)
+
+        assert rerun == {"migrated_predictions": 1, "signals_created": 0}
+        assert await db.ai_signals.count_documents({}) == 2
+        migrated = await db.ai_predictions.find_one({"id": "p1"}, {"_id": 0})
+        assert migrated["signal_id"] == signal_ids["p1"] and "technical_indicators" not in migrated
+        assert (await join_signals(db, [migrated]))[0]["direction"] == "UP"
+        assert await migrate_legacy_predictions(db) == {"migrated_predictions": 0, "signals_created": 0}
+
+    mongo(scenario)
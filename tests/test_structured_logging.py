@@ -0,0 +1,77 @@
+import io
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueListener
+
+from structured_logging import EventFilter, JsonFormatter, NonBlockingQueueHandler, log_event
+
+
+def make_record(event=None, **fields):
+    record = logging.LogRecord("criptex", logging.INFO, __file__, 1, "Message %s", ("text",), None)
+    if event is not None:
+        record.__dict__.update(log_event(event, **fields))
+    return record
+
+
+def test_events_are_sampled_and_rate_limited_with_a_suppressed_count():
+    now = [0.0]
+    rolls = iter([0.5, 0.05])
+    event_filter = EventFilter({"sampled": 0.1}, {"limited": 2}, clock=lambda: now[0], rng=lambda: next(rolls))
+
+    assert event_filter.filter(make_record())
+    assert not event_filter.filter(make_record("sampled"))
+    kept = make_record("sampled")
+    assert event_filter.filter(kept) and kept.sample_rate == 0.1
+
+    passed = [event_filter.filter(make_record("limited")) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    now[0] = 0.5
+    record = make_record("limited")
+    assert event_filter.filter(record)
+    assert record.suppressed == 3 and event_filter.suppressed == 3
+
+
+def test_rate_limits_hold_when_many_threads_log_at_once():
+    event_filter = EventFilter(rate_limits={"limited": 50}, clock=lambda: 0.0)
+    passed = []
+
+    def log():
+        passed.extend(event_filter.filter(make_record("limited")) for _ in range(200))
+
+    threads = [threading.Thread(target=log) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert passed.count(True) == 50 and event_filter.suppressed == 8 * 200 - 50
+
+
+def test_records_are_written_as_json_by_the_listener_thread():
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    listener = QueueListener(handler.queue, output)
+    logger = logging.getLogger("test_structured_logging")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Cycle %s failed", 7, extra=log_event("generation.cycle_failed", items=3))
+    # The queue holds one record, so this one is dropped rather than blocking
+    logger.info("overflow")
+    listener.start()
+    listener.stop()
+    logger.removeHandler(handler)
+
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "Cycle 7 failed"
+    assert entry["event"] == "generation.cycle_failed" and entry["items"] == 3
+    assert "ValueError: boom" in entry["exception"]
+    assert handler.dropped == 1
@@ -0,0 +1,183 @@
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from write_buffer import WriteBehindBuffer
+
+
+class FakeCollection:
+    """Records insert_many batches and fails the first `failures` calls"""
+
+    name = "fake"
+
+    def __init__(self, failures=0, error=None):
+        self.failures = failures
+        self.error = error or AutoReconnect("connection reset")
+        self.batches = []
+        self.documents = {}
+
+    async def insert_many(self, documents, ordered=True):
+        assert ordered is False
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.batches.append(len(documents))
+        for document in documents:
+            self.documents[document["_id"]] = document
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_flushes_when_batch_size_reached():
+    async def scenario():
+        collection = FakeCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=10, flush_interval=60)
+        buffer.start()
+        for i in range(25):
+            await buffer.put({"n": i})
+        await asyncio.sleep(0.05)
+        assert sum(collection.batches) >= 20
+        await buffer.close()
+        assert sorted(d["n"] for d in collection.documents.values()) == list(range(25))
+        assert buffer.pending == 0
+
+    run(scenario())
+
+
+def test_flushes_on_interval():
+    async def scenario():
+        collection = FakeCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=100, flush_interval=0.05)
+        buffer.start()
+        await buffer.put({"n": 1})
+        await asyncio.sleep(0.2)
+        assert collection.batches == [1]
+        await buffer.close()
+
+    run(scenario())
+
+
+def test_explicit_flush_makes_writes_visible():
+    async def scenario():
+        collection = FakeCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=100, flush_interval=60)
+        document = {"n": 1}
+        await buffer.put(document)
+        await buffer.flush()
+        assert document["_id"] in collection.documents
+
+    run(scenario())
+
+
+def test_put_blocks_when_full():
+    async def scenario():
+        collection = FakeCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=100, flush_interval=60, max_pending=3)
+        for i in range(3):
+            await buffer.put({"n": i})
+        blocked = asyncio.create_task(buffer.put({"n": 3}))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+        await buffer.flush()
+        await asyncio.wait_for(blocked, timeout=1)
+        await buffer.flush()
+        assert len(collection.documents) == 4
+
+    run(scenario())
+
+
+def test_failed_batches_are_retried_then_dropped():
+    async def scenario():
+        collection = FakeCollection(failures=2)
+        buffer = WriteBehindBuffer(collection, max_batch=10, flush_interval=60, max_retries=3, retry_backoff=0)
+        await buffer.put({"n": 1})
+        await buffer.flush()
+        assert len(collection.documents) == 1
+        assert buffer.retried == 2
+
+        collection.failures = 10
+        await buffer.put({"n": 2})
+        await buffer.flush()
+        assert buffer.dropped == 1
+        assert buffer.pending == 0
+
+    run(scenario())
+
+
+def test_duplicate_key_errors_count_as_written():
+    async def scenario():
+        error = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}, {"index": 1, "code": 121}]})
+        collection = FakeCollection(failures=1, error=error)
+        buffer = WriteBehindBuffer(collection, max_batch=10, flush_interval=60, retry_backoff=0)
+        await buffer.put({"n": 0})
+        await buffer.put({"n": 1})
+        await buffer.flush()
+        assert buffer.retried == 1
+        assert collection.batches == [1]
+        assert buffer.inserted == 2
+
+    run(scenario())
+
+
+def test_write_jumps_the_queue_and_reports_a_dropped_document():
+    async def scenario():
+        collection = FakeCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=2, flush_interval=60, max_retries=1, retry_backoff=0)
+        for i in range(4):
+            await buffer.put({"n": i})
+        document = {"n": "manual"}
+        await buffer.write(document)
+        # One batch: the written document and the oldest queued one
+        assert collection.batches == [2] and document["_id"] in collection.documents
+        assert buffer.pending == 3
+
+        collection.failures = 2
+        try:
+            await buffer.write({"n": "lost"})
+        except AutoReconnect:
+            pass
+        else:
+            raise AssertionError("a dropped write must raise")
+        assert buffer.dropped == 2
+
+    run(scenario())
+
+
+def test_a_batch_cancelled_mid_write_is_requeued():
+    async def scenario():
+        class SlowCollection(FakeCollection):
+            async def insert_many(self, documents, ordered=True):
+                await asyncio.sleep(10)
+
+        buffer = WriteBehindBuffer(SlowCollection(), max_batch=10, flush_interval=0.01, max_pending=2)
+        buffer.start()
+        await buffer.put({"n": 0})
+        await buffer.put({"n": 1})
+        await asyncio.sleep(0.05)
+        buffer._task.cancel()
+        await asyncio.sleep(0)
+
+        assert buffer.stats()["queued"] == 2 and buffer.pending == 2
+        buffer.collection = FakeCollection()
+        await buffer.flush()
+        assert buffer.pending == 0 and len(buffer.collection.documents) == 2
+        await asyncio.wait_for(buffer.put({"n": 2}), timeout=1)
+
+    run(scenario())
+
+
+def test_write_concern_errors_are_retried():
+    async def scenario():
+        error = BulkWriteError({"writeErrors": [], "writeConcernErrors": [{"code": 64, "errmsg": "timeout"}]})
+        collection = FakeCollection(failures=1, error=error)
+        buffer = WriteBehindBuffer(collection, max_batch=10, flush_interval=60, retry_backoff=0)
+        await buffer.put({"n": 0})
+        await buffer.flush()
+        assert buffer.retried == 1 and buffer.inserted == 1 and collection.batches == [1]
+
+    run(scenario())